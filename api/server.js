@@ -9,20 +9,65 @@ module.exports = app;
 app.use(cors());
 app.use(express.json());
 
+// Conditional GETs are passed through, so an unchanged dataset costs the backend a
+// version lookup and the client a 304 instead of a full JSON body.
+const CONDITIONAL_HEADERS = ['etag', 'cache-control', 'vary'];
+
+const fetchCached = (url, req) => axios.get(url, {
+  params: req.query,
+  headers: req.get('If-None-Match') ? { 'If-None-Match': req.get('If-None-Match') } : {},
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+});
+
+const relay = (res, response) => {
+  CONDITIONAL_HEADERS.forEach((name) => {
+    if (response.headers[name]) {
+      res.set(name, response.headers[name]);
+    }
+  });
+  if (response.status === 304) {
+    return res.status(304).end();
+  }
+  return res.json(response.data);
+};
+
+// Exports are piped through as they arrive instead of being buffered in the proxy.
+const streamProjects = async (req, res, ndjson) => {
+  try {
+    const response = await axios.get('http://backend:5002/projects', {
+      params: req.query,
+      headers: ndjson ? { Accept: 'application/x-ndjson' } : {},
+      responseType: 'stream',
+    });
+    res.type(response.headers['content-type']);
+    response.data.pipe(res);
+  } catch (error) {
+    console.error('Error exporting projects:', error.message);
+    res.status(500).json({ error: 'Error exporting projects' });
+  }
+};
+
 app.get('/projects', async (req, res) => {
+  const ndjson = req.accepts(['application/json', 'application/x-ndjson']) === 'application/x-ndjson';
+  if (req.query.export || ndjson) {
+    return streamProjects(req, res, ndjson);
+  }
   try {
-    const response = await axios.get('http://backend:5002/projects');
-    res.json(response.data);
+    const response = await fetchCached('http://backend:5002/projects', req);
+    relay(res, response);
   } catch (error) {
     console.error('Error fetching projects:', error.message);
+    if (error.response && error.response.status === 400) {
+      return res.status(400).json(error.response.data);
+    }
     res.status(500).json({ error: 'Error fetching projects' });
   }
 });
 
 app.get('/co2_by_industry', async (req, res) => {
   try {
-    const response = await axios.get('http://backend:5002/co2_by_industry');
-    res.json(response.data);
+    const response = await fetchCached('http://backend:5002/co2_by_industry', req);
+    relay(res, response);
   } catch (error) {
     console.error('Error fetching CO2 by industry:', error.message);
     res.status(500).json({ error: 'Error fetching CO2 by industry' });
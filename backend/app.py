@@ -1,37 +1,68 @@
-import logging
 import os
-from flask import Flask, request, jsonify
+import json
+import math
+import tempfile
+import click
+from datetime import timedelta
+import numpy as np
+from flask import Flask, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_migrate import Migrate
-from load_data import register_commands, load_data, load_industry_types, industry_types
 from sqlalchemy import text
-import re
-from collections import defaultdict
-from ml_models.sklearn_model import train_sklearn_model, predict_with_sklearn_model
-from ml_models.tensorflow_model import train_tensorflow_model, predict_with_tensorflow_model
-from ml_models.pytorch_model import train_pytorch_model, predict_with_pytorch_model
+from load_data import register_commands, load_data, load_industry_types, industry_types, industry_decoder
+import rating_engine
+import derived_tables
+import rating_store
+import subpart_store
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_branches, keyset_order
+from ml_models import backends as model_backends
+from ml_models.jobs import queue as training_jobs
+from ml_models.registry import current_artifact_path, registry as model_registry
+from ml_models.batch import (InvalidBatch, feature_columns, load_models, parse_records, predict_batches,
+                             records_to_matrix, score_matrix)
+from ml_models.training_data import open_snapshot, write_snapshot
+import bulk_projects
+import geo
+import import_report
+import logging_config
+import metrics
+import project_snapshot
+import response_cache
+import what_if
 
 app = Flask(__name__)
 CORS(app)
 register_commands(app)
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logging_config.configure_logging()
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://postgres:password@db/carbon_project_rater')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['MODEL_BACKENDS'] = [name.strip() for name in os.getenv('MODEL_BACKENDS', ','.join(model_backends.BACKENDS)).split(',') if name.strip()]
+app.config['MODEL_RUNTIME'] = os.getenv('MODEL_RUNTIME', 'framework')
+app.config['WARM_UP_MODELS'] = os.getenv('WARM_UP_MODELS', '0') == '1'
+app.config['PREDICT_BATCH_SIZE'] = int(os.getenv('PREDICT_BATCH_SIZE', '1024'))
+app.config['METRICS_DEBUG_HEADER'] = os.getenv('METRICS_DEBUG_HEADER', '0') == '1'
+app.config['RESPONSE_CACHE'] = os.getenv('RESPONSE_CACHE', '1') == '1'
+response_cache.cache.max_bytes = int(os.getenv('RESPONSE_CACHE_BYTES', response_cache.DEFAULT_MAX_BYTES))
+
+model_backends.configure(app.config['MODEL_BACKENDS'], app.config['MODEL_RUNTIME'])
+if app.config['WARM_UP_MODELS']:
+    model_registry.warm_up()
 
 db = SQLAlchemy(app)
+metrics.init_app(app)
 migrate = Migrate(app, db)
 
 class CarbonProject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    facility_name = db.Column(db.String(255), nullable=False)
+    facility_name = db.Column(db.String(255), nullable=False, index=True, unique=True)
     city = db.Column(db.String(255))
-    state = db.Column(db.String(255))
+    state = db.Column(db.String(255), index=True)
     zip_code = db.Column(db.String(10))
     address = db.Column(db.String(255))
-    county = db.Column(db.String(255))
+    county = db.Column(db.String(255), index=True)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
     industry_type = db.Column(db.String(255))
@@ -44,129 +75,450 @@ class CarbonProject(db.Model):
     total_mass_co2_sequestered_2021 = db.Column(db.Float, nullable=True)
     total_mass_co2_sequestered_2022 = db.Column(db.Float, nullable=True)
     duration_years = db.Column(db.Integer, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=db.func.now(), onupdate=db.func.now(), server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_carbon_project_latitude_longitude', 'latitude', 'longitude'),
+        # Keyset pagination pages through (sort column, id); see pagination.keyset_order.
+        db.Index('ix_carbon_project_facility_name_id', 'facility_name', 'id'),
+        db.Index('ix_carbon_project_total_mass_co2_sequestered_id', 'total_mass_co2_sequestered', 'id'),
+    )
 
     def calculate_raw_rating(self, all_projects):
-        weights = {'total_co2': 0.3, 'duration': 0.2, 'co2_per_year': 0.5}
-        
-        max_co2 = max(p.total_mass_co2_sequestered for p in all_projects)
-        min_co2 = min(p.total_mass_co2_sequestered for p in all_projects)
-        max_duration = max((p.duration_years for p in all_projects if p.duration_years is not None), default=0)
-        min_duration = min((p.duration_years for p in all_projects if p.duration_years is not None), default=0)
-        
-        yearly_data = [
-            self.total_mass_co2_sequestered_2016, self.total_mass_co2_sequestered_2017, 
-            self.total_mass_co2_sequestered_2018, self.total_mass_co2_sequestered_2019, 
-            self.total_mass_co2_sequestered_2020, self.total_mass_co2_sequestered_2021, 
-            self.total_mass_co2_sequestered_2022
-        ]
-        yearly_data = [data for data in yearly_data if data is not None]
-        
-        if yearly_data:
-            co2_per_year = (yearly_data[-1] - yearly_data[0]) / (len(yearly_data) - 1) if len(yearly_data) > 1 else yearly_data[0]
-        else:
-            co2_per_year = 0
-        
-        max_co2_per_year = max(((p.total_mass_co2_sequestered_2022 - p.total_mass_co2_sequestered_2016) / (6 - 1) for p in all_projects if p.total_mass_co2_sequestered_2016 is not None), default=0)
-        min_co2_per_year = min(((p.total_mass_co2_sequestered_2022 - p.total_mass_co2_sequestered_2016) / (6 - 1) for p in all_projects if p.total_mass_co2_sequestered_2016 is not None), default=0)
+        bounds = rating_engine.rating_bounds(rating_engine.columns_from_projects(all_projects))
+        return float(rating_engine.raw_ratings(rating_engine.columns_from_projects([self]), bounds)[0])
+
+    def __repr__(self):
+        return f'<CarbonProject {self.facility_name}>'
 
-        co2_score = (self.total_mass_co2_sequestered - min_co2) / (max_co2 - min_co2) if max_co2 != min_co2 else 0
-        duration_score = (self.duration_years - min_duration) / (max_duration - min_duration) if self.duration_years and max_duration != min_duration else 0
-        co2_per_year_score = (co2_per_year - min_co2_per_year) / (max_co2_per_year - min_co2_per_year) if max_co2_per_year != min_co2_per_year else 0
+class ProjectRating(db.Model):
+    project_id = db.Column(db.Integer, db.ForeignKey('carbon_project.id', ondelete='CASCADE'), primary_key=True)
+    raw_rating = db.Column(db.Float, nullable=False)
+    rating = db.Column(db.Float, nullable=False)
 
-        rating = (weights['total_co2'] * co2_score +
-                  weights['duration'] * duration_score +
-                  weights['co2_per_year'] * co2_per_year_score) * 5
+    __table_args__ = (db.Index('ix_project_rating_rating_project_id', 'rating', 'project_id'),)
 
-        return rating
+class IndustryType(db.Model):
+    subpart_code = db.Column(db.String(64), primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
 
-    def __repr__(self):
-        return f'<CarbonProject {self.facility_name}>'
+class ProjectSubpart(db.Model):
+    project_id = db.Column(db.Integer, db.ForeignKey('carbon_project.id', ondelete='CASCADE'), primary_key=True)
+    subpart_code = db.Column(db.String(64), primary_key=True)
+
+    __table_args__ = (db.Index('ix_project_subpart_subpart_code_project_id', 'subpart_code', 'project_id'),)
+
+class RemovedProjectSubpart(db.Model):
+    # Bridge rows dropped by updates and deletes, so incremental aggregates can
+    # tell which industries lost projects since their last refresh.
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False)
+    subpart_code = db.Column(db.String(64), nullable=False)
+    removed_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=db.func.now(), server_default=db.func.now())
+
+class ProjectYearTotal(db.Model):
+    # Long-format copy of the yearly total_mass_co2_sequestered_<year> columns.
+    project_id = db.Column(db.Integer, db.ForeignKey('carbon_project.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    tonnes = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index('ix_project_year_total_year_project_id', 'year', 'project_id'),)
+
+class ProjectTrend(db.Model):
+    project_id = db.Column(db.Integer, db.ForeignKey('carbon_project.id', ondelete='CASCADE'), primary_key=True)
+    first_year = db.Column(db.Integer, nullable=False)
+    last_year = db.Column(db.Integer, nullable=False)
+    years_reported = db.Column(db.Integer, nullable=False)
+    coverage = db.Column(db.Float, nullable=False)
+    latest_tonnes = db.Column(db.Float, nullable=False)
+    slope = db.Column(db.Float, nullable=True)
+
+    def as_dict(self):
+        return {column: getattr(self, column) for column in
+                ('first_year', 'last_year', 'years_reported', 'coverage', 'latest_tonnes', 'slope')}
+
+class DatasetVersion(db.Model):
+    # Single row, bumped with every write to carbon_project; see dataset_version.py.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+class RatingBound(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    min_co2 = db.Column(db.Float, nullable=False)
+    max_co2 = db.Column(db.Float, nullable=False)
+    min_duration = db.Column(db.Float, nullable=False)
+    max_duration = db.Column(db.Float, nullable=False)
+    min_co2_per_year = db.Column(db.Float, nullable=False)
+    max_co2_per_year = db.Column(db.Float, nullable=False)
+    min_raw_rating = db.Column(db.Float, nullable=False)
+    max_raw_rating = db.Column(db.Float, nullable=False)
+
+    def as_bounds(self):
+        return rating_engine.RatingBounds(*(getattr(self, field) for field in rating_engine.RatingBounds._fields))
 
 def ensure_industry_types_loaded():
     if not industry_types:
         load_industry_types()
 
-def clean_industry_type(industry_type_str):
-    parts = industry_type_str.split(',')
-    full_names = []
-    for part in parts:
-        clean_part = re.sub(r'\([^)]*\)', '', part).strip()
-        if clean_part == 'RR':
-            full_names.extend(['Geologic Sequestration of Carbon Dioxide', 'CO2 Injection'])
-        else:
-            full_name = industry_types.get(clean_part, clean_part)
-            full_names.append(full_name)
-    return full_names
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 1000
+MAX_PREDICT_BATCH_SIZE = 65536
+DEFAULT_NEAR_K = 10
+NEAR_SEARCH_START_KM = 25.0
+
+def serialize_project(p, rating):
+    metrics.count_rows()
+    with metrics.span('industry_decoding'):
+        industry = industry_decoder.format(p.industry_type) if p.industry_type else 'N/A'
+    return {
+        'id': p.id,
+        'facility_name': p.facility_name or 'N/A',
+        'city': p.city or 'N/A',
+        'state': p.state or 'N/A',
+        'zip_code': p.zip_code or 'N/A',
+        'address': p.address or 'N/A',
+        'county': p.county or 'N/A',
+        'lat_long': f"{p.latitude}, {p.longitude}" if p.latitude and p.longitude else 'N/A',
+        'industry': industry,
+        'total_mass_co2_sequestered': round(p.total_mass_co2_sequestered) if p.total_mass_co2_sequestered is not None else 'N/A',
+        'duration_years': '5+ years' if p.duration_years == 5 else (f"{int(p.duration_years)} years" if p.duration_years else 'N/A'),
+        'rating': round(rating * 2) / 2
+    }
+
+def project_sort_keys():
+    """Sort keys mapped to (column, id column) pairs, each paged through a (column, id) index."""
+    return {
+        'rating': (ProjectRating.rating, ProjectRating.project_id),
+        'facility_name': (CarbonProject.facility_name, CarbonProject.id),
+        'total_co2': (CarbonProject.total_mass_co2_sequestered, CarbonProject.id),
+        'id': (CarbonProject.id, CarbonProject.id),
+    }
+
+def subpart_filter(code):
+    return CarbonProject.id.in_(db.select(ProjectSubpart.project_id).where(ProjectSubpart.subpart_code == code))
 
-def truncate_with_ellipsis(text, max_length):
-    return text if len(text) <= max_length else text[:max_length] + '...'
+def within_box(min_lat, max_lat, lon_ranges):
+    return db.and_(CarbonProject.latitude.between(min_lat, max_lat),
+                   db.or_(*(CarbonProject.longitude.between(lo, hi) for lo, hi in lon_ranges)))
 
-def format_industry_type(industry_type_str):
-    cleaned_names = clean_industry_type(industry_type_str)
-    truncated_names = [truncate_with_ellipsis(name, 30) for name in cleaned_names]
-    return ',\n'.join(truncated_names)
+def filtered_projects_query(args):
+    query = (db.session.query(CarbonProject, ProjectRating.rating)
+             .join(ProjectRating, ProjectRating.project_id == CarbonProject.id))
+    if args.get('state'):
+        query = query.filter(CarbonProject.state == args['state'])
+    if args.get('county'):
+        query = query.filter(CarbonProject.county == args['county'])
+    if args.get('industry'):
+        query = query.filter(subpart_filter(args['industry']))
+    if args.get('min_rating') is not None:
+        query = query.filter(ProjectRating.rating >= args.get('min_rating', type=float))
+    if args.get('max_rating') is not None:
+        query = query.filter(ProjectRating.rating <= args.get('max_rating', type=float))
+    if args.get('bbox'):
+        query = query.filter(within_box(*geo.parse_bbox(args['bbox'])))
+    return query
+
+def branch_query(query, clause):
+    return query if clause is None else query.filter(clause)
+
+def stream_projects(queries, ndjson):
+    def generate():
+        if not ndjson:
+            yield '{"projects": ['
+        chunk = []
+        first = True
+        for p, rating in (row for query in queries for row in query.yield_per(STREAM_BATCH_SIZE)):
+            line = json.dumps(serialize_project(p, rating))
+            if ndjson:
+                chunk.append(line + '\n')
+            else:
+                chunk.append(line if first else ',' + line)
+                first = False
+            if len(chunk) >= STREAM_BATCH_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk)
+        if not ndjson:
+            yield ']}'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return app.response_class(stream_with_context(generate()), mimetype=mimetype)
+
+def is_export_request(req):
+    return bool(req.args.get('export')) or \
+        req.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
 
 @app.route('/projects')
+@response_cache.cached(bypass=is_export_request)
 def get_projects():
-    projects = CarbonProject.query.all()
-    raw_ratings = [p.calculate_raw_rating(projects) for p in projects]
-    min_rating = min(raw_ratings)
-    max_rating = max(raw_ratings)
-    normalized_ratings = [(r - min_rating) / (max_rating - min_rating) * 9 + 1 for r in raw_ratings]
-
-    projects_with_ratings = []
-    for p, rating in zip(projects, normalized_ratings):
-        project_data = {
-            'id': p.id,
-            'facility_name': p.facility_name or 'N/A',
-            'city': p.city or 'N/A',
-            'state': p.state or 'N/A',
-            'zip_code': p.zip_code or 'N/A',
-            'address': p.address or 'N/A',
-            'county': p.county or 'N/A',
-            'lat_long': f"{p.latitude}, {p.longitude}" if p.latitude and p.longitude else 'N/A',
-            'industry': format_industry_type(p.industry_type) if p.industry_type else 'N/A',
-            'total_mass_co2_sequestered': round(p.total_mass_co2_sequestered),
-            'duration_years': '5+ years' if p.duration_years == 5 else (f"{int(p.duration_years)} years" if p.duration_years else 'N/A'),
-            'rating': round(rating * 2) / 2
-        }
-        projects_with_ratings.append(project_data)
-    
-    projects_with_ratings.sort(key=lambda x: x['rating'], reverse=True)
-    return jsonify({'projects': projects_with_ratings})
+    sort = request.args.get('sort', '-rating')
+    descending = sort.startswith('-')
+    if sort.lstrip('-') not in project_sort_keys():
+        return jsonify({'error': f'Unknown sort key {sort!r}'}), 400
+    sort_column, id_column = project_sort_keys()[sort.lstrip('-')]
+    # The same check the response cache uses to let exports bypass it.
+    export = (request.args.get('export') or 'ndjson') if is_export_request(request) else None
+    if export not in (None, 'ndjson', 'json'):
+        return jsonify({'error': f'Unknown export format {export!r}'}), 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        for bound in ('min_rating', 'max_rating'):
+            if request.args.get(bound) is not None:
+                float(request.args[bound])
+    except ValueError:
+        return jsonify({'error': 'limit, min_rating and max_rating must be numbers'}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if request.args.get('bbox'):
+        try:
+            geo.parse_bbox(request.args['bbox'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    derived_tables.ensure_current()
+    query = filtered_projects_query(request.args)
+    query = query.order_by(*keyset_order(sort_column, id_column, descending))
+    if export:
+        # Exports ignore limit/after and stream every matching project.
+        return stream_projects([branch_query(query, clause)
+                                for clause in keyset_branches(sort_column, id_column, descending)],
+                               ndjson=export == 'ndjson')
+
+    sort_value, after_id = None, None
+    if request.args.get('after'):
+        try:
+            sort_value, after_id = decode_cursor(request.args['after'], sort, sort_column)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    rows = []
+    for clause in keyset_branches(sort_column, id_column, descending, sort_value, after_id):
+        rows += branch_query(query, clause).add_columns(sort_column).limit(limit + 1 - len(rows)).all()
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, rows[-1][2], rows[-1][0].id)
+
+    return jsonify({
+        'projects': [serialize_project(p, rating) for p, rating, _ in rows],
+        'next_cursor': next_cursor
+    })
+
+def near_candidates(query, lat, lon, radius_km):
+    """(ids, distances) of the query's projects inside the bounding box of the radius."""
+    rows = (query.with_entities(CarbonProject.id, CarbonProject.latitude, CarbonProject.longitude)
+            .filter(within_box(*geo.bounding_box(lat, lon, radius_km)))
+            .all())
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    values = np.array(rows, dtype=float)
+    return values[:, 0].astype(np.int64), geo.haversine_km(lat, lon, values[:, 1], values[:, 2])
+
+@app.route('/projects/near')
+def get_projects_near():
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius_km = float(request.args['radius_km']) if request.args.get('radius_km') else None
+        k = int(request.args.get('k', DEFAULT_NEAR_K))
+    except KeyError:
+        return jsonify({'error': 'lat and lon are required'}), 400
+    except ValueError:
+        return jsonify({'error': 'lat, lon, radius_km and k must be numbers'}), 400
+    # float() takes 'nan' and 'inf'; a NaN radius matches nothing and an infinite one scans everything.
+    if not all(math.isfinite(value) for value in (lat, lon, radius_km) if value is not None):
+        return jsonify({'error': 'lat, lon and radius_km must be finite'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat must be within [-90, 90] and lon within [-180, 180]'}), 400
+    if radius_km is not None and radius_km <= 0:
+        return jsonify({'error': 'radius_km must be positive'}), 400
+    if request.args.get('bbox'):
+        return jsonify({'error': 'bbox cannot be combined with /projects/near'}), 400
+    k = max(1, min(k, MAX_PAGE_SIZE))
+
+    derived_tables.ensure_current()
+    query = filtered_projects_query(request.args)
+    if radius_km is not None:
+        ids, distances = near_candidates(query, lat, lon, radius_km)
+    else:
+        # Widen the search until it holds k projects; those are the k nearest overall,
+        # since anything outside the radius is further than everything inside it.
+        search_km = NEAR_SEARCH_START_KM
+        while True:
+            ids, distances = near_candidates(query, lat, lon, search_km)
+            if np.count_nonzero(distances <= search_km) >= k or search_km >= geo.MAX_DISTANCE_KM:
+                break
+            search_km *= 4
+        radius_km = search_km
+    selected = geo.nearest(distances, radius_km, k)
+
+    projects = {p.id: (p, rating) for p, rating in query.filter(CarbonProject.id.in_(ids[selected].tolist()))}
+    return jsonify({'projects': [
+        dict(serialize_project(*projects[project_id]), distance_km=round(float(distance), 3))
+        for project_id, distance in zip(ids[selected].tolist(), distances[selected])
+    ]})
+
+AGGREGATE_TABLE = 'co2_by_industry'
+# How far behind its watermark each dbt run re-reads changes; see co2_by_industry.sql.
+AGGREGATE_REFRESH_OVERLAP = timedelta(minutes=int(os.getenv('AGGREGATE_REFRESH_OVERLAP_MINUTES', '15')))
+
+def aggregate_freshness():
+    """Compare the dbt aggregate's watermark with the latest change to its sources."""
+    source_updated_at = max(
+        (ts for ts in (db.session.query(db.func.max(CarbonProject.updated_at)).scalar(),
+                       db.session.query(db.func.max(RemovedProjectSubpart.removed_at)).scalar())
+         if ts is not None),
+        default=None)
+    refreshed_through = None
+    if db.inspect(db.engine).has_table(AGGREGATE_TABLE):
+        refreshed_through = db.session.execute(text(f'SELECT MAX(refreshed_through) FROM {AGGREGATE_TABLE}')).scalar()
+    stale = refreshed_through is None or (source_updated_at is not None and source_updated_at > refreshed_through)
+    return {
+        'refreshed_through': refreshed_through,
+        'source_updated_at': source_updated_at,
+        'stale': stale,
+    }
+
+@app.route('/co2_by_industry/freshness')
+def get_co2_by_industry_freshness():
+    freshness = aggregate_freshness()
+    return jsonify({key: value.isoformat() if hasattr(value, 'isoformat') else value for key, value in freshness.items()})
 
 @app.route('/co2_by_industry')
+@response_cache.cached()
 def get_co2_by_industry():
     ensure_industry_types_loaded()
-    with db.engine.connect() as connection:
-        result = connection.execute(text("SELECT * FROM public.total_co2_by_industry"))
-        co2_by_industry = defaultdict(float)
-        for row in result:
-            industry_types_str = row[0]
-            total_co2 = row[1]
-            for subpart in industry_types_str.split(','):
-                subpart_clean = re.sub(r'\([^)]*\)', '', subpart).strip()
-                subpart_clean = re.sub(r'[^A-Za-z-]', '', subpart_clean)
-                app.logger.debug(f'Processing subpart: "{subpart}" -> Cleaned: "{subpart_clean}"')
-                industry_name = industry_types.get(subpart_clean, subpart_clean)
-                if industry_name == subpart_clean:
-                    app.logger.warning(f'No mapping found for subpart "{subpart_clean}", using original subpart "{subpart_clean}"')
-                else:
-                    app.logger.debug(f'Mapped subpart "{subpart_clean}" to industry name "{industry_name}"')
-                co2_by_industry[industry_name] += total_co2
-
-    co2_by_industry_list = [{'industry_type': industry, 'total_co2': round(total_co2)} for industry, total_co2 in co2_by_industry.items()]
-    
-    co2_by_industry_list.sort(key=lambda x: x['total_co2'], reverse=True)
-    
-    app.logger.debug('CO2 by industry data: %s', co2_by_industry_list)
-    return jsonify({'co2_by_industry': co2_by_industry_list})
+    derived_tables.ensure_current()
+    if not request.args.get('year') and not request.args.get('state') and not aggregate_freshness()['stale']:
+        rows = db.session.execute(text(
+            f'SELECT industry_type, total_co2 FROM {AGGREGATE_TABLE} WHERE project_count > 0 ORDER BY total_co2 DESC'))
+        response = jsonify({'co2_by_industry': [{'industry_type': name, 'total_co2': round(total)} for name, total in rows]})
+        response.headers['X-Aggregate-Source'] = 'dbt'
+        return response
+
+    co2_column = CarbonProject.total_mass_co2_sequestered
+    if request.args.get('year'):
+        if request.args['year'] not in [str(year) for year in rating_engine.YEARS]:
+            return jsonify({'error': f"No data for year {request.args['year']!r}"}), 400
+        co2_column = getattr(CarbonProject, f"total_mass_co2_sequestered_{request.args['year']}")
+
+    industry = db.func.coalesce(IndustryType.name, ProjectSubpart.subpart_code)
+    total_co2 = db.func.sum(co2_column)
+    query = (db.session.query(industry, total_co2)
+             .select_from(ProjectSubpart)
+             .join(CarbonProject, CarbonProject.id == ProjectSubpart.project_id)
+             .outerjoin(IndustryType, IndustryType.subpart_code == ProjectSubpart.subpart_code)
+             .filter(co2_column.isnot(None))
+             .group_by(industry)
+             .order_by(total_co2.desc()))
+    if request.args.get('state'):
+        query = query.filter(CarbonProject.state == request.args['state'])
+
+    co2_by_industry_list = [{'industry_type': name, 'total_co2': round(total)} for name, total in query]
+    response = jsonify({'co2_by_industry': co2_by_industry_list})
+    response.headers['X-Aggregate-Source'] = 'live'
+    return response
+
+@app.route('/projects/<int:id>/series')
+def get_project_series(id):
+    project = CarbonProject.query.get_or_404(id)
+    derived_tables.ensure_current()
+    rows = (db.session.query(ProjectYearTotal.year, ProjectYearTotal.tonnes)
+            .filter(ProjectYearTotal.project_id == id)
+            .order_by(ProjectYearTotal.year))
+    trend = db.session.get(ProjectTrend, id)
+    return jsonify({
+        'project_id': project.id,
+        'facility_name': project.facility_name,
+        'series': [{'year': year, 'tonnes': tonnes} for year, tonnes in rows],
+        'trend': trend.as_dict() if trend else None,
+    })
+
+SERIES_GROUPS = ('state', 'industry')
+
+@app.route('/series')
+@response_cache.cached()
+def get_series():
+    group_by = request.args.get('group_by')
+    if group_by not in SERIES_GROUPS:
+        return jsonify({'error': f"group_by must be one of {', '.join(SERIES_GROUPS)}"}), 400
+    derived_tables.ensure_current()
+    if group_by == 'state':
+        key, name = CarbonProject.state, CarbonProject.state
+        query = db.session.query(key, ProjectYearTotal.year).join(
+            CarbonProject, CarbonProject.id == ProjectYearTotal.project_id)
+    else:
+        key, name = ProjectSubpart.subpart_code, db.func.coalesce(IndustryType.name, ProjectSubpart.subpart_code)
+        query = (db.session.query(key, ProjectYearTotal.year)
+                 .join(ProjectSubpart, ProjectSubpart.project_id == ProjectYearTotal.project_id)
+                 .outerjoin(IndustryType, IndustryType.subpart_code == ProjectSubpart.subpart_code))
+    rows = (query.add_columns(name, db.func.sum(ProjectYearTotal.tonnes), db.func.count(ProjectYearTotal.project_id))
+            .group_by(key, name, ProjectYearTotal.year)
+            .order_by(key, ProjectYearTotal.year))
+
+    groups = []
+    for group_key, year, group_name, tonnes, projects in rows:
+        if not groups or groups[-1]['key'] != group_key:
+            groups.append({'key': group_key, 'name': group_name, 'series': []})
+        groups[-1]['series'].append({'year': year, 'total_tonnes': tonnes, 'projects': projects})
+    return jsonify({'group_by': group_by, 'groups': groups})
+
+@app.route('/ratings/what_if', methods=['POST'])
+def rate_what_if():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or 'weights' not in payload:
+        return jsonify({'error': 'Expected an object with weights'}), 400
+    try:
+        weights = what_if.parse_weights(payload['weights'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    project_ids, after, limit = payload.get('project_ids'), payload.get('after'), payload.get('limit', DEFAULT_PAGE_SIZE)
+    if project_ids is not None and (not isinstance(project_ids, list) or len(project_ids) > MAX_PAGE_SIZE or
+                                    not all(isinstance(i, int) and not isinstance(i, bool) for i in project_ids)):
+        return jsonify({'error': f'project_ids must be an array of at most {MAX_PAGE_SIZE} ids'}), 400
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in (limit, after or 0)):
+        return jsonify({'error': 'limit and after must be integers'}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    derived_tables.ensure_current()
+    cached = what_if.component_scores(project_snapshot.current())
+    if project_ids is not None:
+        missing = [project_id for project_id, found in zip(project_ids, np.isin(project_ids, cached.ids)) if not found]
+        if missing:
+            return jsonify({'error': f"Unknown project ids: {', '.join(map(str, missing))}"}), 404
+        rows = np.searchsorted(cached.ids, np.array(project_ids, dtype=np.int64))
+        next_after = None
+    else:
+        start = np.searchsorted(cached.ids, after, side='right') if after is not None else 0
+        rows = np.arange(start, min(start + limit, len(cached.ids)))
+        next_after = int(cached.ids[rows[-1]]) if start + limit < len(cached.ids) else None
+
+    ratings, ranks = rating_engine.weighted_ratings(cached.scores, weights, rows)
+    ids = cached.ids[rows].tolist()
+    names = dict(db.session.query(CarbonProject.id, CarbonProject.facility_name).filter(CarbonProject.id.in_(ids)))
+    return jsonify({
+        'components': rating_engine.COMPONENTS,
+        'weights': weights.tolist(),
+        'total_projects': len(cached.ids),
+        'projects': [
+            {'id': project_id, 'facility_name': names.get(project_id), 'ratings': project_ratings, 'ranks': project_ranks}
+            for project_id, project_ratings, project_ranks in zip(ids, ratings.tolist(), ranks.tolist())
+        ],
+        'next_after': next_after,
+    })
 
 @app.route('/projects', methods=['POST'])
 def create_project():
     data = request.get_json()
     if not data or 'facility_name' not in data:
         return jsonify({'error': 'Missing data'}), 400
+    if CarbonProject.query.filter_by(facility_name=data['facility_name']).first():
+        return jsonify({'error': 'Project already exists'}), 409
     new_project = CarbonProject(
         facility_name=data['facility_name'],
         city=data.get('city'),
@@ -181,14 +533,29 @@ def create_project():
         duration_years=None
     )
     db.session.add(new_project)
+    db.session.flush()
+    derived_tables.record_saved(new_project)
     db.session.commit()
     return jsonify({'message': 'Project created', 'project': {'id': new_project.id, 'facility_name': new_project.facility_name}}), 201
 
+@app.route('/projects/bulk', methods=['POST'])
+def bulk_edit_projects():
+    try:
+        plan = bulk_projects.validate(request.get_json(silent=True))
+    except bulk_projects.InvalidBulkRequest as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
+    results = bulk_projects.apply(plan)
+    db.session.commit()
+    return jsonify(results)
+
 @app.route('/projects/<int:id>', methods=['PUT'])
 def update_project(id):
     project = CarbonProject.query.get_or_404(id)
+    previous = derived_tables.capture(project)
     data = request.get_json()
     if 'facility_name' in data:
+        if CarbonProject.query.filter(CarbonProject.facility_name == data['facility_name'], CarbonProject.id != id).first():
+            return jsonify({'error': 'Project already exists'}), 409
         project.facility_name = data['facility_name']
     if 'city' in data:
         project.city = data['city']
@@ -208,45 +575,115 @@ def update_project(id):
         project.industry_type = data['industry_type']
     if 'total_mass_co2_sequestered' in data:
         project.total_mass_co2_sequestered = data['total_mass_co2_sequestered']
+    db.session.flush()
+    derived_tables.record_saved(project, previous)
     db.session.commit()
     return jsonify({'message': 'Project updated', 'project': {'facility_name': project.facility_name}})
 
 @app.route('/projects/<int:id>', methods=['DELETE'])
 def delete_project(id):
     project = CarbonProject.query.get_or_404(id)
-    db.session.delete(project)
+    derived_tables.delete_project(project)
     db.session.commit()
     return jsonify({'message': 'Project deleted'})
 
 @app.route('/train_model', methods=['POST'])
 def train_model():
-    data = pd.read_csv('/app/data/CO2 Sequestered 2016-2022.csv')
-    
-    # Train models
-    sklearn_mse = train_sklearn_model(data)
-    tf_loss = train_tensorflow_model(data)
-    pytorch_loss = train_pytorch_model(data)
-    
-    return jsonify({
-        'sklearn_mse': sklearn_mse,
-        'tensorflow_loss': tf_loss,
-        'pytorch_loss': pytorch_loss
-    })
+    options = request.get_json(silent=True) or {}
+    if not isinstance(options, dict) or not all(isinstance(o, dict) for o in options.values()):
+        return jsonify({'error': 'Expected an object mapping model names to training options'}), 400
+    unknown = sorted(set(options) - set(model_backends.enabled_backends()))
+    if unknown:
+        return jsonify({'error': f"Unknown models: {', '.join(unknown)}"}), 400
+    try:
+        for name, model_options in options.items():
+            model_backends.enabled_backends()[name].check_options(model_options)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    job = training_jobs.submit(options)
+    return jsonify({'job_id': job.id, 'status': job.status, 'status_url': f'/train_model/{job.id}'}), 202
+
+@app.route('/train_model/<job_id>', methods=['GET'])
+def training_job_status(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown training job'}), 404
+    return jsonify(job.as_dict())
 
 @app.route('/predict', methods=['POST'])
 def predict():
     input_data = request.json
-    input_df = pd.DataFrame([input_data])
-    
-    sklearn_pred = predict_with_sklearn_model(input_df)
-    tensorflow_pred = predict_with_tensorflow_model(input_df)
-    pytorch_pred = predict_with_pytorch_model(torch.tensor(input_df.values, dtype=torch.float32))
-    
-    return jsonify({
-        'sklearn_prediction': sklearn_pred.tolist(),
-        'tensorflow_prediction': tensorflow_pred.tolist(),
-        'pytorch_prediction': pytorch_pred.tolist()
-    })
+    if not isinstance(input_data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        models = load_models()
+    except FileNotFoundError:
+        return jsonify({'error': 'Models have not been trained'}), 503
+    columns = feature_columns(models)
+    try:
+        features = records_to_matrix([input_data], columns)
+    except InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = {f'{name}_prediction': predictions.tolist()
+                for name, predictions in score_matrix(models, features, columns).items()}
+    response['model_versions'] = {name: info and info['version'] for name, info in model_registry.versions().items()}
+    return jsonify(response)
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    ndjson_in = request.mimetype == 'application/x-ndjson'
+    ndjson_out = ndjson_in or request.accept_mimetypes.best_match(
+        ['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+    try:
+        batch_size = int(request.args.get('batch_size', app.config['PREDICT_BATCH_SIZE']))
+    except ValueError:
+        return jsonify({'error': 'batch_size must be a number'}), 400
+    batch_size = max(1, min(batch_size, MAX_PREDICT_BATCH_SIZE))
+    try:
+        records = parse_records(request.get_data(as_text=True), ndjson_in)
+    except InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        models = load_models()
+    except FileNotFoundError:
+        return jsonify({'error': 'Models have not been trained'}), 503
+    columns = feature_columns(models)
+    try:
+        features = records_to_matrix(records, columns)
+    except InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+    del records
+
+    def generate():
+        if not ndjson_out:
+            yield '{"predictions": ['
+        for start, predictions in predict_batches(models, features, columns, batch_size):
+            names = list(predictions)
+            rows = zip(*(predictions[name].tolist() for name in names))
+            lines = [json.dumps(dict([('index', start + i)] + [(name + '_prediction', value)
+                                                              for name, value in zip(names, row)]))
+                     for i, row in enumerate(rows)]
+            if ndjson_out:
+                yield '\n'.join(lines) + '\n'
+            else:
+                yield (',' if start else '') + ','.join(lines)
+        if not ndjson_out:
+            yield ']}'
+
+    versions = {name: info and info['version'] for name, info in model_registry.versions().items()}
+    mimetype = 'application/x-ndjson' if ndjson_out else 'application/json'
+    response = app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['X-Model-Versions'] = json.dumps(versions)
+    return response
+
+@app.route('/models', methods=['GET'])
+def serving_models():
+    return jsonify(model_registry.versions())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return app.response_class(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -260,6 +697,10 @@ def populate_database():
     print("Checking if database needs to be populated...")
     with app.app_context():
         load_industry_types()
+        subpart_store.seed_industry_types()
+        # Writes only differences, so on startup it just re-keys subparts decoded by older rules.
+        subpart_store.rebuild_project_subparts()
+        db.session.commit()
         if not CarbonProject.query.first():
             print("No projects found, populating database...")
             projects = [
@@ -304,6 +745,7 @@ def populate_database():
                 )
             ]
             db.session.bulk_save_objects(projects)
+            derived_tables.rebuild_all()
             db.session.commit()
             print("Database populated with initial data.")
         else:
@@ -314,5 +756,68 @@ def populate_database():
 def populate_database_command():
     populate_database()
 
+@app.cli.command("aggregate-status")
+@click.option('--prune', is_flag=True, help='Drop removal log rows the dbt aggregate has already absorbed.')
+def aggregate_status_command(prune):
+    freshness = aggregate_freshness()
+    print(f"co2_by_industry refreshed through {freshness['refreshed_through']}, "
+          f"sources updated at {freshness['source_updated_at']}: {'STALE' if freshness['stale'] else 'fresh'}")
+    if prune and freshness['refreshed_through'] is not None:
+        # The next run still re-reads removals inside its overlap window.
+        pruned = (RemovedProjectSubpart.query
+                  .filter(RemovedProjectSubpart.removed_at <= freshness['refreshed_through'] - AGGREGATE_REFRESH_OVERLAP)
+                  .delete(synchronize_session=False))
+        db.session.commit()
+        print(f"Pruned {pruned} removal log rows.")
+
+@app.cli.command("import-report")
+@click.option('--module', default='app', show_default=True, help='Module whose import cost to measure.')
+@click.option('--limit', default=15, show_default=True, help='Number of direct imports to list.')
+def import_report_command(module, limit):
+    print(import_report.format_report(import_report.measure_imports(module), module, limit))
+
+@app.cli.command("export-models")
+def export_models_command():
+    for name, backend in model_backends.BACKENDS.items():
+        if not backend.exported_artifact:
+            continue
+        # Into the model set being served, next to the model it was exported from.
+        path, exported_path = current_artifact_path(backend.path), current_artifact_path(backend.exported_path)
+        if not os.path.exists(path):
+            print(f"Skipping {name}: {path} has not been trained")
+            continue
+        backend.export(backend.load(path), exported_path)
+        print(f"Exported {name} to {exported_path}")
+
+@app.cli.command("search-sklearn")
+@click.option('--space', type=click.File(), help='JSON object mapping parameters to candidate value lists.')
+@click.option('--grid', is_flag=True, help='Try every combination instead of sampling candidates.')
+@click.option('--folds', default=5, show_default=True)
+@click.option('--candidates', default=32, show_default=True)
+@click.option('--max-rows', default=200000, show_default=True)
+@click.option('--n-jobs', default=-1, show_default=True)
+def search_sklearn_command(space, grid, folds, candidates, max_rows, n_jobs):
+    backend = model_backends.BACKENDS['sklearn']
+    # Replaces the sklearn model of the model set being served.
+    path = current_artifact_path(backend.path)
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        write_snapshot(snapshot_dir)
+        mse = backend.module.search_sklearn_model(
+            open_snapshot(snapshot_dir), path, space=space and json.load(space), grid=grid, folds=folds,
+            candidates=candidates, max_rows=max_rows, n_jobs=n_jobs)
+    print(f"Saved best model to {path} (held-out MSE {mse:.4g}); "
+          f"results in {backend.module.search_results_path(path)}")
+
+@app.cli.command("snapshot-projects")
+def snapshot_projects_command():
+    path, manifest = project_snapshot.write_snapshot()
+    print(f"Wrote {manifest['rows']} projects at dataset version {manifest['version']} to {path}")
+
+@app.cli.command("rescore-ratings")
+@click.option('--from-db', is_flag=True, help='Read rating inputs from the database instead of the project snapshot.')
+def rescore_ratings_command(from_db):
+    rating_store.rescore_all_projects(None if from_db else project_snapshot.current())
+    db.session.commit()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,50 @@
+"""python -m benchmarks --database-url sqlite:////tmp/bench.db --rows 1000,10000 --output results.json"""
+import json
+import os
+import sys
+import tempfile
+
+import click
+
+
+@click.command()
+@click.option('--database-url', required=True,
+              help='Database to benchmark against. All of its tables are dropped and recreated.')
+@click.option('--rows', default='1000,10000,100000', show_default=True, help='Comma-separated dataset sizes.')
+@click.option('--requests', default=50, show_default=True, help='Requests per endpoint benchmark.')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--predict', is_flag=True, help='Train models on the first dataset and benchmark /predict.')
+@click.option('--output', default='benchmark-results.json', show_default=True, type=click.Path())
+@click.option('--compare', 'baseline', type=click.File(), help='Earlier results to check for regressions.')
+@click.option('--threshold', default=0.2, show_default=True, help='Allowed p50 slowdown against --compare.')
+def main(database_url, rows, requests, seed, predict, output, baseline, threshold):
+    # The app reads these at import time.
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    model_dir = None
+    if predict and 'MODEL_DIR' not in os.environ:
+        model_dir = tempfile.TemporaryDirectory(prefix='benchmark-models-')
+        os.environ['MODEL_DIR'] = model_dir.name
+
+    from benchmarks.suite import compare_results, run_suite
+
+    results = run_suite([int(size) for size in rows.split(',')], requests, seed, predict)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    click.echo(f'Wrote {len(results["results"])} results to {output}')
+
+    if baseline:
+        baseline = json.load(baseline)
+        if baseline['database'] != results['database']:
+            click.echo(f"Warning: comparing {results['database']} against a {baseline['database']} baseline")
+        regressions = compare_results(baseline, results, threshold)
+        for r in regressions:
+            click.echo(f"REGRESSION {r['benchmark']} @ {r['rows']} rows: "
+                       f"{r['baseline']}ms -> {r['current']}ms ({r['change']:+.0%})")
+        sys.exit(1 if regressions else 0)
+    if model_dir:
+        model_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""Loader, rating and endpoint benchmarks over synthetic data.
+
+Endpoints are driven in-process through the Flask test client, so latencies
+cover the application and database but not the network or the Express proxy.
+The suite drops and recreates every table of the configured database.
+"""
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.synthetic import write_csv
+
+INDUSTRY_TYPES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                                   'Industry Types.csv')
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REQUESTS = 50
+# Row-by-row load_data issues a query per row; larger sizes only run the bulk loader.
+ROW_BY_ROW_LIMIT = 10000
+RATING_SAMPLE = 20
+DEEP_PAGES = 10
+PREDICT_BATCH = 1000
+
+
+def summarize(name, rows, durations, items=1):
+    """Latency percentiles in milliseconds and throughput in items per second."""
+    durations = np.asarray(durations, dtype=float)
+    total = float(durations.sum())
+    p50, p90, p99 = np.percentile(durations * 1000, [50, 90, 99])
+    return {
+        'benchmark': name,
+        'rows': rows,
+        'iterations': len(durations),
+        'total_seconds': round(total, 6),
+        'throughput_per_second': round(len(durations) * items / total, 3) if total else None,
+        'mean_ms': round(float(durations.mean()) * 1000, 3),
+        'p50_ms': round(float(p50), 3),
+        'p90_ms': round(float(p90), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(durations.max()) * 1000, 3),
+    }
+
+
+def timed(fn, iterations):
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def reset_database():
+    from app import db
+    from load_data import load_industry_types
+    import subpart_store
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    load_industry_types(INDUSTRY_TYPES_FILE)
+    subpart_store.seed_industry_types()
+    db.session.commit()
+
+
+def _get(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return response
+
+
+def bench_loaders(rows, csv_path):
+    from load_data import bulk_load_data, load_data
+    results = []
+    if rows <= ROW_BY_ROW_LIMIT:
+        reset_database()
+        results.append(summarize('load_data', rows, timed(lambda: load_data(csv_path), 1), items=rows))
+    reset_database()
+    results.append(summarize('bulk_load_data', rows, timed(lambda: bulk_load_data(csv_path), 1), items=rows))
+    return results
+
+
+def bench_ratings(rows):
+    from app import CarbonProject
+    import rating_engine
+    import rating_store
+    projects = CarbonProject.query.all()
+    sample = projects[:RATING_SAMPLE]
+    return [
+        summarize('compute_ratings', rows, timed(lambda: rating_engine.compute_ratings(projects), 5), items=rows),
+        summarize('calculate_raw_rating', rows,
+                  timed(lambda: [p.calculate_raw_rating(projects) for p in sample], 1), items=len(sample)),
+        summarize('rescore_all_projects', rows, timed(rating_store.rescore_all_projects, 1), items=rows),
+    ]
+
+
+def bench_endpoints(rows, client, requests):
+    def deep_pages():
+        cursor = None
+        for _ in range(DEEP_PAGES):
+            url = '/projects?limit=50' + (f'&after={cursor}' if cursor else '')
+            cursor = _get(client, url).get_json()['next_cursor']
+            if cursor is None:
+                break
+
+    return [
+        summarize('GET /projects', rows, timed(lambda: _get(client, '/projects'), requests)),
+        summarize('GET /projects?state&sort', rows,
+                  timed(lambda: _get(client, '/projects?state=TX&sort=-total_co2&limit=100'), requests)),
+        summarize('GET /projects 10 pages', rows, timed(deep_pages, max(1, requests // 10)), items=DEEP_PAGES),
+        summarize('GET /projects?export=ndjson', rows,
+                  timed(lambda: _get(client, '/projects?export=ndjson').get_data(), 1), items=rows),
+        summarize('GET /co2_by_industry', rows, timed(lambda: _get(client, '/co2_by_industry'), requests)),
+    ]
+
+
+def bench_cached_endpoints(rows, client, requests):
+    """Repeated reads served from the response cache, warmed by one request each."""
+    urls = {'GET /projects (cached)': '/projects',
+            'GET /co2_by_industry (cached)': '/co2_by_industry'}
+    results = []
+    for name, url in urls.items():
+        _get(client, url)
+        results.append(summarize(name, rows, timed(lambda: _get(client, url), requests)))
+    return results
+
+
+def train_models():
+    """Train every enabled backend on the current table through a training job, for the /predict benchmarks."""
+    from ml_models.jobs import TrainingJobQueue
+    job = TrainingJobQueue().submit()
+    while not job.finished:
+        time.sleep(0.5)
+    if job.status != 'succeeded':
+        raise RuntimeError(f'Training failed: {job.as_dict()}')
+
+
+def bench_predict(rows, client, requests):
+    from ml_models.training_data import FEATURE_COLUMNS
+    rng = np.random.default_rng(0)
+    records = [dict(zip(FEATURE_COLUMNS, map(float, values)))
+               for values in rng.random((PREDICT_BATCH, len(FEATURE_COLUMNS))) * 1000]
+
+    def post(url, payload):
+        response = client.post(url, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'POST {url} returned {response.status_code}')
+        return response.get_data()
+
+    # The first call loads the models; that is not part of steady-state latency.
+    post('/predict', records[0])
+    return [
+        summarize('POST /predict', rows, timed(lambda: post('/predict', records[0]), requests)),
+        summarize('POST /predict/batch', rows, timed(lambda: post('/predict/batch', records), max(1, requests // 10)),
+                  items=PREDICT_BATCH),
+    ]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES, requests=DEFAULT_REQUESTS, seed=0, predict=False):
+    from app import app, db
+    results = []
+    with app.app_context(), tempfile.TemporaryDirectory() as tmp:
+        client = app.test_client()
+        for rows in sizes:
+            print(f'Benchmarking {rows} rows on {db.engine.dialect.name}', file=sys.stderr)
+            csv_path = write_csv(os.path.join(tmp, f'projects_{rows}.csv'), rows, seed)
+            results += bench_loaders(rows, csv_path)
+            results += bench_ratings(rows)
+            # Identical repeated GETs would otherwise be timed as cache hits and hide the view code.
+            app.config['RESPONSE_CACHE'] = False
+            try:
+                results += bench_endpoints(rows, client, requests)
+            finally:
+                app.config['RESPONSE_CACHE'] = True
+            results += bench_cached_endpoints(rows, client, requests)
+            if predict:
+                if rows == sizes[0]:
+                    train_models()
+                results += bench_predict(rows, client, requests)
+        dialect = db.engine.dialect.name
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'database': dialect,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'sizes': list(sizes),
+        'requests': requests,
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.2, metric='p50_ms'):
+    """Benchmarks whose metric grew by more than threshold (a fraction) over the baseline run."""
+    before = {(r['benchmark'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        previous = before.get((result['benchmark'], result['rows']))
+        if previous and previous[metric] and result[metric] > previous[metric] * (1 + threshold):
+            regressions.append({'benchmark': result['benchmark'], 'rows': result['rows'], 'metric': metric,
+                                'baseline': previous[metric], 'current': result[metric],
+                                'change': round(result[metric] / previous[metric] - 1, 3)})
+    return regressions
@@ -0,0 +1,75 @@
+"""Reproducible synthetic carbon projects in the layout of the EPA CSV that load_data reads."""
+import csv
+
+import numpy as np
+
+from rating_engine import YEARS
+
+CSV_HEADER = (['Facility Name', 'City', 'State', 'Zip Code', 'Address', 'County', 'Latitude', 'Longitude',
+               'Industry Type (subparts)']
+              + [field for year in YEARS for field in (f'{year} Total Mass CO2 Sequestered',
+                                                       f'{year} Data Reported As Of')])
+
+# Subparts weighted roughly as they appear in the real data: RR dominates, UU and
+# combustion/supply subparts follow, and a long tail of other industries.
+SUBPARTS = ['RR', 'UU', 'C', 'PP', 'W-PROC', 'W-GB', 'D', 'P', 'Y', 'G', 'HH', 'II', 'TT']
+SUBPART_WEIGHTS = np.array([30, 20, 15, 10, 6, 5, 4, 3, 2, 2, 1, 1, 1], dtype=float)
+SUBPART_WEIGHTS /= SUBPART_WEIGHTS.sum()
+
+STATES = ['TX', 'NM', 'WY', 'OK', 'CO', 'IL', 'LA', 'ND', 'MS', 'KS', 'CA', 'MI', 'UT', 'MT', 'AL']
+
+# Continental US
+LATITUDE_RANGE = (25.0, 49.0)
+LONGITUDE_RANGE = (-124.0, -67.0)
+
+GAP_PROBABILITY = 0.1
+
+
+def _industry_type(rng):
+    codes = rng.choice(SUBPARTS, size=rng.integers(1, 4), replace=False, p=SUBPART_WEIGHTS)
+    return ','.join(f'{code} (RPT)' if code == 'RR' and rng.random() < 0.5 else str(code) for code in codes)
+
+
+def _yearly_series(rng):
+    """Reports from a random first year through 2022, with occasional missing years
+    and a level that drifts year to year."""
+    first = rng.integers(0, len(YEARS))
+    level = rng.lognormal(mean=11, sigma=1.5)
+    series = []
+    for i in range(len(YEARS)):
+        if i < first or (i < len(YEARS) - 1 and rng.random() < GAP_PROBABILITY):
+            series.append(None)
+        else:
+            series.append(round(level * rng.uniform(0.7, 1.3), 1))
+    return series
+
+
+def generate_rows(count, seed=0):
+    """Yield count CSV rows; the same seed always yields the same rows."""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        state = STATES[rng.integers(len(STATES))]
+        row = {
+            'Facility Name': f'Synthetic Facility {i:07d}',
+            'City': f'City {rng.integers(500)}',
+            'State': state,
+            'Zip Code': f'{rng.integers(10000, 99999)}',
+            'Address': f'{rng.integers(1, 9999)} Synthetic Rd',
+            'County': f'{state} COUNTY {rng.integers(40)}',
+            'Latitude': round(rng.uniform(*LATITUDE_RANGE), 5),
+            'Longitude': round(rng.uniform(*LONGITUDE_RANGE), 5),
+            'Industry Type (subparts)': _industry_type(rng),
+        }
+        for year, value in zip(YEARS, _yearly_series(rng)):
+            row[f'{year} Total Mass CO2 Sequestered'] = '' if value is None else value
+            row[f'{year} Data Reported As Of'] = '' if value is None else f'8/18/{(year + 1) % 100}'
+        yield row
+
+
+def write_csv(path, count, seed=0):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
+        writer.writeheader()
+        writer.writerows(generate_rows(count, seed))
+    return path
+
@@ -0,0 +1,216 @@
+"""Validation and set-based application of batched project creates, updates and deletes.
+
+A batch is checked in full before anything is written, and is then applied with a
+handful of multi-row statements in the caller's transaction, so it either lands
+whole or not at all.
+"""
+import math
+from collections import Counter, namedtuple
+
+from sqlalchemy import case, insert, update
+
+from load_data import MAX_DURATION_YEARS, count_duration_years
+from rating_engine import YEAR_COLUMNS
+
+MAX_BULK_ITEMS = 50000
+OPERATIONS = ('create', 'update', 'delete')
+
+TEXT_FIELDS = ('facility_name', 'city', 'state', 'zip_code', 'address', 'county', 'industry_type')
+FLOAT_FIELDS = ('latitude', 'longitude', 'total_mass_co2_sequestered') + tuple(YEAR_COLUMNS)
+EDITABLE_FIELDS = TEXT_FIELDS + FLOAT_FIELDS
+
+# Existence checks look rows up in chunks, within every backend's bound-parameter limit.
+LOOKUP_CHUNK_SIZE = 5000
+
+BulkPlan = namedtuple('BulkPlan', ['creates', 'updates', 'deletes'])
+
+# As in load_data.parse_row, the total defaults to the latest year's.
+LATEST_YEAR_COLUMN = YEAR_COLUMNS[-1]
+
+
+class InvalidBulkRequest(ValueError):
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _text_lengths():
+    from app import CarbonProject
+    return {field: CarbonProject.__table__.c[field].type.length for field in TEXT_FIELDS}
+
+
+def clean_fields(item, lengths):
+    """The editable fields of one create or update item, coerced to column types."""
+    unknown = sorted(set(item) - set(EDITABLE_FIELDS) - {'id'})
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    values = {}
+    for field in TEXT_FIELDS:
+        if field in item:
+            value = item[field]
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f'{field} must be a string')
+            if value is not None and lengths[field] and len(value) > lengths[field]:
+                raise ValueError(f'{field} is longer than {lengths[field]} characters')
+            values[field] = value
+    for field in FLOAT_FIELDS:
+        if field in item:
+            value = item[field]
+            if value is None or value == '':
+                values[field] = None
+                continue
+            if isinstance(value, bool):
+                raise ValueError(f'{field} must be a number')
+            try:
+                number = float(value)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f'{field} must be a number')
+            # NaN or infinite tonnages would poison the rating bounds.
+            if not math.isfinite(number):
+                raise ValueError(f'{field} must be a finite number')
+            values[field] = number
+    if 'facility_name' in values and not values['facility_name']:
+        raise ValueError('facility_name cannot be empty')
+    return values
+
+
+def _existing_ids(ids):
+    from app import db, CarbonProject
+    found = set()
+    for chunk in _chunks(ids):
+        found.update(project_id for project_id, in db.session.query(CarbonProject.id).filter(CarbonProject.id.in_(chunk)))
+    return found
+
+
+def _ids_by_name(names):
+    from app import db, CarbonProject
+    found = {}
+    for chunk in _chunks(names):
+        found.update(db.session.query(CarbonProject.facility_name, CarbonProject.id)
+                     .filter(CarbonProject.facility_name.in_(chunk)))
+    return found
+
+
+def validate(payload):
+    """Check a {'create': [...], 'update': [...], 'delete': [...]} batch against the table.
+
+    Returns a BulkPlan, or raises InvalidBulkRequest listing every failing item as
+    {'op', 'index', 'error'}.
+    """
+    if not isinstance(payload, dict) or not set(payload) <= set(OPERATIONS):
+        raise InvalidBulkRequest(f"Expected an object with any of {', '.join(OPERATIONS)}")
+    items = {op: [] if payload.get(op) is None else payload[op] for op in OPERATIONS}
+    if not all(isinstance(value, list) for value in items.values()):
+        raise InvalidBulkRequest(f"{', '.join(OPERATIONS)} must be arrays")
+    if sum(map(len, items.values())) > MAX_BULK_ITEMS:
+        raise InvalidBulkRequest(f'A batch holds at most {MAX_BULK_ITEMS} items')
+
+    errors = []
+    lengths = _text_lengths()
+    creates, updates, deletes = {}, {}, {}
+    for op, cleaned in (('create', creates), ('update', updates)):
+        for index, item in enumerate(items[op]):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('Expected an object')
+                if op == 'create':
+                    if 'id' in item:
+                        raise ValueError('id cannot be set on create')
+                    if not item.get('facility_name'):
+                        raise ValueError('Missing facility_name')
+                elif not isinstance(item.get('id'), int) or isinstance(item.get('id'), bool):
+                    raise ValueError('id must be an integer')
+                cleaned[index] = clean_fields(item, lengths)
+            except ValueError as e:
+                errors.append({'op': op, 'index': index, 'error': str(e)})
+    for index, project_id in enumerate(items['delete']):
+        if isinstance(project_id, int) and not isinstance(project_id, bool):
+            deletes[index] = project_id
+        else:
+            errors.append({'op': 'delete', 'index': index, 'error': 'Expected a project id'})
+
+    update_ids = {index: items['update'][index]['id'] for index in updates}
+    targets = list(update_ids.values()) + list(deletes.values())
+    existing = _existing_ids(set(targets))
+    repeated = {project_id for project_id, count in Counter(targets).items() if count > 1}
+    for op, ids in (('update', update_ids), ('delete', deletes)):
+        for index, project_id in ids.items():
+            if project_id not in existing:
+                errors.append({'op': op, 'index': index, 'error': 'Not found'})
+            elif project_id in repeated:
+                errors.append({'op': op, 'index': index, 'error': f'Project {project_id} appears more than once'})
+
+    # A name is taken if another item claims it, or another project holds it and is not
+    # deleted by this batch. Names freed by renames in the same batch stay taken, since
+    # the order renames are applied in would decide whether they collide.
+    claims = [('create', index, values['facility_name'], None) for index, values in creates.items()]
+    claims += [('update', index, values['facility_name'], update_ids[index])
+               for index, values in updates.items() if 'facility_name' in values]
+    claimed = Counter(name for _, _, name, _ in claims)
+    released = set(deletes.values())
+    holders = _ids_by_name({name for _, _, name, _ in claims})
+    for op, index, name, project_id in claims:
+        holder = holders.get(name)
+        if claimed[name] > 1 or (holder is not None and holder != project_id and holder not in released):
+            errors.append({'op': op, 'index': index, 'error': 'Project already exists'})
+
+    if errors:
+        raise InvalidBulkRequest('Invalid batch; nothing was applied',
+                                 sorted(errors, key=lambda e: (OPERATIONS.index(e['op']), e['index'])))
+    return BulkPlan(creates=[creates[i] for i in sorted(creates)],
+                    updates=[dict(updates[i], id=update_ids[i]) for i in sorted(updates)],
+                    deletes=[deletes[i] for i in sorted(deletes)])
+
+
+def _with_latest_total(values):
+    if LATEST_YEAR_COLUMN in values and 'total_mass_co2_sequestered' not in values:
+        return dict(values, total_mass_co2_sequestered=values[LATEST_YEAR_COLUMN])
+    return values
+
+
+def _duration_years_expression(model):
+    """count_duration_years over a row's yearly columns, as SQL."""
+    reported = sum(case((getattr(model, column).isnot(None), 1), else_=0) for column in YEAR_COLUMNS)
+    return case((reported > MAX_DURATION_YEARS, MAX_DURATION_YEARS), else_=reported)
+
+
+def apply(plan):
+    """Write a validated plan and bring the derived tables up to date. Does not commit.
+
+    Returns per-item results in request order for each operation.
+    """
+    from app import db, CarbonProject
+    import derived_tables
+    if plan.deletes:
+        derived_tables.delete_projects(plan.deletes)
+    updates = [_with_latest_total(values) for values in plan.updates if len(values) > 1]
+    if updates:
+        db.session.execute(update(CarbonProject), updates)
+        # Duration counts every yearly column, including those the update left alone.
+        yearly_ids = [values['id'] for values in updates if not set(YEAR_COLUMNS).isdisjoint(values)]
+        for chunk in _chunks(yearly_ids):
+            db.session.execute(update(CarbonProject).where(CarbonProject.id.in_(chunk))
+                               .values(duration_years=_duration_years_expression(CarbonProject)))
+    created_ids = []
+    if plan.creates:
+        rows = []
+        for values in plan.creates:
+            row = dict({field: None for field in EDITABLE_FIELDS}, **_with_latest_total(values))
+            row['duration_years'] = count_duration_years(row[column] for column in YEAR_COLUMNS)
+            rows.append(row)
+        created_ids = list(db.session.scalars(
+            insert(CarbonProject).returning(CarbonProject.id, sort_by_parameter_order=True), rows))
+    if plan.creates or plan.updates or plan.deletes:
+        derived_tables.record_saved_many(created_ids + [values['id'] for values in plan.updates])
+
+    return {
+        'created': [{'index': i, 'id': project_id} for i, project_id in enumerate(created_ids)],
+        'updated': [{'index': i, 'id': values['id']} for i, values in enumerate(plan.updates)],
+        'deleted': [{'index': i, 'id': project_id} for i, project_id in enumerate(plan.deletes)],
+    }
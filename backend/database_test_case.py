@@ -0,0 +1,36 @@
+"""Shared fixture for tests that run the app against a fresh in-memory SQLite schema."""
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import derived_tables
+from app import app, db
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Creates every table before each test and drops them after it.
+
+    Subclasses return their starting rows from make_projects(). The rows are added with
+    their derived tables built, and their ids are kept in self.ids in the same order.
+    """
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            projects = self.make_projects()
+            db.session.add_all(projects)
+            db.session.flush()
+            derived_tables.rebuild_all()
+            db.session.commit()
+            self.ids = [project.id for project in projects]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def make_projects(self):
+        return []
@@ -0,0 +1,42 @@
+"""A counter bumped in the same transaction as every write to carbon_project.
+
+Readers compare it rather than the data: cached responses and ETags are keyed on the
+version, so they go stale exactly when a write commits, in every worker at once.
+"""
+import random
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+VERSION_ROW_ID = 1
+
+
+def _initial_version():
+    # A fresh table (a new database, or tests recreating one) starts at a random point,
+    # so versions from a previous incarnation never match its cached responses.
+    return random.getrandbits(52)
+
+
+def current():
+    from app import db, DatasetVersion
+    version = db.session.query(DatasetVersion.version).filter(DatasetVersion.id == VERSION_ROW_ID).scalar()
+    if version is not None:
+        return version
+    try:
+        db.session.add(DatasetVersion(id=VERSION_ROW_ID, version=_initial_version()))
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created the row first.
+        db.session.rollback()
+    return db.session.query(DatasetVersion.version).filter(DatasetVersion.id == VERSION_ROW_ID).scalar()
+
+
+def bump():
+    """Advance the version. Commits with the caller's transaction."""
+    from app import db, DatasetVersion
+    result = db.session.execute(update(DatasetVersion)
+                                .where(DatasetVersion.id == VERSION_ROW_ID)
+                                .values(version=DatasetVersion.version + 1)
+                                .execution_options(synchronize_session=False))
+    if result.rowcount == 0:
+        db.session.add(DatasetVersion(id=VERSION_ROW_ID, version=_initial_version()))
@@ -0,0 +1,69 @@
+"""Keeps the tables derived from carbon_project in step with every write path."""
+from sqlalchemy import delete
+
+import dataset_version
+import rating_store
+import series_store
+import subpart_store
+
+# Keeps IN (...) lists within every backend's bound-parameter limit.
+ID_CHUNK_SIZE = 5000
+
+
+def ensure_current():
+    rating_store.ensure_ratings_current()
+    subpart_store.ensure_subparts_current()
+    series_store.ensure_series_current()
+
+
+def capture(project):
+    """State needed by record_saved, taken before the project changes."""
+    return rating_store.previous_state(project)
+
+
+def record_saved(project, previous=None):
+    dataset_version.bump()
+    rating_store.record_project_saved(project, previous)
+    subpart_store.record_project_subparts(project)
+    series_store.record_project_series(project)
+
+
+def record_saved_many(project_ids):
+    """Set-based record_saved for projects written in bulk: one rescore, then
+    subparts and series for just those projects."""
+    dataset_version.bump()
+    rating_store.rescore_all_projects()
+    for start in range(0, len(project_ids), ID_CHUNK_SIZE):
+        chunk = project_ids[start:start + ID_CHUNK_SIZE]
+        subpart_store.record_subparts(chunk)
+        series_store.record_series(chunk)
+
+
+def delete_project(project):
+    from app import db
+    dataset_version.bump()
+    previous = rating_store.previous_state(project)
+    subpart_store.remove_project_subparts([project.id])
+    series_store.remove_project_series([project.id])
+    db.session.delete(project)
+    db.session.flush()
+    rating_store.record_project_deleted(project.id, previous)
+
+
+def delete_projects(project_ids):
+    """Set-based delete; ratings are left for the caller's rebuild_all() or record_saved_many()."""
+    from app import db, CarbonProject, ProjectRating
+    dataset_version.bump()
+    for start in range(0, len(project_ids), ID_CHUNK_SIZE):
+        chunk = project_ids[start:start + ID_CHUNK_SIZE]
+        subpart_store.remove_project_subparts(chunk)
+        series_store.remove_project_series(chunk)
+        db.session.execute(delete(ProjectRating).where(ProjectRating.project_id.in_(chunk)))
+        db.session.execute(delete(CarbonProject).where(CarbonProject.id.in_(chunk)))
+
+
+def rebuild_all():
+    dataset_version.bump()
+    rating_store.rescore_all_projects()
+    subpart_store.rebuild_project_subparts()
+    series_store.rebuild_series()
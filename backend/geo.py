@@ -0,0 +1,69 @@
+"""Great-circle distances and the bounding boxes used to prefilter them in SQL.
+
+A radius query first selects projects inside the box around the circle, which the
+(latitude, longitude) index answers as a range scan, then computes exact haversine
+distances over just those candidates with NumPy.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distances in km from (lat, lon) to each of lats/lons, all in degrees."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, lon_ranges) enclosing every point within radius_km of (lat, lon).
+
+    lon_ranges holds one (min_lon, max_lon) pair, or two when the box crosses the antimeridian.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat, max_lat = lat - math.degrees(angular), lat + math.degrees(angular)
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle contains a pole, so it spans every longitude.
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    return min_lat, max_lat, longitude_ranges(lon - delta_lon, lon + delta_lon)
+
+
+def longitude_ranges(min_lon, max_lon):
+    """Split a longitude interval that runs past ±180 into ranges within [-180, 180]."""
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> (min_lat, max_lat, lon_ranges).
+
+    A min_lon greater than max_lon is a viewport that crosses the antimeridian.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat within valid coordinates')
+    if min_lon > max_lon:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
+def nearest(distances, radius_km=None, k=None):
+    """Indices of distances within radius_km, nearest first, at most k of them."""
+    candidates = np.arange(len(distances)) if radius_km is None else np.flatnonzero(distances <= radius_km)
+    if k is not None and k < len(candidates):
+        candidates = candidates[np.argpartition(distances[candidates], k - 1)[:k]]
+    return candidates[np.argsort(distances[candidates], kind='stable')]
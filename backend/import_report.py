@@ -0,0 +1,53 @@
+"""Per-module import cost of the backend, measured with python -X importtime."""
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+
+ImportCost = namedtuple('ImportCost', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)\s*$')
+
+
+def parse_importtime(output):
+    costs = []
+    for line in output.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            costs.append(ImportCost(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return costs
+
+
+def measure_imports(module='app'):
+    """Import module in a fresh interpreter and return the cost of everything it imported."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def direct_imports(costs, module):
+    """Cost of each module imported directly by module, heaviest first.
+
+    importtime prints a module after its dependencies, so the direct imports of
+    module are the entries one level deeper that precede it.
+    """
+    direct = []
+    for i, cost in enumerate(costs):
+        if cost.module == module:
+            for dependency in reversed(costs[:i]):
+                if dependency.depth <= cost.depth:
+                    break
+                if dependency.depth == cost.depth + 1:
+                    direct.append(dependency)
+            return cost, sorted(direct, key=lambda c: c.cumulative_us, reverse=True)
+    raise ValueError('%s was not imported' % module)
+
+
+def format_report(costs, module='app', limit=15):
+    total, direct = direct_imports(costs, module)
+    lines = ['Importing %s took %.3fs (%d modules)' % (module, total.cumulative_us / 1e6, len(costs))]
+    lines += ['  %8.3fs  %s' % (cost.cumulative_us / 1e6, cost.module) for cost in direct[:limit]]
+    return '\n'.join(lines)
@@ -0,0 +1,75 @@
+import logging
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+NOTE_PATTERN = re.compile(r'\([^)]*\)')
+# Hyphens, en and em dashes and the minus sign, with any spacing around them.
+DASH_PATTERN = re.compile(r'\s*[-\u2010-\u2015\u2212]\s*')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+NON_CODE_PATTERN = re.compile(r'[^A-Za-z -]')
+
+# Subparts shown as several names in project listings.
+DISPLAY_EXPANSIONS = {'RR': ('Geologic Sequestration of Carbon Dioxide', 'CO2 Injection')}
+
+DISPLAY_NAME_LENGTH = 30
+
+
+def clean_subpart(subpart):
+    """'RR (RPT)' -> 'RR', 'MM – REF' -> 'MM-REF': drop parenthesised notes, write every dash
+    as '-' and keep only letters, '-' and single inner spaces."""
+    subpart = WHITESPACE_PATTERN.sub(' ', DASH_PATTERN.sub('-', NOTE_PATTERN.sub('', subpart)))
+    return NON_CODE_PATTERN.sub('', subpart).strip()
+
+
+def truncate_with_ellipsis(text, max_length):
+    return text if len(text) <= max_length else text[:max_length] + '...'
+
+
+class IndustryDecoder:
+    """Decodes raw industry_type strings such as "C,PP,RR (RPT)" into subpart codes
+    and industry names. Results are cached per raw string in a bounded LRU and must
+    be invalidated whenever the subpart mapping changes.
+
+    Names are cached per mapping generation. A decode that read the old mapping can
+    finish after invalidate(), but its result lands under the old generation and is
+    never served again."""
+
+    def __init__(self, industry_types, maxsize=1024):
+        self.industry_types = industry_types
+        self.generation = 0
+        self.codes = lru_cache(maxsize=maxsize)(self._codes)
+        self._cached_names = lru_cache(maxsize=maxsize)(self._names)
+        self._cached_format = lru_cache(maxsize=maxsize)(self._format)
+
+    def invalidate(self):
+        """Call once the mapping has changed; decodes started before then are not reused."""
+        self.generation += 1
+        for cached in (self._cached_names, self._cached_format):
+            cached.cache_clear()
+
+    def names(self, industry_type):
+        return self._cached_names(self.generation, industry_type)
+
+    def format(self, industry_type):
+        return self._cached_format(self.generation, industry_type)
+
+    def _codes(self, industry_type):
+        return tuple(code for code in (clean_subpart(part) for part in industry_type.split(',')) if code)
+
+    def _names(self, generation, industry_type):
+        names = []
+        for code in self.codes(industry_type):
+            name = self.industry_types.get(code)
+            if name is None:
+                logger.warning('No mapping found for subpart "%s", using original subpart "%s"', code, code)
+                name = code
+            names.append(name)
+        return tuple(names)
+
+    def _format(self, generation, industry_type):
+        names = []
+        for code, name in zip(self.codes(industry_type), self._cached_names(generation, industry_type)):
+            names.extend(DISPLAY_EXPANSIONS.get(code, (name,)))
+        return ',\n'.join(truncate_with_ellipsis(name, DISPLAY_NAME_LENGTH) for name in names)
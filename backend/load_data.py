@@ -1,29 +1,86 @@
 import logging
 import csv
+import hashlib
+import io
+import json
+import threading
+import time
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+import click
+from industry_decoder import IndustryDecoder, clean_subpart
+from rating_engine import YEARS
+from sqlalchemy import Column, Integer, MetaData, Table, func, insert, or_, select, update
+
+logger = logging.getLogger(__name__)
 
 industry_types = {}
+_industry_types_lock = threading.Lock()
+industry_decoder = IndustryDecoder(industry_types)
+
+INDUSTRY_TYPES_FILE = '/app/data/Industry Types.csv'
 
-def load_industry_types():
-    global industry_types
-    filepath = '/app/data/Industry Types.csv'
+def load_industry_types(filepath=INDUSTRY_TYPES_FILE):
+    loaded = {}
     with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
         reader = csv.DictReader(csvfile)
         headers = reader.fieldnames
-        logging.debug(f"CSV Headers: {headers}")
+        logger.debug("CSV Headers: %s", headers)
         for row in reader:
             try:
-                industry_types[row['Subpart Letter']] = row['Name of industry']
-                logging.debug(f"Loaded industry type: {row['Subpart Letter']} -> {row['Name of industry']}")
+                # Keyed like decoded codes, so 'MM – REF' in the file matches 'MM-REF'.
+                loaded[clean_subpart(row['Subpart Letter'])] = row['Name of industry']
+                logger.debug("Loaded industry type: %s -> %s", row['Subpart Letter'], row['Name of industry'])
             except KeyError as e:
-                logging.error(f"KeyError: {e} - Row: {row}")
-    logging.debug("Industry types loaded successfully.")
-    logging.debug(f"All loaded industry types: {industry_types}")
+                logger.error("KeyError: %s - Row: %s", e, row)
+    # The file is read in full before the shared mapping changes, and the mapping is never
+    # empty while it does, so concurrent decodes see the old names or the new ones.
+    with _industry_types_lock:
+        industry_types.update(loaded)
+        for code in set(industry_types) - set(loaded):
+            del industry_types[code]
+        # Moves the decoder to a new generation, so names decoded from the old mapping are not served.
+        industry_decoder.invalidate()
+    logger.debug("Loaded %d industry types.", len(industry_types))
+
+DATA_FILE = '/app/data/CO2 Sequestered 2016-2022.csv'
+YEAR_FIELDS = {f'{year} Total Mass CO2 Sequestered': f'total_mass_co2_sequestered_{year}' for year in YEARS}
+BULK_CHUNK_SIZE = 5000
+
+MAX_DURATION_YEARS = 5
 
-def load_data():
+def count_duration_years(yearly_values):
+    """Years with a reported total, capped where the duration scale tops out at '5+ years'."""
+    return min(sum(1 for value in yearly_values if value not in (None, '')), MAX_DURATION_YEARS)
+
+def parse_row(row):
+    duration_years = count_duration_years(row[field] for field in YEAR_FIELDS)
+    values = {
+        'facility_name': row['Facility Name'],
+        'city': row['City'],
+        'state': row['State'],
+        'zip_code': row['Zip Code'],
+        'address': row['Address'],
+        'county': row['County'],
+        'latitude': float(row['Latitude']),
+        'longitude': float(row['Longitude']),
+        'industry_type': row['Industry Type (subparts)'],
+        'total_mass_co2_sequestered': float(row['2022 Total Mass CO2 Sequestered']),
+        'duration_years': duration_years,
+    }
+    for field, column in YEAR_FIELDS.items():
+        values[column] = float(row[field]) if row[field] else None
+    values['content_hash'] = content_hash(values)
+    return values
+
+def content_hash(values):
+    """Fingerprint of a parsed CSV row, stored to detect changed rows on the next sync."""
+    payload = json.dumps([values[column] for column in sorted(values) if column != 'content_hash'])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_data(filepath=DATA_FILE):
     from app import db, CarbonProject
-    filepath = '/app/data/CO2 Sequestered 2016-2022.csv'
+    import derived_tables
+    added = 0
     with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
@@ -32,40 +89,200 @@ def load_data():
             if existing_project:
                 continue  # Skip adding if the project already exists
 
-            duration_years = sum(1 for year in ['2016 Total Mass CO2 Sequestered', '2017 Total Mass CO2 Sequestered', 
-                                                '2018 Total Mass CO2 Sequestered', '2019 Total Mass CO2 Sequestered',
-                                                '2020 Total Mass CO2 Sequestered', '2021 Total Mass CO2 Sequestered',
-                                                '2022 Total Mass CO2 Sequestered'] if row[year])
-            duration_years = min(duration_years, 5)
-            project = CarbonProject(
-                facility_name=row['Facility Name'],
-                city=row['City'],
-                state=row['State'],
-                zip_code=row['Zip Code'],
-                address=row['Address'],
-                county=row['County'],
-                latitude=float(row['Latitude']),
-                longitude=float(row['Longitude']),
-                industry_type=row['Industry Type (subparts)'],
-                total_mass_co2_sequestered=float(row['2022 Total Mass CO2 Sequestered']),
-                total_mass_co2_sequestered_2016=float(row['2016 Total Mass CO2 Sequestered']) if row['2016 Total Mass CO2 Sequestered'] else None,
-                total_mass_co2_sequestered_2017=float(row['2017 Total Mass CO2 Sequestered']) if row['2017 Total Mass CO2 Sequestered'] else None,
-                total_mass_co2_sequestered_2018=float(row['2018 Total Mass CO2 Sequestered']) if row['2018 Total Mass CO2 Sequestered'] else None,
-                total_mass_co2_sequestered_2019=float(row['2019 Total Mass CO2 Sequestered']) if row['2019 Total Mass CO2 Sequestered'] else None,
-                total_mass_co2_sequestered_2020=float(row['2020 Total Mass CO2 Sequestered']) if row['2020 Total Mass CO2 Sequestered'] else None,
-                total_mass_co2_sequestered_2021=float(row['2021 Total Mass CO2 Sequestered']) if row['2021 Total Mass CO2 Sequestered'] else None,
-                total_mass_co2_sequestered_2022=float(row['2022 Total Mass CO2 Sequestered']) if row['2022 Total Mass CO2 Sequestered'] else None,
-                duration_years=duration_years
-            )
-            db.session.add(project)
-        db.session.commit()
-    logging.debug("Data loaded successfully.")
+            db.session.add(CarbonProject(**parse_row(row)))
+            added += 1
+        # populate_db reruns this on every start; an unchanged file leaves the derived tables alone.
+        if added:
+            db.session.flush()
+            derived_tables.rebuild_all()
+            db.session.commit()
+    logger.debug("Data loaded successfully: %d projects added.", added)
+
+def read_csv_chunks(filepath, chunk_size=BULK_CHUNK_SIZE):
+    with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
+        chunk = []
+        for row in csv.DictReader(csvfile):
+            chunk.append(parse_row(row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def _staging_table(columns):
+    from app import CarbonProject
+    return Table(
+        'carbon_project_staging', MetaData(),
+        Column('row_number', Integer, primary_key=True),
+        *[Column(column.name, column.type) for column in CarbonProject.__table__.columns if column.name in columns],
+        prefixes=['TEMPORARY'])
+
+def _copy_field(value):
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _copy_buffer(columns, rows):
+    """CSV for COPY ... WITH (FORMAT csv).
+
+    NULL is an unquoted empty field and every value is quoted, so no value, not even ''
+    or \\N, can load as NULL. Empty strings and NULLs load the same as on the
+    executemany path.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_copy_field(row[column]) for column in columns) + '\n')
+    buffer.seek(0)
+    return buffer
+
+def _stage_chunk(connection, staging, rows):
+    if connection.dialect.name == 'postgresql':
+        columns = [column.name for column in staging.columns]
+        buffer = _copy_buffer(columns, rows)
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {staging.name} ({', '.join(columns)}) FROM STDIN "
+                               'WITH (FORMAT csv)', buffer)
+    else:
+        connection.execute(staging.insert(), rows)
+
+def _upsert_statement(connection, target, staging, columns, update_existing):
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # The first row for each facility name wins, as with the row-by-row loader.
+    first_rows = select(func.min(staging.c.row_number)).group_by(staging.c.facility_name)
+    source = (select(*[staging.c[column] for column in columns])
+              .where(staging.c.row_number.in_(first_rows))
+              .order_by(staging.c.row_number))
+    statement = insert(target).from_select(columns, source)
+    if not update_existing:
+        return statement.on_conflict_do_nothing(index_elements=['facility_name'])
+    changed = [column for column in columns if column != 'facility_name']
+    return statement.on_conflict_do_update(
+        index_elements=['facility_name'],
+        set_=dict({column: statement.excluded[column] for column in changed}, updated_at=func.now()),
+        where=or_(*[target.c[column].is_distinct_from(statement.excluded[column]) for column in changed]))
+
+def bulk_load_data(filepath=DATA_FILE, update_existing=False, chunk_size=BULK_CHUNK_SIZE):
+    """Load the CSV through a staging table and one INSERT ... ON CONFLICT on facility_name.
+
+    Returns counts of staged/inserted/updated/skipped rows and the throughput.
+    """
+    from app import db, CarbonProject
+    import derived_tables
+    started = time.perf_counter()
+    target = CarbonProject.__table__
+    columns = [column.name for column in target.columns if column.name not in ('id', 'updated_at')]
+    staging = _staging_table(columns)
+    connection = db.session.connection()
+    staging.create(connection)
+
+    staged = 0
+    for chunk in read_csv_chunks(filepath, chunk_size):
+        for number, row in enumerate(chunk, start=staged):
+            row['row_number'] = number
+        _stage_chunk(connection, staging, chunk)
+        staged += len(chunk)
+
+    new_names = select(staging.c.facility_name).distinct().where(
+        ~staging.c.facility_name.in_(select(target.c.facility_name)))
+    inserted = connection.execute(select(func.count()).select_from(new_names.subquery())).scalar()
+    written = connection.execute(_upsert_statement(connection, target, staging, columns, update_existing)).rowcount
+    staging.drop(connection)
+
+    # Nothing inserted or updated: derived tables and the dataset version stay as they are.
+    if written:
+        derived_tables.rebuild_all()
+    db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'rows': staged,
+        'inserted': inserted,
+        'updated': written - inserted,
+        'skipped': staged - written,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(staged / elapsed) if elapsed else staged,
+    }
+    logger.info("Bulk load finished: %s", stats)
+    return stats
+
+def sync_data(filepath=DATA_FILE):
+    """Apply only the inserts, updates and deletes needed to match the CSV.
+
+    Rows are diffed on content_hash. Projects created through the API have no
+    hash and are never deleted by a sync.
+    """
+    from app import db, CarbonProject
+    import derived_tables
+    started = time.perf_counter()
+    incoming = {}
+    for chunk in read_csv_chunks(filepath):
+        for values in chunk:
+            incoming.setdefault(values['facility_name'], values)
+
+    updates, deleted_ids = [], []
+    unchanged = 0
+    for project_id, facility_name, stored_hash in db.session.query(
+            CarbonProject.id, CarbonProject.facility_name, CarbonProject.content_hash):
+        values = incoming.pop(facility_name, None)
+        if values is None:
+            if stored_hash is not None:
+                deleted_ids.append(project_id)
+        elif values['content_hash'] != stored_hash:
+            updates.append(dict(values, id=project_id))
+        else:
+            unchanged += 1
+    inserts = list(incoming.values())
+
+    inserted_ids = []
+    if inserts:
+        inserted_ids = list(db.session.scalars(
+            insert(CarbonProject).returning(CarbonProject.id, sort_by_parameter_order=True), inserts))
+    if updates:
+        db.session.execute(update(CarbonProject), updates)
+    if deleted_ids:
+        derived_tables.delete_projects(deleted_ids)
+    if inserts or updates or deleted_ids:
+        # Only the changed projects' subparts and series are rewritten.
+        derived_tables.record_saved_many(inserted_ids + [values['id'] for values in updates])
+    db.session.commit()
+
+    stats = {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(deleted_ids),
+        'unchanged': unchanged,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info("Sync finished: %s", stats)
+    return stats
 
 def register_commands(app):
     @app.cli.command("load-data")
-    def load_data_command():
-        load_data()
+    @click.option('--bulk', is_flag=True, help='Stage the CSV with COPY and upsert it in one statement.')
+    @click.option('--update', 'update_existing', is_flag=True, help='With --bulk, also update changed existing projects.')
+    @click.option('--sync', is_flag=True, help='Apply only rows whose content changed since the last load.')
+    @click.option('--file', 'filepath', default=DATA_FILE, show_default=True)
+    def load_data_command(bulk, update_existing, sync, filepath):
+        if sync:
+            stats = sync_data(filepath)
+            print(f"Synced in {stats['seconds']}s: {stats['inserted']} inserted, {stats['updated']} updated, "
+                  f"{stats['deleted']} deleted, {stats['unchanged']} unchanged.")
+        elif bulk:
+            stats = bulk_load_data(filepath, update_existing=update_existing)
+            print(f"Loaded {stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_second']} rows/s): "
+                  f"{stats['inserted']} inserted, {stats['updated']} updated, {stats['skipped']} skipped.")
+        else:
+            load_data(filepath)
 
     @app.cli.command("load-industry-types")
     def load_industry_types_command():
+        from app import db
+        from subpart_store import rebuild_project_subparts, seed_industry_types
         load_industry_types()
+        seed_industry_types()
+        # Re-decode stored subparts, whose codes may predate the current cleaning rules.
+        rebuild_project_subparts()
+        db.session.commit()
@@ -0,0 +1,129 @@
+"""Process-wide logging setup.
+
+Records are put on an in-memory queue by the thread that logs them and written to
+stderr by a background listener thread, so request threads never block on output.
+Levels are set per logger from LOG_LEVEL and LOG_LEVELS, e.g.
+LOG_LEVELS="ml_models=DEBUG,werkzeug=WARNING". Repeated warnings are rate limited.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+DEFAULT_LEVEL = 'INFO'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+RATE_LIMIT_INTERVAL = 60.0
+RATE_LIMIT_MAX_KEYS = 1024
+
+_listener = None
+
+
+def parse_levels(spec):
+    """'ml_models=DEBUG,werkzeug=WARNING' -> {'ml_models': 'DEBUG', 'werkzeug': 'WARNING'}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        name, sep, level = item.partition('=')
+        level = level.strip().upper()
+        if not sep or not name.strip() or not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f'Invalid log level setting "{item.strip()}", expected <logger>=<LEVEL>')
+        levels[name.strip()] = level
+    return levels
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets the first of a run of identical records through, drops repeats for interval seconds,
+    then passes the next one on with a count of what was dropped.
+
+    Records below min_level always pass. Records are identical when their logger, level,
+    message template and arguments match, so nothing is formatted to decide.
+    """
+
+    def __init__(self, interval=RATE_LIMIT_INTERVAL, min_level=logging.WARNING, max_keys=RATE_LIMIT_MAX_KEYS):
+        super().__init__()
+        self.interval = interval
+        self.min_level = min_level
+        self.max_keys = max_keys
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _key(self, record):
+        key = (record.name, record.levelno, record.msg, record.args)
+        try:
+            hash(key)
+        except TypeError:
+            key = (record.name, record.levelno, record.msg)
+        return key
+
+    def filter(self, record):
+        if record.levelno < self.min_level:
+            return True
+        key = self._key(record)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.interval:
+                seen[1] += 1
+                return False
+            if seen is None and len(self._seen) >= self.max_keys:
+                self._seen.clear()
+            self._seen[key] = [now, 0]
+        if seen is not None and seen[1]:
+            record.msg = f'{record.getMessage()} ({seen[1]} similar messages suppressed)'
+            record.args = None
+        return True
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a queue consumed in this process.
+
+    The stock handler formats each record before queueing it so it can be pickled;
+    records here never leave the process, so formatting is left to the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level=None, module_levels=None, rate_limit_interval=RATE_LIMIT_INTERVAL):
+    """Route the root logger through a queue to stderr. Safe to call again to change levels."""
+    global _listener
+    level = (level or os.getenv('LOG_LEVEL', DEFAULT_LEVEL)).upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f'Invalid log level "{level}"')
+    if module_levels is None:
+        module_levels = parse_levels(os.getenv('LOG_LEVELS', ''))
+
+    root = logging.getLogger()
+    if _listener is None:
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(logging.Formatter(LOG_FORMAT))
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        handler = LocalQueueHandler(records)
+        handler.addFilter(RateLimitFilter(rate_limit_interval))
+        root.addHandler(handler)
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, LocalQueueHandler)]:
+        root.removeHandler(handler)
+    _listener = None
@@ -0,0 +1,237 @@
+"""Per-request timing, SQL and payload metrics, rendered in the Prometheus text format.
+
+Spans and SQL time accumulate on the current request and are observed once when
+the request ends, so spans taken per row (such as industry decoding during an
+export) cost a clock read each rather than a histogram update. Outside a request,
+for example in CLI commands, spans are observed as they finish.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+DEBUG_HEADER = 'X-Request-Metrics'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return '{%s}' % ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{_labels(self.labels, key)} {value:g}' for key, value in sorted(values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labels, key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {total:g}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+request_seconds = registry.add(Histogram(
+    'http_request_duration_seconds', 'Time to handle a request, up to the end of any streamed body.',
+    ['method', 'endpoint', 'status']))
+request_queries = registry.add(Histogram(
+    'http_request_sql_queries', 'SQL statements executed per request.', ['endpoint'], COUNT_BUCKETS))
+request_sql_seconds = registry.add(Histogram(
+    'http_request_sql_seconds', 'Time spent executing SQL per request.', ['endpoint']))
+response_rows = registry.add(Counter(
+    'http_response_rows_total', 'Rows serialized into responses.', ['endpoint']))
+response_bytes = registry.add(Counter(
+    'http_response_bytes_total', 'Response body bytes sent.', ['endpoint']))
+span_seconds = registry.add(Histogram(
+    'span_duration_seconds', 'Time spent in a named span, summed per request.', ['span']))
+sql_queries = registry.add(Counter(
+    'sql_queries_total', 'SQL statements executed, inside and outside requests.'))
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'sql_seconds', 'rows', 'bytes', 'spans')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.spans = defaultdict(float)
+
+    def summary(self):
+        parts = [f'total={(time.perf_counter() - self.started) * 1000:.1f}ms',
+                 f'sql={self.queries}q/{self.sql_seconds * 1000:.1f}ms']
+        parts += [f'{name}={seconds * 1000:.1f}ms' for name, seconds in sorted(self.spans.items())]
+        parts += [f'rows={self.rows}']
+        return '; '.join(parts)
+
+
+def current_stats():
+    if has_request_context():
+        return g.get('request_stats')
+    return None
+
+
+class span:
+    """Time a block and charge it to the named span: `with metrics.span('rating'): ...`"""
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stats = current_stats()
+        if stats is not None:
+            stats.spans[self.name] += elapsed
+        else:
+            span_seconds.observe(elapsed, span=self.name)
+
+
+def count_rows(count=1):
+    stats = current_stats()
+    if stats is not None:
+        stats.rows += count
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    sql_queries.inc()
+    stats = current_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += elapsed
+
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _count_bytes(body, stats):
+    for chunk in body:
+        stats.bytes += len(chunk)
+        yield chunk
+
+
+def init_app(app):
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_stats():
+        g.request_stats = RequestStats()
+
+    @app.after_request
+    def finish_response(response):
+        stats = current_stats()
+        if stats is None:
+            return response
+        g.response_status = response.status_code
+        if response.is_streamed:
+            response.response = _count_bytes(response.response, stats)
+        else:
+            stats.bytes = response.content_length or 0
+        if app.config.get('METRICS_DEBUG_HEADER'):
+            # For streamed bodies this covers the work done before the first byte.
+            response.headers[DEBUG_HEADER] = stats.summary()
+        return response
+
+    @app.teardown_request
+    def record_request_stats(error=None):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return
+        endpoint = _endpoint()
+        status = 500 if error is not None else g.get('response_status', 500)
+        request_seconds.observe(time.perf_counter() - stats.started,
+                                method=request.method, endpoint=endpoint, status=status)
+        request_queries.observe(stats.queries, endpoint=endpoint)
+        request_sql_seconds.observe(stats.sql_seconds, endpoint=endpoint)
+        response_rows.inc(stats.rows, endpoint=endpoint)
+        response_bytes.inc(stats.bytes, endpoint=endpoint)
+        for name, seconds in stats.spans.items():
+            span_seconds.observe(seconds, span=name)
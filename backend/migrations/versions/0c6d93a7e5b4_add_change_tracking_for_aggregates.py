@@ -0,0 +1,36 @@
+"""Add carbon_project.updated_at and removed_project_subpart for incremental aggregates.
+
+Revision ID: 0c6d93a7e5b4
+Revises: f2a8c4e1b953
+Create Date: 2024-07-22 14:05:51.736420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6d93a7e5b4'
+down_revision = 'f2a8c4e1b953'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('carbon_project', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.create_index(op.f('ix_carbon_project_updated_at'), 'carbon_project', ['updated_at'], unique=False)
+    op.create_table('removed_project_subpart',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('subpart_code', sa.String(length=64), nullable=False),
+        sa.Column('removed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_removed_project_subpart_removed_at'), 'removed_project_subpart', ['removed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_removed_project_subpart_removed_at'), table_name='removed_project_subpart')
+    op.drop_table('removed_project_subpart')
+    op.drop_index(op.f('ix_carbon_project_updated_at'), table_name='carbon_project')
+    op.drop_column('carbon_project', 'updated_at')
@@ -0,0 +1,46 @@
+"""Add project rating tables.
+
+Revision ID: 8c1d2f4e6a10
+Revises: 5a42acdd43a8
+Create Date: 2024-06-20 09:42:17.513208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d2f4e6a10'
+down_revision = '5a42acdd43a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('project_rating',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('raw_rating', sa.Float(), nullable=False),
+        sa.Column('rating', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['carbon_project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+    op.create_index(op.f('ix_project_rating_rating'), 'project_rating', ['rating'], unique=False)
+    op.create_table('rating_bound',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('min_co2', sa.Float(), nullable=False),
+        sa.Column('max_co2', sa.Float(), nullable=False),
+        sa.Column('min_duration', sa.Float(), nullable=False),
+        sa.Column('max_duration', sa.Float(), nullable=False),
+        sa.Column('min_co2_per_year', sa.Float(), nullable=False),
+        sa.Column('max_co2_per_year', sa.Float(), nullable=False),
+        sa.Column('min_raw_rating', sa.Float(), nullable=False),
+        sa.Column('max_raw_rating', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Ratings are backfilled by the first GET /projects (or `flask rescore-ratings`).
+
+
+def downgrade():
+    op.drop_table('rating_bound')
+    op.drop_index(op.f('ix_project_rating_rating'), table_name='project_rating')
+    op.drop_table('project_rating')
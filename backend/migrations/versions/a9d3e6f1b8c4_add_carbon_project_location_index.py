@@ -0,0 +1,24 @@
+"""Add a (latitude, longitude) index for nearby-project and bounding-box queries.
+
+Revision ID: a9d3e6f1b8c4
+Revises: 0c6d93a7e5b4
+Create Date: 2024-08-05 10:42:17.583104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e6f1b8c4'
+down_revision = '0c6d93a7e5b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_carbon_project_latitude_longitude', 'carbon_project', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_carbon_project_latitude_longitude', table_name='carbon_project')
@@ -0,0 +1,34 @@
+"""Add indexes for /projects filtering and keyset pagination.
+
+Revision ID: b3e7a91c5d22
+Revises: 8c1d2f4e6a10
+Create Date: 2024-06-24 15:08:33.921470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7a91c5d22'
+down_revision = '8c1d2f4e6a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_carbon_project_facility_name'), 'carbon_project', ['facility_name'], unique=False)
+    op.create_index(op.f('ix_carbon_project_state'), 'carbon_project', ['state'], unique=False)
+    op.create_index(op.f('ix_carbon_project_county'), 'carbon_project', ['county'], unique=False)
+    op.create_index(op.f('ix_carbon_project_total_mass_co2_sequestered'), 'carbon_project', ['total_mass_co2_sequestered'], unique=False)
+    op.drop_index('ix_project_rating_rating', table_name='project_rating')
+    op.create_index('ix_project_rating_rating_project_id', 'project_rating', ['rating', 'project_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_project_rating_rating_project_id', table_name='project_rating')
+    op.create_index('ix_project_rating_rating', 'project_rating', ['rating'], unique=False)
+    op.drop_index(op.f('ix_carbon_project_total_mass_co2_sequestered'), table_name='carbon_project')
+    op.drop_index(op.f('ix_carbon_project_county'), table_name='carbon_project')
+    op.drop_index(op.f('ix_carbon_project_state'), table_name='carbon_project')
+    op.drop_index(op.f('ix_carbon_project_facility_name'), table_name='carbon_project')
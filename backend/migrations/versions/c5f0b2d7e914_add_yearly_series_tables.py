@@ -0,0 +1,45 @@
+"""Add project_year_total and project_trend, the long-format yearly series and its trend stats.
+
+Revision ID: c5f0b2d7e914
+Revises: a9d3e6f1b8c4
+Create Date: 2024-08-12 09:17:44.260931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f0b2d7e914'
+down_revision = 'a9d3e6f1b8c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('project_year_total',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('tonnes', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['carbon_project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id', 'year')
+    )
+    op.create_index('ix_project_year_total_year_project_id', 'project_year_total', ['year', 'project_id'], unique=False)
+    op.create_table('project_trend',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('first_year', sa.Integer(), nullable=False),
+        sa.Column('last_year', sa.Integer(), nullable=False),
+        sa.Column('years_reported', sa.Integer(), nullable=False),
+        sa.Column('coverage', sa.Float(), nullable=False),
+        sa.Column('latest_tonnes', sa.Float(), nullable=False),
+        sa.Column('slope', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['carbon_project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+    # Both tables are filled on first use, or by the loaders.
+
+
+def downgrade():
+    op.drop_table('project_trend')
+    op.drop_index('ix_project_year_total_year_project_id', table_name='project_year_total')
+    op.drop_table('project_year_total')
@@ -0,0 +1,51 @@
+"""Make carbon_project.facility_name unique for bulk upserts.
+
+Revision ID: d41f0a6b2c87
+Revises: b3e7a91c5d22
+Create Date: 2024-07-02 10:21:46.307115
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f0a6b2c87'
+down_revision = 'b3e7a91c5d22'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+ARCHIVE_TABLE = 'carbon_project_duplicate'
+# Every project but the first loaded for its facility name, as load_data has always kept.
+DUPLICATES = 'SELECT * FROM carbon_project WHERE id NOT IN (SELECT MIN(id) FROM carbon_project GROUP BY facility_name)'
+MAX_LOGGED_DUPLICATES = 50
+
+
+def upgrade():
+    connection = op.get_bind()
+    duplicates = connection.execute(sa.text(
+        f'SELECT id, facility_name FROM ({DUPLICATES}) duplicate ORDER BY facility_name, id')).all()
+    if duplicates:
+        # The rows are copied aside for review, not dropped unseen. Their ratings and
+        # the rating bounds are derived data and are rebuilt on the next read.
+        op.execute(f'CREATE TABLE {ARCHIVE_TABLE} AS {DUPLICATES}')
+        logger.warning('Archived %d duplicate carbon_project rows to %s before deleting them; '
+                       'review and drop that table once done', len(duplicates), ARCHIVE_TABLE)
+        for project_id, facility_name in duplicates[:MAX_LOGGED_DUPLICATES]:
+            logger.warning('Duplicate project %d: %r', project_id, facility_name)
+        if len(duplicates) > MAX_LOGGED_DUPLICATES:
+            logger.warning('... and %d more, listed in %s', len(duplicates) - MAX_LOGGED_DUPLICATES, ARCHIVE_TABLE)
+        op.execute(f'DELETE FROM project_rating WHERE project_id IN (SELECT id FROM {ARCHIVE_TABLE})')
+        op.execute(f'DELETE FROM carbon_project WHERE id IN (SELECT id FROM {ARCHIVE_TABLE})')
+        op.execute('DELETE FROM rating_bound')
+    op.drop_index(op.f('ix_carbon_project_facility_name'), table_name='carbon_project')
+    op.create_index(op.f('ix_carbon_project_facility_name'), 'carbon_project', ['facility_name'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_carbon_project_facility_name'), table_name='carbon_project')
+    op.create_index(op.f('ix_carbon_project_facility_name'), 'carbon_project', ['facility_name'], unique=False)
@@ -0,0 +1,31 @@
+"""Add dataset_version, the counter behind ETags and the response cache.
+
+Revision ID: d8e4a1c6f2b7
+Revises: c5f0b2d7e914
+Create Date: 2024-08-19 13:26:05.817342
+
+"""
+import random
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e4a1c6f2b7'
+down_revision = 'c5f0b2d7e914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dataset_version = op.create_table('dataset_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(dataset_version, [{'id': 1, 'version': random.getrandbits(52)}])
+
+
+def downgrade():
+    op.drop_table('dataset_version')
@@ -0,0 +1,30 @@
+"""Add (sort column, id) indexes for keyset pagination of /projects.
+
+Revision ID: e3c9a7d15b40
+Revises: d8e4a1c6f2b7
+Create Date: 2024-08-26 10:41:09.302114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3c9a7d15b40'
+down_revision = 'd8e4a1c6f2b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_carbon_project_facility_name_id', 'carbon_project', ['facility_name', 'id'], unique=False)
+    op.create_index('ix_carbon_project_total_mass_co2_sequestered_id', 'carbon_project',
+                    ['total_mass_co2_sequestered', 'id'], unique=False)
+    op.drop_index('ix_carbon_project_total_mass_co2_sequestered', table_name='carbon_project')
+
+
+def downgrade():
+    op.create_index('ix_carbon_project_total_mass_co2_sequestered', 'carbon_project',
+                    ['total_mass_co2_sequestered'], unique=False)
+    op.drop_index('ix_carbon_project_total_mass_co2_sequestered_id', table_name='carbon_project')
+    op.drop_index('ix_carbon_project_facility_name_id', table_name='carbon_project')
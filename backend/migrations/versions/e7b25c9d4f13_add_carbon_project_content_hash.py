@@ -0,0 +1,25 @@
+"""Add carbon_project.content_hash for incremental CSV syncs.
+
+Revision ID: e7b25c9d4f13
+Revises: d41f0a6b2c87
+Create Date: 2024-07-08 16:37:02.448691
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b25c9d4f13'
+down_revision = 'd41f0a6b2c87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows start without a hash, so the first sync rewrites them once.
+    op.add_column('carbon_project', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('carbon_project', 'content_hash')
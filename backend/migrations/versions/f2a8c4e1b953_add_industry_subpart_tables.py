@@ -0,0 +1,38 @@
+"""Add industry_type lookup and project_subpart bridge tables.
+
+Revision ID: f2a8c4e1b953
+Revises: e7b25c9d4f13
+Create Date: 2024-07-15 11:52:29.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c4e1b953'
+down_revision = 'e7b25c9d4f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('industry_type',
+        sa.Column('subpart_code', sa.String(length=64), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('subpart_code')
+    )
+    op.create_table('project_subpart',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('subpart_code', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['carbon_project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('project_id', 'subpart_code')
+    )
+    op.create_index('ix_project_subpart_subpart_code_project_id', 'project_subpart', ['subpart_code', 'project_id'], unique=False)
+    # Both tables are filled on first use, or by `flask load-industry-types` and the loaders.
+
+
+def downgrade():
+    op.drop_index('ix_project_subpart_subpart_code_project_id', table_name='project_subpart')
+    op.drop_table('project_subpart')
+    op.drop_table('industry_type')
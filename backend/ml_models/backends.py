@@ -0,0 +1,178 @@
+"""Pluggable model backends whose frameworks are imported on first use.
+
+A backend module provides train_<name>_model(data, path), load_<name>_model(path)
+and score_<name>_batch(model, features, columns). Backends with an exported
+artifact also provide export_<name>_model(model, path) and can be served by the
+NumPy MLP runtime, which needs neither TensorFlow nor PyTorch.
+"""
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict, namedtuple
+from importlib import import_module
+
+from ml_models.registry import MODEL_DIR, registry
+
+logger = logging.getLogger(__name__)
+
+import_costs = OrderedDict()
+
+
+def timed_import(module_name):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    modules_before = len(sys.modules)
+    started = time.perf_counter()
+    module = import_module(module_name)
+    import_costs[module_name] = {'seconds': time.perf_counter() - started,
+                                 'modules': len(sys.modules) - modules_before}
+    logger.info('Imported %s in %.2fs (%d modules)', module_name,
+                 import_costs[module_name]['seconds'], import_costs[module_name]['modules'])
+    return module
+
+
+RUNTIMES = ('framework', 'numpy')
+
+# A training option's value check, and the option that must be set for it to apply.
+TrainingOption = namedtuple('TrainingOption', ['check', 'requires'])
+
+
+def _flag(value):
+    if not isinstance(value, bool):
+        raise ValueError('must be true or false')
+
+
+def _at_least(minimum):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            raise ValueError(f'must be an integer of at least {minimum}')
+    return check
+
+
+def _n_jobs(value):
+    if isinstance(value, bool) or not isinstance(value, int) or value == 0:
+        raise ValueError('must be a non-zero integer, -1 for every core')
+
+
+def _search_space(value):
+    if not isinstance(value, dict) or not value:
+        raise ValueError('must be an object mapping parameters to candidate value lists')
+    for parameter, candidates in value.items():
+        if not isinstance(candidates, list) or not candidates:
+            raise ValueError(f'{parameter} must be a non-empty list of candidate values')
+
+
+# Checked here rather than in the backend modules, so validating a request imports no framework.
+SKLEARN_OPTIONS = {
+    'search': TrainingOption(_flag, None),
+    'space': TrainingOption(_search_space, 'search'),
+    'grid': TrainingOption(_flag, 'search'),
+    'folds': TrainingOption(_at_least(2), 'search'),
+    'candidates': TrainingOption(_at_least(1), 'search'),
+    'max_rows': TrainingOption(_at_least(1), 'search'),
+    'n_jobs': TrainingOption(_n_jobs, 'search'),
+}
+
+
+class ModelBackend:
+    def __init__(self, name, module_name, artifact, exported_artifact=None, options=None):
+        self.name = name
+        self.module_name = module_name
+        self.artifact = artifact
+        self.path = os.path.join(MODEL_DIR, artifact)
+        self.exported_artifact = exported_artifact
+        self.exported_path = exported_artifact and os.path.join(MODEL_DIR, exported_artifact)
+        self.options = options or {}
+
+    @property
+    def module(self):
+        return timed_import(self.module_name)
+
+    @property
+    def imported(self):
+        return self.module_name in sys.modules
+
+    def train(self, data, path=None, **options):
+        return getattr(self.module, f'train_{self.name}_model')(data, path or self.path, **options)
+
+    def check_options(self, options):
+        """Raises ValueError for options train() does not accept or values it cannot use."""
+        unknown = sorted(set(options) - set(self.options))
+        if unknown:
+            raise ValueError(f"{self.name} does not accept options: {', '.join(unknown)}")
+        for key, value in options.items():
+            option = self.options[key]
+            try:
+                option.check(value)
+            except ValueError as e:
+                raise ValueError(f'{self.name} option {key} {e}')
+            if option.requires and not options.get(option.requires):
+                raise ValueError(f'{self.name} option {key} only applies with {option.requires}')
+
+    def load(self, path):
+        return getattr(self.module, f'load_{self.name}_model')(path)
+
+    def score(self, model, features, columns):
+        return getattr(self.module, f'score_{self.name}_batch')(model, features, columns)
+
+    def export(self, model, path=None):
+        return getattr(self.module, f'export_{self.name}_model')(model, path or self.exported_path)
+
+    def serving(self, runtime):
+        return NumpyMLPBackend(self) if runtime == 'numpy' and self.exported_artifact else self
+
+
+class NumpyMLPBackend(ModelBackend):
+    """Serves a backend's exported weights with the NumPy forward pass."""
+
+    def __init__(self, backend):
+        super().__init__(backend.name, 'ml_models.numpy_mlp', backend.exported_artifact, options=backend.options)
+
+    def train(self, data, path=None, **options):
+        return BACKENDS[self.name].train(data, path, **options)
+
+    def load(self, path):
+        return self.module.load_mlp(path)
+
+    def score(self, model, features, columns):
+        return self.module.score_mlp_batch(model, features, columns)
+
+
+BACKENDS = OrderedDict((backend.name, backend) for backend in (
+    ModelBackend('sklearn', 'ml_models.sklearn_model', 'sklearn_model.pkl', options=SKLEARN_OPTIONS),
+    ModelBackend('tensorflow', 'ml_models.tensorflow_model', 'tensorflow_model.h5', 'tensorflow_model.npz'),
+    ModelBackend('pytorch', 'ml_models.pytorch_model', 'pytorch_model.pth', 'pytorch_model.npz'),
+))
+
+_enabled = OrderedDict()
+
+
+def model_path(name):
+    return BACKENDS[name].path
+
+
+def configure(names, runtime='framework'):
+    """Enable the named backends, in the given order, and register their models for serving.
+
+    With runtime='numpy', MLP backends are served from their exported weights.
+    """
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        raise ValueError('Unknown model backends: %s' % ', '.join(unknown))
+    if runtime not in RUNTIMES:
+        raise ValueError('Unknown model runtime: %s' % runtime)
+    for name in _enabled:
+        registry.unregister(name)
+    _enabled.clear()
+    for name in names:
+        backend = BACKENDS[name].serving(runtime)
+        _enabled[name] = backend
+        registry.register(name, backend.path, backend.load)
+
+
+def enabled_backends():
+    return _enabled
+
+
+configure(list(BACKENDS))
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+
+import metrics
+from ml_models.backends import enabled_backends
+from ml_models.registry import registry
+from ml_models.training_data import FEATURE_COLUMNS
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def parse_records(body, ndjson):
+    """Records from a JSON array, or from NDJSON with one object per line."""
+    try:
+        if ndjson:
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            records = json.loads(body)
+    except ValueError as e:
+        raise InvalidBatch('Malformed JSON: %s' % e)
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise InvalidBatch('Expected a list of JSON objects')
+    if not records:
+        raise InvalidBatch('No records to score')
+    return records
+
+
+def load_models():
+    """Fetch every model once so a whole batch is scored by the same versions."""
+    return registry.get_many(enabled_backends())
+
+
+def feature_columns(models):
+    """The trained feature order when the sklearn model recorded it, else the training pipeline's."""
+    names = getattr(models.get('sklearn'), 'feature_names_in_', None)
+    return [str(name) for name in names] if names is not None else FEATURE_COLUMNS
+
+
+def _is_numeric(value):
+    # bool is an int and None a NaN to NumPy, so both would pass the float32 cast.
+    return isinstance(value, (int, float, str)) and not isinstance(value, bool)
+
+
+def records_to_matrix(records, columns):
+    features = np.empty((len(records), len(columns)), dtype=np.float32)
+    for i, record in enumerate(records):
+        try:
+            values = [record[column] for column in columns]
+        except KeyError as e:
+            raise InvalidBatch('Record %d is missing feature %s' % (i, e))
+        try:
+            if not all(_is_numeric(value) for value in values):
+                raise TypeError
+            features[i] = values
+        except (TypeError, ValueError, OverflowError):
+            raise InvalidBatch('Record %d has a non-numeric feature value' % i)
+        # "nan", "inf" and values beyond float32's range cast without complaint.
+        if not np.isfinite(features[i]).all():
+            raise InvalidBatch('Record %d has a non-finite feature value' % i)
+    return features
+
+
+def score_matrix(models, features, columns):
+    """Each enabled backend's raw predictions for the feature matrix."""
+    predictions = {}
+    for name, backend in enabled_backends().items():
+        with metrics.span(f'inference:{name}'):
+            predictions[name] = np.asarray(backend.score(models[name], features, columns))
+    return predictions
+
+
+def predict_batches(models, features, columns, batch_size):
+    """Yield (offset, {model: predictions}) for each micro-batch of the feature matrix."""
+    for start in range(0, len(features), batch_size):
+        batch = features[start:start + batch_size]
+        yield start, {name: predictions.reshape(len(batch))
+                      for name, predictions in score_matrix(models, batch, columns).items()}
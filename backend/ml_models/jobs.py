@@ -0,0 +1,204 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from ml_models.backends import BACKENDS, enabled_backends
+from ml_models.registry import MODEL_DIR, publish_model_set
+from ml_models.training_data import open_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 50
+
+
+def run_trainer(name, snapshot_dir, staging_dir, options):
+    """Train one model from the snapshot into staging_dir; returns (loss, seconds).
+
+    Runs in a child process, which only imports the framework it trains.
+    """
+    backend = BACKENDS[name]
+    started = time.perf_counter()
+    loss = backend.train(open_snapshot(snapshot_dir), os.path.join(staging_dir, backend.artifact), **options)
+    return float(loss), time.perf_counter() - started
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class TrainingJob:
+    def __init__(self, job_id, sequence, snapshot_dir, staging_dir, backends, options):
+        self.id = job_id
+        self.sequence = sequence
+        self.snapshot_dir = snapshot_dir
+        self.staging_dir = staging_dir
+        self.options = options
+        self.status = 'running'
+        self.error = None
+        self.submitted_at = _now()
+        self.finished_at = None
+        self.snapshot = {'status': 'running', 'rows': None, 'seconds': None, 'error': None}
+        self.models = {name: {'status': 'pending', 'loss': None, 'seconds': None, 'error': None}
+                       for name in backends}
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def as_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'submitted_at': self.submitted_at.isoformat(),
+            'finished_at': self.finished_at and self.finished_at.isoformat(),
+            'seconds': ((self.finished_at or _now()) - self.submitted_at).total_seconds(),
+            'options': self.options,
+            'snapshot': self.snapshot,
+            'models': self.models,
+        }
+
+
+class TrainingJobQueue:
+    """Trains every model of a job concurrently in a process pool.
+
+    A job first streams carbon_project into a memory-mapped snapshot on a
+    background thread of this process; all models then train from that same
+    snapshot. Artifacts are written to a per-job staging directory and only published
+    to model_dir, as one model set, once every model of the job has trained, so
+    serving never picks up a partial set. A job finishing after a newer job was
+    promoted is marked 'superseded' and its artifacts are dropped.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, max_workers=len(BACKENDS)):
+        self.model_dir = model_dir
+        self.max_workers = max_workers
+        self._executor = None
+        self._snapshot_executor = ThreadPoolExecutor(1, thread_name_prefix='training-snapshot')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._sequence = 0
+        self._promoted_sequence = 0
+
+    def _pool(self):
+        if self._executor is None:
+            # Forking a threaded web worker that may already hold TensorFlow or
+            # PyTorch state is unsafe, so children are spawned fresh.
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def submit(self, options=None):
+        """Queue a job; options maps backend names to keyword arguments for their trainer."""
+        with self._lock:
+            self._sequence += 1
+            job_id = uuid.uuid4().hex
+            staging_dir = os.path.join(self.model_dir, 'staging', job_id)
+            os.makedirs(staging_dir)
+            job = TrainingJob(job_id, self._sequence, staging_dir + '-snapshot', staging_dir,
+                              list(enabled_backends()), options or {})
+            self._jobs[job_id] = job
+            self._forget_old_jobs()
+        self._snapshot_executor.submit(self._take_snapshot, job)
+        logger.info('Submitted training job %s', job_id)
+        return job
+
+    def _take_snapshot(self, job):
+        from app import app
+        try:
+            with app.app_context():
+                manifest = write_snapshot(job.snapshot_dir)
+        except Exception as e:
+            logger.exception('Snapshot for training job %s failed', job.id)
+            with self._lock:
+                job.snapshot.update(status='failed', error=str(e))
+                for model in job.models.values():
+                    model['status'] = 'skipped'
+                self._finish(job)
+            return
+
+        with self._lock:
+            job.snapshot.update(status='succeeded', rows=manifest['rows'], seconds=manifest['seconds'])
+            for model in job.models.values():
+                model['status'] = 'running'
+            pool = self._pool()
+        submitted = {}
+        try:
+            for name in job.models:
+                submitted[name] = pool.submit(run_trainer, name, job.snapshot_dir, job.staging_dir,
+                                              job.options.get(name, {}))
+        except Exception as e:
+            logger.exception('Could not start training for job %s', job.id)
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
+            error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+            with self._lock:
+                for name, model in job.models.items():
+                    if name not in submitted:
+                        model.update(status='failed', error=error)
+                if not submitted:
+                    self._finish(job)
+        # Registered outside the lock, since a future that already finished runs its callback inline.
+        for name, future in submitted.items():
+            future.add_done_callback(lambda f, name=name: self._model_finished(job, name, f, pool))
+
+    def _discard_pool(self, pool):
+        """Drop a pool whose worker died, so the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is pool:
+                self._executor = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _model_finished(self, job, name, future, pool):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._discard_pool(pool)
+        with self._lock:
+            model = job.models[name]
+            if error is None:
+                model['loss'], model['seconds'] = future.result()
+                model['status'] = 'succeeded'
+            else:
+                model['status'] = 'failed'
+                model['error'] = ''.join(traceback.format_exception_only(type(error), error)).strip()
+                logger.warning('Training %s for job %s failed: %s', name, job.id, model['error'])
+            if all(m['status'] != 'running' for m in job.models.values()):
+                self._finish(job)
+
+    def _finish(self, job):
+        if job.snapshot['status'] == 'failed':
+            job.status = 'failed'
+            job.error = 'Could not snapshot the training data'
+        elif any(m['status'] == 'failed' for m in job.models.values()):
+            job.status = 'failed'
+            job.error = 'Not every model trained; no artifacts were promoted'
+        elif job.sequence < self._promoted_sequence:
+            job.status = 'superseded'
+        else:
+            # Every artifact the trainers wrote, e.g. exported weights too, is served as one set.
+            publish_model_set(job.staging_dir, self.model_dir, job.id)
+            self._promoted_sequence = job.sequence
+            job.status = 'succeeded'
+        shutil.rmtree(job.staging_dir, ignore_errors=True)
+        shutil.rmtree(job.snapshot_dir, ignore_errors=True)
+        job.finished_at = _now()
+        logger.info('Training job %s %s', job.id, job.status)
+
+
+queue = TrainingJobQueue()
@@ -0,0 +1,85 @@
+"""NumPy-only forward pass for the small ReLU MLPs trained with TensorFlow and PyTorch.
+
+Weights are exported to an uncompressed .npz holding kernels W0..Wn shaped
+(inputs, outputs), biases b0..bn and one activation name per layer.
+"""
+import os
+
+import numpy as np
+
+from ml_models.registry import publish_artifact
+
+ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'linear': lambda x: x,
+}
+
+VERIFY_ROWS = 64
+VERIFY_TOLERANCE = 1e-4
+
+
+def exported_path(path):
+    return os.path.splitext(path)[0] + '.npz'
+
+
+class NumpyMLP:
+    def __init__(self, kernels, biases, activations):
+        unknown = set(activations) - set(ACTIVATIONS)
+        if unknown:
+            raise ValueError('Unsupported activations: %s' % ', '.join(sorted(unknown)))
+        self.layers = [(np.ascontiguousarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32),
+                        ACTIVATIONS[activation])
+                       for kernel, bias, activation in zip(kernels, biases, activations)]
+        self.activations = list(activations)
+
+    @property
+    def input_dim(self):
+        return self.layers[0][0].shape[0]
+
+    def __call__(self, features):
+        x = np.asarray(features, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+    def save(self, path):
+        arrays = {'activations': np.array(self.activations)}
+        for i, (kernel, bias, _) in enumerate(self.layers):
+            arrays['W%d' % i] = kernel
+            arrays['b%d' % i] = bias
+        tmp_path = path[:-len('.npz')] + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        publish_artifact(tmp_path, path)
+
+
+def load_mlp(path):
+    with np.load(path, allow_pickle=False) as arrays:
+        count = len(arrays['activations'])
+        return NumpyMLP([arrays['W%d' % i] for i in range(count)], [arrays['b%d' % i] for i in range(count)],
+                        [str(name) for name in arrays['activations']])
+
+
+def score_mlp_batch(model, features, columns):
+    return model(features)
+
+
+def verify(mlp, reference, seed=0):
+    """Raise if the NumPy forward pass drifts from the framework's on random inputs.
+
+    reference maps a float32 (rows, input_dim) matrix to the framework's predictions.
+    """
+    probe = np.random.default_rng(seed).standard_normal((VERIFY_ROWS, mlp.input_dim)).astype(np.float32)
+    expected = np.asarray(reference(probe), dtype=np.float32).reshape(VERIFY_ROWS, -1)
+    actual = mlp(probe)
+    scale = max(1.0, float(np.abs(expected).max()))
+    error = float(np.abs(actual - expected).max()) / scale
+    if error > VERIFY_TOLERANCE:
+        raise ValueError('NumPy MLP differs from the framework model (relative error %.2e)' % error)
+    return error
+
+
+def export_mlp(mlp, reference, path):
+    """Check mlp against the framework model, then write it to path."""
+    verify(mlp, reference)
+    mlp.save(path)
+    return mlp
@@ -2,6 +2,16 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 
+from ml_models.backends import model_path
+from ml_models.numpy_mlp import NumpyMLP, export_mlp, exported_path
+from ml_models.registry import publish_artifact
+from ml_models.training_data import evaluation_mse
+
+MODEL_PATH = model_path('pytorch')
+
+EPOCHS = 20
+BATCH_SIZE = 256
+
 class SimpleNN(nn.Module):
     def __init__(self, input_dim):
         super(SimpleNN, self).__init__()
@@ -15,25 +25,40 @@ class SimpleNN(nn.Module):
         x = self.fc3(x)
         return x
 
-def train_pytorch_model(data):
-    X = torch.tensor(data.drop('total_mass_co2_sequestered', axis=1).values, dtype=torch.float32)
-    y = torch.tensor(data['total_mass_co2_sequestered'].values, dtype=torch.float32).view(-1, 1)
-    
-    model = SimpleNN(X.shape[1])
+def train_pytorch_model(data, path=MODEL_PATH):
+    model = SimpleNN(data.train.n_features)
     criterion = nn.MSELoss()
     optimizer = optim.Adam(model.parameters(), lr=0.001)
     
-    for epoch in range(100):
-        optimizer.zero_grad()
-        output = model(X)
-        loss = criterion(output, y)
-        loss.backward()
-        optimizer.step()
+    for epoch in range(EPOCHS):
+        for X, y in data.train.batches(BATCH_SIZE, shuffle=True, seed=epoch):
+            optimizer.zero_grad()
+            output = model(torch.from_numpy(X))
+            loss = criterion(output, torch.from_numpy(y).view(-1, 1))
+            loss.backward()
+            optimizer.step()
     
-    torch.save(model.state_dict(), '/app/ml_models/pytorch_model.pth')
-    return loss.item()
+    tmp_path = path + '.tmp'
+    torch.save(model.state_dict(), tmp_path)
+    publish_artifact(tmp_path, path)
+    export_pytorch_model(model, exported_path(path))
+    return evaluation_mse(lambda X: score_pytorch_batch(model, X, None), data)
+
+def load_pytorch_model(path):
+    state = torch.load(path, weights_only=True)
+    # The input width is not stored separately; it is the width of the first layer.
+    model = SimpleNN(state['fc1.weight'].shape[1])
+    model.load_state_dict(state)
+    model.eval()
+    return model
+
+def score_pytorch_batch(model, features, columns):
+    with torch.no_grad():
+        return model(torch.from_numpy(features)).numpy()
 
-def predict_with_pytorch_model(input_data):
-    model = SimpleNN(input_data.shape[1])
-    model.load_state_dict(torch.load('/app/ml_models/pytorch_model.pth'))
-    return model(input_data)
+def export_pytorch_model(model, path):
+    layers = [model.fc1, model.fc2, model.fc3]
+    mlp = NumpyMLP([layer.weight.detach().numpy().T for layer in layers],
+                   [layer.bias.detach().numpy() for layer in layers],
+                   ['relu', 'relu', 'linear'])
+    return export_mlp(mlp, lambda features: score_pytorch_batch(model, features, None), path)
@@ -0,0 +1,148 @@
+import logging
+import os
+import shutil
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.getenv('MODEL_DIR', '/app/ml_models')
+# A model directory serves the set of artifacts named in CURRENT from SETS_DIR, or,
+# before any set has been promoted, the artifacts stored in it directly.
+CURRENT_FILE = 'CURRENT'
+SETS_DIR = 'sets'
+
+LoadedModel = namedtuple('LoadedModel', ['model', 'version', 'loaded_at', 'model_set', 'path'])
+
+
+def file_version(path):
+    """Version stamp of a model artifact: its modification time in nanoseconds."""
+    return os.stat(path).st_mtime_ns
+
+
+def publish_artifact(tmp_path, path):
+    """Move a fully written artifact into place so readers never see a partial file."""
+    os.replace(tmp_path, path)
+
+
+def current_model_set(model_dir):
+    """Name of the model set model_dir serves, or None if it serves its own artifacts."""
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def artifact_path(path, model_set):
+    """Where the artifact registered at path lives in model_set."""
+    if model_set is None:
+        return path
+    model_dir, artifact = os.path.split(path)
+    return os.path.join(model_dir, SETS_DIR, model_set, artifact)
+
+
+def current_artifact_path(path):
+    return artifact_path(path, current_model_set(os.path.dirname(path)))
+
+
+def publish_model_set(staging_dir, model_dir, name):
+    """Move a directory of fully written artifacts into model_dir as one set and serve it.
+
+    Readers find the set through CURRENT, which is swapped in atomically, so they load
+    every model from the old set or every model from the new one. The set it replaces
+    is kept for readers that resolved CURRENT just before the swap; older ones are removed.
+    """
+    sets_dir = os.path.join(model_dir, SETS_DIR)
+    os.makedirs(sets_dir, exist_ok=True)
+    os.rename(staging_dir, os.path.join(sets_dir, name))
+    previous = current_model_set(model_dir)
+    pointer = os.path.join(model_dir, f'.{CURRENT_FILE}.{name}')
+    with open(pointer, 'w') as f:
+        f.write(name)
+    publish_artifact(pointer, os.path.join(model_dir, CURRENT_FILE))
+    for entry in os.listdir(sets_dir):
+        if entry not in (name, previous):
+            shutil.rmtree(os.path.join(sets_dir, entry), ignore_errors=True)
+
+
+class ModelRegistry:
+    """Keeps each model loaded once per worker and reloads it when its artifact changes.
+
+    A reload happens outside the lock and the new model is swapped in as a whole,
+    so concurrent requests see either the old or the new model, never a mix. Any
+    version change counts, so restoring an older artifact rolls the model back.
+    get_many() resolves the served model set once, so the models it returns were
+    trained together.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+        self._loaded = {}
+
+    def register(self, name, path, loader):
+        with self._lock:
+            self._sources[name] = (path, loader)
+            self._loaded.pop(name, None)
+
+    def unregister(self, name):
+        with self._lock:
+            self._sources.pop(name, None)
+            self._loaded.pop(name, None)
+
+    def get(self, name):
+        return self.get_many([name])[name]
+
+    def get_many(self, names):
+        """The named models, all loaded from the model set served when the call began."""
+        model_sets = {}
+        models = {}
+        for name in names:
+            path, loader = self._sources[name]
+            model_dir = os.path.dirname(path)
+            if model_dir not in model_sets:
+                model_sets[model_dir] = current_model_set(model_dir)
+            models[name] = self._get(name, path, loader, model_sets[model_dir])
+        return models
+
+    def _get(self, name, path, loader, model_set):
+        path = artifact_path(path, model_set)
+        version = file_version(path)
+        current = self._loaded.get(name)
+        if current is not None and current.model_set == model_set and current.version == version:
+            return current.model
+
+        model = loader(path)
+        loaded = LoadedModel(model, version, datetime.now(timezone.utc), model_set, path)
+        with self._lock:
+            current = self._loaded.get(name)
+            if current is None or (current.model_set, current.version) != (model_set, version):
+                self._loaded[name] = loaded
+                logger.info('Loaded %s model version %s from %s', name, version, path)
+        return model
+
+    def versions(self):
+        """What each registered model is serving: None until it has been loaded."""
+        versions = {}
+        for name in self._sources:
+            loaded = self._loaded.get(name)
+            versions[name] = None if loaded is None else {
+                'version': loaded.version,
+                'model_set': loaded.model_set,
+                'modified_at': datetime.fromtimestamp(loaded.version / 1e9, timezone.utc).isoformat(),
+                'loaded_at': loaded.loaded_at.isoformat(),
+                'path': loaded.path,
+            }
+        return versions
+
+    def warm_up(self, names=None):
+        for name in names or list(self._sources):
+            try:
+                self.get(name)
+            except (OSError, ValueError) as e:
+                logger.warning('Could not warm up %s model: %s', name, e)
+
+
+registry = ModelRegistry()
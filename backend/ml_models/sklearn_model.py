@@ -1,28 +1,101 @@
+import logging
+import math
+import os
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV, HalvingRandomSearchCV, KFold
 import pickle
 
-def train_sklearn_model(data):
-    X = data.drop('total_mass_co2_sequestered', axis=1)
-    y = data['total_mass_co2_sequestered']
+from ml_models.backends import model_path
+from ml_models.registry import publish_artifact
+from ml_models.training_data import evaluation_mse
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    model = RandomForestRegressor()
-    model.fit(X_train, y_train)
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = model_path('sklearn')
+
+TOTAL_TREES = 100
+CHUNK_ROWS = 50000
+
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200, 400],
+    'max_depth': [None, 8, 16, 32],
+    'min_samples_leaf': [1, 2, 5, 10],
+    'max_features': [1.0, 0.5, 'sqrt'],
+}
+SEARCH_MAX_ROWS = 200000
+SEARCH_FOLDS = 5
+SEARCH_CANDIDATES = 32
 
-    predictions = model.predict(X_test)
-    mse = mean_squared_error(y_test, predictions)
+def search_results_path(path):
+    return os.path.splitext(path)[0] + '_search.csv'
+
+def train_sklearn_model(data, path=MODEL_PATH, search=False, **search_options):
+    if search:
+        return search_sklearn_model(data, path, **search_options)
+
+    # With warm_start each fit() only grows the new trees, so every chunk of the
+    # snapshot trains its own share of the forest and no fit sees the whole table.
+    chunks = math.ceil(data.train.n_rows / CHUNK_ROWS)
+    model = RandomForestRegressor(n_estimators=0, warm_start=True)
+    for X, y in data.train.batches(CHUNK_ROWS, shuffle=True, seed=42):
+        model.n_estimators += math.ceil(TOTAL_TREES / chunks)
+        model.fit(pd.DataFrame(X, columns=data.columns), y)
+
+    mse = evaluation_mse(lambda X: score_sklearn_batch(model, X, data.columns), data)
     
-    with open('/app/ml_models/sklearn_model.pkl', 'wb') as f:
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
         pickle.dump(model, f)
+    publish_artifact(tmp_path, path)
     
     return mse
 
-def predict_with_sklearn_model(input_data):
-    with open('/app/ml_models/sklearn_model.pkl', 'rb') as f:
-        model = pickle.load(f)
-    
-    return model.predict(input_data)
+def search_sklearn_model(data, path=MODEL_PATH, space=None, grid=False, folds=SEARCH_FOLDS,
+                         candidates=SEARCH_CANDIDATES, max_rows=SEARCH_MAX_ROWS, n_jobs=-1):
+    """Successive-halving k-fold search over space, refitting the best forest.
+
+    Candidates start on a small share of the rows and only the best third
+    advance to each larger round. Folds run in parallel on joblib's process
+    pool. The search runs on at most max_rows rows sampled from the training
+    split. Writes the best model to path and the per-candidate results,
+    including per-fold scores and fit times, to search_results_path(path).
+    """
+    space = space or SEARCH_SPACE
+    cv = KFold(folds, shuffle=True, random_state=42)
+    if grid:
+        search = HalvingGridSearchCV(RandomForestRegressor(), space, cv=cv, scoring='neg_mean_squared_error',
+                                     n_jobs=n_jobs, random_state=42)
+    else:
+        search = HalvingRandomSearchCV(RandomForestRegressor(), space, n_candidates=candidates, cv=cv,
+                                       scoring='neg_mean_squared_error', n_jobs=n_jobs, random_state=42)
+    X, y = data.train.sample(max_rows, seed=42)
+    search.fit(pd.DataFrame(X, columns=data.columns), y)
+    model = search.best_estimator_
+    mse = evaluation_mse(lambda X: score_sklearn_batch(model, X, data.columns), data)
+
+    results = pd.DataFrame(search.cv_results_)
+    fold_columns = [f'split{i}_test_score' for i in range(folds)]
+    results = results[['iter', 'n_resources', 'params', 'rank_test_score', 'mean_test_score', 'std_test_score']
+                      + fold_columns + ['mean_fit_time', 'std_fit_time']]
+    results_path = search_results_path(path)
+    results.to_csv(results_path + '.tmp', index=False)
+    publish_artifact(results_path + '.tmp', results_path)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f)
+    publish_artifact(tmp_path, path)
+    logger.info('Best sklearn parameters %s (CV MSE %.4g, held-out MSE %.4g)',
+                 search.best_params_, -search.best_score_, mse)
+    return mse
+
+def load_sklearn_model(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def score_sklearn_batch(model, features, columns):
+    if hasattr(model, 'feature_names_in_'):
+        features = pd.DataFrame(features, columns=columns, copy=False)
+    return model.predict(features)
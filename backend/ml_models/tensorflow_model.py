@@ -1,25 +1,51 @@
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
-import pandas as pd
 
-def train_tensorflow_model(data):
-    X = data.drop('total_mass_co2_sequestered', axis=1)
-    y = data['total_mass_co2_sequestered']
+from ml_models.backends import model_path
+from ml_models.numpy_mlp import NumpyMLP, export_mlp, exported_path
+from ml_models.registry import publish_artifact
+from ml_models.training_data import evaluation_mse
+
+MODEL_PATH = model_path('tensorflow')
+
+EPOCHS = 20
+BATCH_SIZE = 256
+
+def train_tensorflow_model(data, path=MODEL_PATH):
+    n_features = data.train.n_features
+    batches = tf.data.Dataset.from_generator(
+        lambda: data.train.batches(BATCH_SIZE, shuffle=True),
+        output_signature=(tf.TensorSpec((None, n_features), tf.float32), tf.TensorSpec((None,), tf.float32)),
+    ).prefetch(2)
 
     model = Sequential([
-        Dense(64, activation='relu', input_shape=(X.shape[1],)),
+        Dense(64, activation='relu', input_shape=(n_features,)),
         Dense(64, activation='relu'),
         Dense(1)
     ])
     
     model.compile(optimizer='adam', loss='mse')
-    model.fit(X, y, epochs=50, batch_size=32)
+    model.fit(batches, epochs=EPOCHS, verbose=0)
     
-    model.save('/app/ml_models/tensorflow_model.h5')
+    # Keras picks the file format from the extension, so the temporary file keeps .h5.
+    tmp_path = path[:-len('.h5')] + '.tmp.h5'
+    model.save(tmp_path)
+    publish_artifact(tmp_path, path)
+    export_tensorflow_model(model, exported_path(path))
     
-    return model.evaluate(X, y)
+    return evaluation_mse(lambda X: score_tensorflow_batch(model, X, None), data)
+
+def load_tensorflow_model(path):
+    return tf.keras.models.load_model(path, compile=False)
+
+def score_tensorflow_batch(model, features, columns):
+    # Calling the model directly skips predict()'s per-call dataset setup.
+    return model(features, training=False).numpy()
 
-def predict_with_tensorflow_model(input_data):
-    model = tf.keras.models.load_model('/app/ml_models/tensorflow_model.h5')
-    return model.predict(input_data)
+def export_tensorflow_model(model, path):
+    dense = [layer for layer in model.layers if layer.get_weights()]
+    mlp = NumpyMLP([layer.get_weights()[0] for layer in dense],
+                   [layer.get_weights()[1] for layer in dense],
+                   [layer.activation.__name__ for layer in dense])
+    return export_mlp(mlp, lambda features: score_tensorflow_batch(model, features, None), path)
@@ -0,0 +1,140 @@
+"""Training data split out of the project snapshot into a memory-mapped snapshot of its own.
+
+A snapshot directory holds raw float32 features and targets for a train and a
+test split plus a manifest with their shapes. Trainers read it in mini-batches
+through np.memmap, so memory stays bounded however large the table grows.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from rating_engine import YEAR_COLUMNS
+
+TARGET_COLUMN = 'total_mass_co2_sequestered'
+# The total is loaded from the latest year's column, so that year is the target and
+# only the years before it are features.
+HISTORY_COLUMNS = YEAR_COLUMNS[:-1]
+FEATURE_COLUMNS = ['latitude', 'longitude'] + HISTORY_COLUMNS
+
+SNAPSHOT_CHUNK_SIZE = 10000
+EVAL_BATCH_SIZE = 10000
+TEST_FRACTION = 0.2
+SPLITS = ('train', 'test')
+MANIFEST_FILE = 'manifest.json'
+
+Snapshot = namedtuple('Snapshot', ['train', 'test', 'columns'])
+
+
+def iter_feature_chunks(chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """Yield (ids, features, target) for projects with a total, chunk by chunk in id order.
+
+    Rows are sliced out of the memory-mapped project snapshot rather than queried.
+    Missing coordinates and yearly totals become 0.
+    """
+    import project_snapshot
+    snapshot = project_snapshot.current()
+    history = [snapshot.manifest['yearly_columns'].index(column) for column in HISTORY_COLUMNS]
+    rows = np.flatnonzero(~np.isnan(snapshot[TARGET_COLUMN]))
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        features = np.column_stack([snapshot['latitude'][chunk], snapshot['longitude'][chunk],
+                                    snapshot['yearly'][chunk][:, history]])
+        yield (snapshot['id'][chunk], np.nan_to_num(features, nan=0.0).astype(np.float32),
+               snapshot[TARGET_COLUMN][chunk].astype(np.float32))
+
+
+def in_test_split(ids, test_fraction=TEST_FRACTION):
+    """Deterministic split on a multiplicative hash of the id, stable as rows are added."""
+    return (ids.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) < test_fraction * 2 ** 32
+
+
+def _split_paths(directory, split):
+    return os.path.join(directory, f'{split}_features.f32'), os.path.join(directory, f'{split}_target.f32')
+
+
+def write_snapshot(directory, test_fraction=TEST_FRACTION, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    rows = dict.fromkeys(SPLITS, 0)
+    files = {split: [open(path, 'wb') for path in _split_paths(directory, split)] for split in SPLITS}
+    try:
+        for ids, features, target in iter_feature_chunks(chunk_size):
+            test = in_test_split(ids, test_fraction)
+            for split, mask in (('train', ~test), ('test', test)):
+                features_file, target_file = files[split]
+                features_file.write(np.ascontiguousarray(features[mask]).tobytes())
+                target_file.write(target[mask].tobytes())
+                rows[split] += int(mask.sum())
+    finally:
+        for split_files in files.values():
+            for f in split_files:
+                f.close()
+    if rows['train'] == 0:
+        raise ValueError('No projects with a total to train on')
+
+    manifest = {'columns': FEATURE_COLUMNS, 'target': TARGET_COLUMN, 'rows': rows,
+                'seconds': time.perf_counter() - started}
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+class TrainingData:
+    def __init__(self, features, target):
+        self.features = features
+        self.target = target
+
+    @property
+    def n_rows(self):
+        return self.features.shape[0]
+
+    @property
+    def n_features(self):
+        return self.features.shape[1]
+
+    def batches(self, batch_size, shuffle=False, seed=None):
+        """Yield (features, target) copies of consecutive row blocks.
+
+        Shuffling reorders the blocks, not rows, so reads from the memory map stay sequential.
+        """
+        starts = np.arange(0, self.n_rows, batch_size)
+        if shuffle:
+            np.random.default_rng(seed).shuffle(starts)
+        for start in starts:
+            yield np.array(self.features[start:start + batch_size]), np.array(self.target[start:start + batch_size])
+
+    def sample(self, max_rows, seed=None):
+        """At most max_rows random rows, read into memory in row order."""
+        if self.n_rows <= max_rows:
+            return np.array(self.features), np.array(self.target)
+        rows = np.sort(np.random.default_rng(seed).choice(self.n_rows, max_rows, replace=False))
+        return self.features[rows], self.target[rows]
+
+
+def _open_split(directory, split, rows, n_features):
+    features_path, target_path = _split_paths(directory, split)
+    if rows == 0:
+        return TrainingData(np.empty((0, n_features), np.float32), np.empty(0, np.float32))
+    return TrainingData(np.memmap(features_path, dtype=np.float32, mode='r', shape=(rows, n_features)),
+                        np.memmap(target_path, dtype=np.float32, mode='r', shape=(rows,)))
+
+
+def open_snapshot(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    columns = manifest['columns']
+    return Snapshot(*(_open_split(directory, split, manifest['rows'][split], len(columns)) for split in SPLITS),
+                    columns)
+
+
+def evaluation_mse(predict, snapshot, batch_size=EVAL_BATCH_SIZE):
+    """Mean squared error of predict over the test split, or the train split when there are no test rows."""
+    data = snapshot.test if snapshot.test.n_rows else snapshot.train
+    squared_error = 0.0
+    for features, target in data.batches(batch_size):
+        error = np.asarray(predict(features), dtype=np.float64).reshape(-1) - target
+        squared_error += float(error @ error)
+    return squared_error / data.n_rows
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+import math
+
+from sqlalchemy import and_, tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort, sort_value, row_id):
+    """An opaque cursor after (sort_value, row_id), valid only for the sort (key and direction) it came from."""
+    payload = json.dumps([sort, sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _is_column_value(value, column):
+    if value is None:
+        return column.nullable
+    if isinstance(value, bool):
+        return False
+    python_type = column.type.python_type
+    if python_type is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, python_type)
+
+
+def decode_cursor(cursor, sort, column):
+    """(sort_value, row_id) of a cursor made by encode_cursor for sort over column.
+
+    Raises InvalidCursor for a malformed cursor, one made for another sort key or
+    direction, or one whose sort value is not a value of the column.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, sort_value, row_id = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if cursor_sort != sort or isinstance(row_id, bool) or not isinstance(row_id, int) \
+            or not _is_column_value(sort_value, column):
+        raise InvalidCursor(cursor)
+    return sort_value, row_id
+
+
+def keyset_order(column, id_column, descending):
+    """ORDER BY for keyset pagination: the sort column, then the id as tie-breaker.
+
+    Both run in the same direction, so one plain (column, id) index serves ascending
+    and descending listings alike. NULL sort values are paged by keyset_branches.
+    """
+    if descending:
+        return [column.desc(), id_column.desc()]
+    return [column.asc(), id_column.asc()]
+
+
+def keyset_branches(column, id_column, descending, sort_value=None, row_id=None):
+    """WHERE clauses selecting, in order, the rows that follow (sort_value, row_id) in keyset_order.
+
+    Without a cursor they select every row. Rows with a sort value come first, as a
+    row-value range over (column, id); a nullable column's NULL rows follow in a branch
+    of their own, ordered by id. Each clause is a single range of a (column, id) index,
+    so the caller runs them one after another until its page is full. A None clause
+    means no filter.
+    """
+    if row_id is not None and sort_value is None:
+        return [and_(column.is_(None), id_column < row_id if descending else id_column > row_id)]
+    if row_id is None:
+        branches = [column.isnot(None)] if column.nullable else [None]
+    elif descending:
+        branches = [tuple_(column, id_column) < tuple_(sort_value, row_id)]
+    else:
+        branches = [tuple_(column, id_column) > tuple_(sort_value, row_id)]
+    if column.nullable:
+        branches.append(column.is_(None))
+    return branches
@@ -0,0 +1,232 @@
+"""A columnar copy of carbon_project, memory-mapped by its readers.
+
+Each column is a .npy file in a snapshot directory, with a manifest recording the
+dataset version it was taken at and the category lists behind its coded columns.
+Readers open the columns with np.load(mmap_mode='r'), so every process reading the
+same snapshot shares one page-cached copy instead of hydrating rows of its own.
+
+Text columns are stored as int32 codes into a category list, with -1 for NULL.
+A project's industry subparts are a ragged column: the codes of project i are
+subpart_codes[subpart_offsets[i]:subpart_offsets[i + 1]].
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import select
+
+import dataset_version
+import metrics
+import rating_engine
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv('PROJECT_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'carbon-project-snapshot'))
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+STAGING_PREFIX = '.staging-'
+STAGING_MAX_AGE_SECONDS = 3600
+SNAPSHOT_CHUNK_SIZE = 10000
+
+FLOAT_COLUMNS = ['latitude', 'longitude', 'total_mass_co2_sequestered', 'duration_years']
+CODED_COLUMNS = ['state']
+
+_lock = threading.Lock()
+_opened = {}
+
+
+def _codes(values, categories):
+    index = {value: code for code, value in enumerate(categories)}
+    return np.array([-1 if value is None else index[value] for value in values], dtype=np.int32)
+
+
+def _read_table(chunk_size):
+    """Every column of the table as in-memory arrays, read chunk by chunk in id order."""
+    from app import db, CarbonProject, IndustryType, ProjectSubpart
+    # Core statements over the tables skip ORM row processing, most of the cost here.
+    table, subpart_table = CarbonProject.__table__, ProjectSubpart.__table__
+    columns = ['id'] + FLOAT_COLUMNS + rating_engine.YEAR_COLUMNS + CODED_COLUMNS
+    n_numeric = 1 + len(FLOAT_COLUMNS) + len(rating_engine.YEAR_COLUMNS)
+    numeric, coded = [], {column: [] for column in CODED_COLUMNS}
+    last_id = 0
+    while True:
+        rows = db.session.execute(select(*[table.c[column] for column in columns])
+                                  .where(table.c.id > last_id)
+                                  .order_by(table.c.id)
+                                  .limit(chunk_size)).all()
+        if not rows:
+            break
+        numeric.append(np.array([row[:n_numeric] for row in rows], dtype=np.float64))
+        for offset, column in enumerate(CODED_COLUMNS, n_numeric):
+            coded[column].extend(row[offset] for row in rows)
+        last_id = rows[-1][0]
+    values = np.concatenate(numeric) if numeric else np.empty((0, n_numeric))
+
+    arrays = {'id': values[:, 0].astype(np.int64)}
+    for offset, column in enumerate(FLOAT_COLUMNS, 1):
+        arrays[column] = values[:, offset]
+    arrays['yearly'] = np.ascontiguousarray(values[:, 1 + len(FLOAT_COLUMNS):])
+    categories = {}
+    for column in CODED_COLUMNS:
+        categories[column] = sorted({value for value in coded[column] if value is not None})
+        arrays[column] = _codes(coded[column], categories[column])
+
+    subparts = db.session.execute(select(subpart_table.c.project_id, subpart_table.c.subpart_code)
+                                  .order_by(subpart_table.c.project_id, subpart_table.c.subpart_code)).all()
+    project_ids = [project_id for project_id, _ in subparts]
+    subpart_codes = [code for _, code in subparts]
+    rows = np.searchsorted(arrays['id'], np.array(project_ids, dtype=np.int64))
+    # Bridge rows of projects inserted after the table was read are dropped.
+    if len(arrays['id']):
+        kept = (rows < len(arrays['id'])) & (arrays['id'][np.minimum(rows, len(arrays['id']) - 1)] == project_ids)
+    else:
+        kept = np.zeros(len(rows), dtype=bool)
+    subpart_codes = [code for code, keep in zip(subpart_codes, kept) if keep]
+    categories['subpart_code'] = sorted(set(subpart_codes))
+    arrays['subpart_codes'] = _codes(subpart_codes, categories['subpart_code'])
+    arrays['subpart_offsets'] = np.concatenate([[0], np.cumsum(np.bincount(rows[kept], minlength=len(arrays['id'])))])
+
+    names = dict(db.session.query(IndustryType.subpart_code, IndustryType.name))
+    industry_names = [names.get(code, code) for code in categories['subpart_code']]
+    return arrays, categories, industry_names
+
+
+def _current_name(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(directory=SNAPSHOT_DIR, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """Snapshot carbon_project into a new subdirectory and make it the current one.
+
+    Reads committed data through the session, so call it outside a write transaction.
+    Returns the new snapshot's path and manifest.
+    """
+    snapshot = _publish_snapshot(directory, chunk_size)
+    return snapshot.path, snapshot.manifest
+
+
+def _publish_snapshot(directory, chunk_size):
+    """write_snapshot, returning the new snapshot already opened."""
+    started = time.perf_counter()
+    version = dataset_version.current()
+    with metrics.span('project_snapshot'):
+        arrays, categories, industry_names = _read_table(chunk_size)
+    os.makedirs(directory, exist_ok=True)
+    name = f'v{version}-{uuid.uuid4().hex[:8]}'
+    staging = os.path.join(directory, STAGING_PREFIX + name)
+    os.makedirs(staging)
+    for column, values in arrays.items():
+        np.save(os.path.join(staging, f'{column}.npy'), values, allow_pickle=False)
+    manifest = {
+        'version': version,
+        'rows': len(arrays['id']),
+        'columns': sorted(arrays),
+        'yearly_columns': rating_engine.YEAR_COLUMNS,
+        'categories': categories,
+        'industry_names': industry_names,
+        'seconds': time.perf_counter() - started,
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+    path = os.path.join(directory, name)
+    # Mapped before anyone can see it: once published, another writer's prune may remove it.
+    snapshot = ProjectSnapshot(path, manifest, columns_dir=staging)
+    os.rename(staging, path)
+
+    # Readers find the snapshot through CURRENT, which is swapped in atomically.
+    previous = _current_name(directory)
+    pointer = os.path.join(directory, STAGING_PREFIX + CURRENT_FILE + name)
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+    _prune(directory, keep={name, previous})
+    logger.info('Wrote project snapshot %s with %d rows in %.2fs', name, manifest['rows'], manifest['seconds'])
+    return snapshot
+
+
+def _prune(directory, keep):
+    """Remove snapshots other than keep, and staging files abandoned by crashed writers.
+
+    The previous snapshot is kept so readers that just resolved CURRENT can still map it.
+    A concurrent writer may remove ours as well; its writer mapped it before publishing.
+    """
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry.startswith(STAGING_PREFIX):
+            if time.time() - os.path.getmtime(path) <= STAGING_MAX_AGE_SECONDS:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        elif entry.startswith('v') and entry not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ProjectSnapshot:
+    def __init__(self, path, manifest, columns_dir=None):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.n_rows = manifest['rows']
+        self.categories = manifest['categories']
+        self.industry_names = manifest['industry_names']
+        # Mapped up front, so a writer pruning the directory later cannot pull files from under us.
+        self._columns = {column: np.load(os.path.join(columns_dir or path, f'{column}.npy'), mmap_mode='r')
+                         for column in manifest['columns']}
+
+    def __getitem__(self, column):
+        """A read-only memory-mapped column."""
+        return self._columns[column]
+
+    def year(self, year):
+        return self['yearly'][:, self.manifest['yearly_columns'].index(f'total_mass_co2_sequestered_{year}')]
+
+    def rating_columns(self):
+        return rating_engine.ProjectColumns(total_co2=self['total_mass_co2_sequestered'],
+                                            duration=self['duration_years'], yearly=self['yearly'])
+
+    def subpart_rows(self):
+        """(rows, codes): the snapshot row of each (project, subpart code) pair."""
+        offsets = self['subpart_offsets']
+        return np.repeat(np.arange(self.n_rows), np.diff(offsets)), np.asarray(self['subpart_codes'])
+
+
+def open_snapshot(directory=SNAPSHOT_DIR):
+    """The current snapshot in directory, or None if none has been written."""
+    name = _current_name(directory)
+    if name is None:
+        return None
+    path = os.path.join(directory, name)
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return ProjectSnapshot(path, json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def current(directory=SNAPSHOT_DIR):
+    """A snapshot at the current dataset version, written first if the latest one is stale.
+
+    Reads committed data through the session, so call it outside a write transaction.
+    """
+    version = dataset_version.current()
+    with _lock:
+        snapshot = _opened.get(directory)
+        if snapshot is None or snapshot.version != version:
+            snapshot = open_snapshot(directory)
+            if snapshot is None or snapshot.version != version:
+                snapshot = _publish_snapshot(directory, SNAPSHOT_CHUNK_SIZE)
+            _opened[directory] = snapshot
+        return snapshot
+
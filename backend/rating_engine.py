@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+import numpy as np
+
+WEIGHTS = {'total_co2': 0.3, 'duration': 0.2, 'co2_per_year': 0.5}
+# Column order of component_scores and of weight vectors.
+COMPONENTS = list(WEIGHTS)
+
+YEARS = list(range(2016, 2023))
+YEAR_COLUMNS = [f'total_mass_co2_sequestered_{year}' for year in YEARS]
+
+# Column order used when loading projects (or raw query rows) into arrays.
+RATING_COLUMNS = ['total_mass_co2_sequestered', 'duration_years'] + YEAR_COLUMNS
+
+ProjectColumns = namedtuple('ProjectColumns', ['total_co2', 'duration', 'yearly'])
+
+RatingBounds = namedtuple('RatingBounds', [
+    'min_co2', 'max_co2',
+    'min_duration', 'max_duration',
+    'min_co2_per_year', 'max_co2_per_year',
+])
+
+
+def columns_from_rows(rows):
+    """Load rows of RATING_COLUMNS values into float arrays, with None as NaN."""
+    data = np.array(rows, dtype=np.float64).reshape(-1, len(RATING_COLUMNS))
+    return ProjectColumns(total_co2=data[:, 0], duration=data[:, 1], yearly=data[:, 2:])
+
+
+def columns_from_projects(projects):
+    return columns_from_rows([[getattr(p, column) for column in RATING_COLUMNS] for p in projects])
+
+
+def _min_max(values, default=0.0):
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return float(default), float(default)
+    return float(values.min()), float(values.max())
+
+
+def co2_per_year(yearly):
+    """(last - first) / (n - 1) over each row's reported years, the single value
+    when only one year is reported, and 0 when none are."""
+    reported = ~np.isnan(yearly)
+    counts = reported.sum(axis=1)
+    rows = np.arange(yearly.shape[0])
+    first = yearly[rows, reported.argmax(axis=1)]
+    last = yearly[rows, yearly.shape[1] - 1 - reported[:, ::-1].argmax(axis=1)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (last - first) / (counts - 1)
+    return np.where(counts > 1, slope, np.where(counts == 1, first, 0.0))
+
+
+def bound_inputs(columns):
+    """The per-project values whose (min, max) make up RatingBounds, in field order.
+
+    The per-year bounds only look at projects reporting since 2016 and always
+    divide the 2016-2022 change by 5, whatever the number of reported years.
+    """
+    yearly = columns.yearly
+    co2_per_year_change = np.where(~np.isnan(yearly[:, 0]), (yearly[:, -1] - yearly[:, 0]) / (6 - 1), np.nan)
+    return [columns.total_co2, columns.duration, co2_per_year_change]
+
+
+def rating_bounds(columns):
+    pairs = [_min_max(values) for values in bound_inputs(columns)]
+    return RatingBounds(*(bound for pair in pairs for bound in pair))
+
+
+def _score(values, low, high):
+    if high == low:
+        return np.zeros_like(values)
+    return (values - low) / (high - low)
+
+
+def component_scores(columns, bounds):
+    """An (n, len(COMPONENTS)) matrix of each project's 0-1 score per rating component."""
+    co2_score = np.nan_to_num(_score(columns.total_co2, bounds.min_co2, bounds.max_co2), nan=0.0)
+    duration = columns.duration
+    duration_score = np.where(
+        ~np.isnan(duration) & (duration != 0),
+        _score(duration, bounds.min_duration, bounds.max_duration),
+        0.0)
+    co2_per_year_score = _score(co2_per_year(columns.yearly), bounds.min_co2_per_year, bounds.max_co2_per_year)
+    return np.column_stack([co2_score, duration_score, co2_per_year_score])
+
+
+def raw_ratings(columns, bounds):
+    scores = component_scores(columns, bounds)
+    return (WEIGHTS['total_co2'] * scores[:, 0] +
+            WEIGHTS['duration'] * scores[:, 1] +
+            WEIGHTS['co2_per_year'] * scores[:, 2]) * 5
+
+
+def normalize_ratings(raw, min_rating=None, max_rating=None):
+    """Rescale raw ratings onto 1-10; every project gets 1 when all raw ratings are equal."""
+    if not raw.size:
+        return raw.copy()
+    min_rating = raw.min() if min_rating is None else min_rating
+    max_rating = raw.max() if max_rating is None else max_rating
+    if max_rating == min_rating:
+        return np.ones_like(raw)
+    return (raw - min_rating) / (max_rating - min_rating) * 9 + 1
+
+
+def weighted_ratings(scores, weights, rows=None):
+    """Ratings and rank positions of every project (or of the given rows) under each row of weights.
+
+    Returns two (n, k) matrices: normalized 1-10 ratings, each weighting rescaled on its
+    own as normalize_ratings does for the default weights, and 1-based ranks, highest
+    rating first, with tied projects sharing the best rank of their group. All k
+    weightings are applied in one matrix product, and only the returned rows are rescaled.
+    """
+    # One contiguous row of raw ratings per weighting keeps the per-weighting sorts fast.
+    raw = np.asarray(weights, dtype=np.float64) @ scores.T * 5
+    selected = raw.copy() if rows is None else raw[:, rows]
+    ranks = np.ones(selected.shape, dtype=np.int64)
+    if not raw.shape[1]:
+        return selected.T, ranks.T
+    raw.sort(axis=1)
+    low, high = raw[:, :1], raw[:, -1:]
+    spread = high > low
+    ratings = np.where(spread, (selected - low) / np.where(spread, high - low, 1.0) * 9 + 1, 1.0)
+    for i in range(len(raw)):
+        ranks[i] = raw.shape[1] - np.searchsorted(raw[i], selected[i], side='right') + 1
+    return ratings.T, ranks.T
+
+
+def compute_ratings(projects):
+    """Return (raw, normalized) rating arrays for projects in a single batched pass."""
+    columns = columns_from_projects(projects)
+    raw = raw_ratings(columns, rating_bounds(columns))
+    return raw, normalize_ratings(raw)
@@ -0,0 +1,123 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import delete, insert
+
+import metrics
+import rating_engine
+
+logger = logging.getLogger(__name__)
+
+BOUNDS_ROW_ID = 1
+
+# A project's rating inputs and stored raw rating, captured before it is changed or deleted.
+PreviousState = namedtuple('PreviousState', ['columns', 'raw_rating'])
+
+
+def _bound_pairs(bounds):
+    return zip(bounds[0::2], bounds[1::2])
+
+
+def _extends_bounds(columns, bounds):
+    return any(np.any((values < low) | (values > high))
+               for values, (low, high) in zip(rating_engine.bound_inputs(columns), _bound_pairs(bounds)))
+
+
+def _holds_bound(columns, bounds):
+    return any(np.any((values == low) | (values == high))
+               for values, (low, high) in zip(rating_engine.bound_inputs(columns), _bound_pairs(bounds)))
+
+
+def _load_bounds():
+    from app import db, RatingBound
+    return db.session.get(RatingBound, BOUNDS_ROW_ID)
+
+
+def rescore_all_projects(snapshot=None):
+    """Recompute every rating, reading the inputs from snapshot when given.
+
+    A snapshot only reflects committed data, so writers rescoring their own changes
+    must leave it out.
+    """
+    from app import db, CarbonProject, ProjectRating, RatingBound
+    if snapshot is not None:
+        ids = snapshot['id'].tolist()
+    else:
+        rows = db.session.query(
+            CarbonProject.id, *[getattr(CarbonProject, column) for column in rating_engine.RATING_COLUMNS]).all()
+        ids = [row[0] for row in rows]
+    with metrics.span('rating'):
+        if snapshot is not None:
+            columns = snapshot.rating_columns()
+        else:
+            columns = rating_engine.columns_from_rows([row[1:] for row in rows])
+        bounds = rating_engine.rating_bounds(columns)
+        raw = rating_engine.raw_ratings(columns, bounds)
+        normalized = rating_engine.normalize_ratings(raw)
+
+    db.session.execute(delete(ProjectRating))
+    if ids:
+        db.session.execute(insert(ProjectRating), [
+            {'project_id': project_id, 'raw_rating': r, 'rating': n}
+            for project_id, r, n in zip(ids, raw.tolist(), normalized.tolist())
+        ])
+    db.session.merge(RatingBound(
+        id=BOUNDS_ROW_ID,
+        min_raw_rating=float(raw.min()) if raw.size else 0.0,
+        max_raw_rating=float(raw.max()) if raw.size else 0.0,
+        **bounds._asdict()))
+    logger.debug("Rescored %d projects.", len(ids))
+
+
+def ensure_ratings_current():
+    if _load_bounds() is None:
+        from app import db
+        rescore_all_projects()
+        db.session.commit()
+
+
+def previous_state(project):
+    from app import db, ProjectRating
+    stored = db.session.get(ProjectRating, project.id)
+    return PreviousState(rating_engine.columns_from_projects([project]), stored.raw_rating if stored else None)
+
+
+def _needs_rescore(stored, previous):
+    if stored is None:
+        return True
+    if previous is None:
+        return False
+    if previous.raw_rating is None:
+        return True
+    return (_holds_bound(previous.columns, stored.as_bounds()) or
+            previous.raw_rating in (stored.min_raw_rating, stored.max_raw_rating))
+
+
+def record_project_saved(project, previous=None):
+    """Keep a created or updated project's rating current, rescoring every
+    project only when the write moves a global bound. Call after a flush."""
+    from app import db, ProjectRating
+    stored = _load_bounds()
+    if _needs_rescore(stored, previous):
+        return rescore_all_projects()
+
+    bounds = stored.as_bounds()
+    columns = rating_engine.columns_from_projects([project])
+    if _extends_bounds(columns, bounds):
+        return rescore_all_projects()
+    with metrics.span('rating'):
+        raw = rating_engine.raw_ratings(columns, bounds)
+    if raw[0] < stored.min_raw_rating or raw[0] > stored.max_raw_rating:
+        return rescore_all_projects()
+
+    normalized = rating_engine.normalize_ratings(raw, stored.min_raw_rating, stored.max_raw_rating)
+    db.session.merge(ProjectRating(project_id=project.id, raw_rating=float(raw[0]), rating=float(normalized[0])))
+
+
+def record_project_deleted(project_id, previous):
+    """Drop a deleted project's rating. Call after the delete has been flushed."""
+    from app import db, ProjectRating
+    if _needs_rescore(_load_bounds(), previous):
+        return rescore_all_projects()
+    db.session.execute(delete(ProjectRating).where(ProjectRating.project_id == project_id))
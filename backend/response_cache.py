@@ -0,0 +1,116 @@
+"""Conditional GETs and a gzip-compressed response cache for read endpoints.
+
+Responses are keyed on the path, query string and dataset version. The ETag is
+derived from that key alone, so a matching If-None-Match is answered with a 304
+before the view runs, and a repeated read is served from the cached body.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+import dataset_version
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+COMPRESS_LEVEL = 6
+# Response headers replayed from the cache besides Content-Type.
+KEPT_HEADERS = ('X-Aggregate-Source',)
+
+
+class ResponseCache:
+    """LRU of compressed bodies, bounded by their total size."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry['body'])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous['body'])
+            self._entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted['body'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+cache = ResponseCache()
+
+
+def request_key():
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def make_etag(version, key):
+    return f'{version}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}'
+
+
+def _cached_response(entry, etag, gzipped):
+    response = current_app.response_class(entry['body'] if gzipped else gzip.decompress(entry['body']),
+                                          mimetype=entry['mimetype'])
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers.update(entry['headers'])
+    return _revalidate(response, etag)
+
+
+def _revalidate(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def cached(bypass=None):
+    """Serve a read-only view through ETags and the response cache.
+
+    bypass(request) returning True skips both, e.g. for streamed exports.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RESPONSE_CACHE', True) or (bypass and bypass(request)):
+                return view(*args, **kwargs)
+            key = (dataset_version.current(), request_key())
+            # Strong ETags differ between the gzip and identity representations.
+            gzipped = 'gzip' in request.accept_encodings
+            etag = make_etag(*key) + ('-gzip' if gzipped else '')
+            if request.if_none_match.contains(etag):
+                return _revalidate(current_app.response_class(status=304), etag)
+
+            entry = cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = {
+                    'body': gzip.compress(response.get_data(), COMPRESS_LEVEL),
+                    'mimetype': response.mimetype,
+                    'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                }
+                cache.put(key, entry)
+            return _cached_response(entry, etag, gzipped)
+        return wrapper
+    return decorator
@@ -0,0 +1,133 @@
+"""Keeps project_year_total, the long (project_id, year, tonnes) copy of the yearly
+columns, and each project's precomputed trend in step with carbon_project."""
+import logging
+
+import numpy as np
+from sqlalchemy import delete, or_
+
+import rating_engine
+
+logger = logging.getLogger(__name__)
+
+REBUILD_CHUNK_SIZE = 10000
+
+
+def trend_stats(yearly, years=rating_engine.YEARS):
+    """Per-row trend over the reported (non-NaN) years of a (projects, years) matrix.
+
+    Returns a dict of arrays: first_year, last_year, years_reported, coverage (reported
+    years over the span they cover), latest_tonnes and slope, the least-squares change
+    in tonnes per year (NaN when fewer than two years are reported).
+    """
+    years = np.asarray(years, dtype=np.float64)
+    reported = ~np.isnan(yearly)
+    counts = reported.sum(axis=1)
+    first = reported.argmax(axis=1)
+    last = yearly.shape[1] - 1 - reported[:, ::-1].argmax(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_year = (reported * years).sum(axis=1) / counts
+        mean_tonnes = np.nansum(yearly, axis=1) / counts
+        dx = np.where(reported, years - mean_year[:, None], 0.0)
+        dy = np.where(reported, yearly - mean_tonnes[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        coverage = counts / (last - first + 1)
+    return {
+        'first_year': years[first].astype(np.int64),
+        'last_year': years[last].astype(np.int64),
+        'years_reported': counts,
+        'coverage': coverage,
+        'latest_tonnes': yearly[np.arange(len(yearly)), last],
+        'slope': np.where(counts > 1, slope, np.nan),
+    }
+
+
+def _series_rows(ids, yearly):
+    """Rows for project_year_total and project_trend from ids and their yearly matrix."""
+    project_rows, year_rows = np.nonzero(~np.isnan(yearly))
+    totals = [{'project_id': project_id, 'year': year, 'tonnes': tonnes} for project_id, year, tonnes in zip(
+        ids[project_rows].tolist(), np.asarray(rating_engine.YEARS)[year_rows].tolist(),
+        yearly[project_rows, year_rows].tolist())]
+
+    has_data = ~np.isnan(yearly).all(axis=1)
+    stats = {name: values[has_data].tolist() for name, values in trend_stats(yearly).items()}
+    # NaN slopes (a single reported year) are stored as NULL.
+    stats['slope'] = [None if np.isnan(slope) else slope for slope in stats['slope']]
+    trends = [{'project_id': project_id, **{name: values[i] for name, values in stats.items()}}
+              for i, project_id in enumerate(ids[has_data].tolist())]
+    return totals, trends
+
+
+def _write(ids, yearly):
+    from app import db, ProjectTrend, ProjectYearTotal
+    totals, trends = _series_rows(np.asarray(ids, dtype=np.int64), yearly)
+    # Core inserts go straight to executemany; the ORM bulk path costs several times more per row.
+    if totals:
+        db.session.execute(ProjectYearTotal.__table__.insert(), totals)
+    if trends:
+        db.session.execute(ProjectTrend.__table__.insert(), trends)
+
+
+def _yearly_query():
+    from app import db, CarbonProject
+    columns = [CarbonProject.id] + [getattr(CarbonProject, column) for column in rating_engine.YEAR_COLUMNS]
+    return db.session.query(*columns)
+
+
+def _yearly_chunks(chunk_size=REBUILD_CHUNK_SIZE):
+    from app import CarbonProject
+    last_id = 0
+    while True:
+        rows = (_yearly_query()
+                .filter(CarbonProject.id > last_id)
+                .order_by(CarbonProject.id)
+                .limit(chunk_size)
+                .all())
+        if not rows:
+            return
+        values = np.array(rows, dtype=np.float64)
+        last_id = int(values[-1, 0])
+        yield values[:, 0].astype(np.int64), values[:, 1:]
+
+
+def rebuild_series():
+    """Rewrite both tables from carbon_project's yearly columns, chunk by chunk in id order."""
+    from app import db, ProjectTrend, ProjectYearTotal
+    db.session.execute(delete(ProjectYearTotal))
+    db.session.execute(delete(ProjectTrend))
+    projects = 0
+    for ids, yearly in _yearly_chunks():
+        _write(ids, yearly)
+        projects += len(ids)
+    logger.debug("Rebuilt yearly series for %d projects.", projects)
+
+
+def ensure_series_current():
+    from app import db, CarbonProject, ProjectTrend
+    if db.session.query(ProjectTrend.project_id).first() is not None:
+        return
+    reported = or_(*(getattr(CarbonProject, column).isnot(None) for column in rating_engine.YEAR_COLUMNS))
+    if db.session.query(CarbonProject.id).filter(reported).first() is not None:
+        rebuild_series()
+        db.session.commit()
+
+
+def record_project_series(project):
+    remove_project_series([project.id])
+    yearly = np.array([[getattr(project, column) for column in rating_engine.YEAR_COLUMNS]], dtype=np.float64)
+    _write([project.id], yearly)
+
+
+def record_series(project_ids):
+    """record_project_series for many projects at once, from their stored yearly columns."""
+    from app import CarbonProject
+    remove_project_series(project_ids)
+    rows = _yearly_query().filter(CarbonProject.id.in_(project_ids)).all()
+    if rows:
+        values = np.array(rows, dtype=np.float64)
+        _write(values[:, 0].astype(np.int64), values[:, 1:])
+
+
+def remove_project_series(project_ids):
+    from app import db, ProjectTrend, ProjectYearTotal
+    db.session.execute(delete(ProjectYearTotal).where(ProjectYearTotal.project_id.in_(project_ids)))
+    db.session.execute(delete(ProjectTrend).where(ProjectTrend.project_id.in_(project_ids)))
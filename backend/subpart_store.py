@@ -0,0 +1,96 @@
+import logging
+
+from sqlalchemy import bindparam, delete, insert
+
+import dataset_version
+from load_data import industry_decoder, industry_types
+
+logger = logging.getLogger(__name__)
+
+
+def seed_industry_types():
+    """Replace the industry_type lookup table with the loaded subpart mapping, if it differs."""
+    from app import db, IndustryType
+    if dict(db.session.query(IndustryType.subpart_code, IndustryType.name).all()) == industry_types:
+        return
+    # Industry names appear in /projects and /co2_by_industry responses.
+    dataset_version.bump()
+    db.session.execute(delete(IndustryType))
+    if industry_types:
+        db.session.execute(insert(IndustryType), [
+            {'subpart_code': code, 'name': name} for code, name in industry_types.items()
+        ])
+
+
+def _subpart_pairs(project_id, industry_type):
+    return {(project_id, code) for code in industry_decoder.codes(industry_type or '')}
+
+
+def _apply(added, removed):
+    from app import db, ProjectSubpart, RemovedProjectSubpart
+    if removed:
+        rows = [{'project_id': project_id, 'subpart_code': code} for project_id, code in removed]
+        db.session.execute(insert(RemovedProjectSubpart), rows)
+        table = ProjectSubpart.__table__
+        db.session.execute(
+            table.delete().where(table.c.project_id == bindparam('p'), table.c.subpart_code == bindparam('c')),
+            [{'p': project_id, 'c': code} for project_id, code in removed])
+    if added:
+        db.session.execute(insert(ProjectSubpart), [
+            {'project_id': project_id, 'subpart_code': code} for project_id, code in added
+        ])
+
+
+def rebuild_project_subparts():
+    """Bring the whole bridge table in line with carbon_project, writing only the differences."""
+    from app import db, CarbonProject, ProjectSubpart
+    wanted = set()
+    for project_id, industry_type in db.session.query(CarbonProject.id, CarbonProject.industry_type):
+        wanted |= _subpart_pairs(project_id, industry_type)
+    existing = set(db.session.query(ProjectSubpart.project_id, ProjectSubpart.subpart_code).all())
+    if wanted != existing:
+        dataset_version.bump()
+    _apply(wanted - existing, existing - wanted)
+    logger.debug("Rebuilt project subparts: %d added, %d removed.", len(wanted - existing), len(existing - wanted))
+
+
+def ensure_subparts_current():
+    from app import db, CarbonProject, IndustryType, ProjectSubpart
+    changed = False
+    if industry_types and db.session.query(IndustryType.subpart_code).first() is None:
+        seed_industry_types()
+        changed = True
+    if (db.session.query(ProjectSubpart.project_id).first() is None and
+            db.session.query(CarbonProject.id).filter(CarbonProject.industry_type.isnot(None)).first() is not None):
+        rebuild_project_subparts()
+        changed = True
+    if changed:
+        db.session.commit()
+
+
+def record_project_subparts(project):
+    from app import db, ProjectSubpart
+    existing = set(db.session.query(ProjectSubpart.project_id, ProjectSubpart.subpart_code)
+                   .filter(ProjectSubpart.project_id == project.id).all())
+    wanted = _subpart_pairs(project.id, project.industry_type)
+    _apply(wanted - existing, existing - wanted)
+
+
+def record_subparts(project_ids):
+    """record_project_subparts for many projects at once, from their stored industry_type."""
+    from app import db, CarbonProject, ProjectSubpart
+    wanted = set()
+    for project_id, industry_type in (db.session.query(CarbonProject.id, CarbonProject.industry_type)
+                                      .filter(CarbonProject.id.in_(project_ids))):
+        wanted |= _subpart_pairs(project_id, industry_type)
+    existing = set(db.session.query(ProjectSubpart.project_id, ProjectSubpart.subpart_code)
+                   .filter(ProjectSubpart.project_id.in_(project_ids)).all())
+    _apply(wanted - existing, existing - wanted)
+
+
+def remove_project_subparts(project_ids):
+    """Drop the bridge rows of projects about to be deleted."""
+    from app import db, ProjectSubpart
+    existing = set(db.session.query(ProjectSubpart.project_id, ProjectSubpart.subpart_code)
+                   .filter(ProjectSubpart.project_id.in_(project_ids)).all())
+    _apply(set(), existing)
@@ -1,39 +1,224 @@
+import json
+import os
 import unittest
-from app import app, db, CarbonProject
-from sqlalchemy import text
 
-class BackendTest(unittest.TestCase):
-    def setUp(self):
-        # Set up test DB and app context
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['TESTING'] = True
-        self.app = app.test_client()
-        with app.app_context():
-            db.create_all()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import app, db, CarbonProject, ProjectRating, RemovedProjectSubpart
+from database_test_case import DatabaseTestCase
+from load_data import load_industry_types
+from pagination import encode_cursor, keyset_branches, keyset_order
+from sqlalchemy import select, text
+import rating_engine
 
+INDUSTRY_TYPES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'Industry Types.csv')
+
+class BackendTest(DatabaseTestCase):
     def tearDown(self):
-        # Teardown DB, handling dependent objects
         with app.app_context():
-            # Drop dependent views first
-            db.session.execute(text('DROP VIEW IF EXISTS dbt_carbon_project_rater.project_transformation CASCADE;'))
-            db.session.commit()
-
-            # Now attempt to drop all tables
-            db.drop_all()
+            # On Postgres the dbt views depend on the tables; SQLite has neither the schema nor CASCADE.
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(text('DROP VIEW IF EXISTS dbt_carbon_project_rater.project_transformation CASCADE;'))
+                db.session.commit()
+        super().tearDown()
 
-    def test_home(self):
-        response = self.app.get('/')
+    def test_health(self):
+        response = self.client.get('/health')
         self.assertEqual(response.status_code, 200)
-        self.assertIn("Hello, I'm a Carbon Project Rater!", response.get_data(as_text=True))
+        self.assertEqual(response.get_json(), {'status': 'healthy'})
 
     def test_create_project(self):
-        response = self.app.post('/projects', json={
-            'name': 'Test Project',
-            'description': 'A test project.',
-            'rating': 5
+        response = self.client.post('/projects', json={
+            'facility_name': 'Test Project',
+            'state': 'TX',
+            'total_mass_co2_sequestered': 5
         })
         self.assertEqual(response.status_code, 201)
         self.assertIn('Project created', response.get_data(as_text=True))
+        self.assertEqual(self.client.post('/projects', json={'name': 'Test Project'}).status_code, 400)
+
+class ProjectRatingsTest(DatabaseTestCase):
+    def make_projects(self):
+        return [
+            CarbonProject(facility_name='Alpha', state='TX', industry_type='C,PP,RR (RPT)', total_mass_co2_sequestered=5000.0, duration_years=1,
+                          total_mass_co2_sequestered_2016=4000.0, total_mass_co2_sequestered_2022=5000.0),
+            CarbonProject(facility_name='Beta', state='NM', industry_type='RR (RPT)', total_mass_co2_sequestered=12000.0, duration_years=2,
+                          total_mass_co2_sequestered_2021=9000.0, total_mass_co2_sequestered_2022=12000.0),
+            CarbonProject(facility_name='Gamma', state='TX', industry_type='C,W-PROC', total_mass_co2_sequestered=8000.0, duration_years=3),
+        ]
+
+    def setUp(self):
+        load_industry_types(INDUSTRY_TYPES_FILE)
+        super().setUp()
+
+    def test_get_projects_uses_batched_ratings(self):
+        response = self.client.get('/projects')
+        self.assertEqual(response.status_code, 200)
+        projects = response.get_json()['projects']
+        self.assertEqual([p['facility_name'] for p in projects], ['Beta', 'Gamma', 'Alpha'])
+        self.assertEqual([p['rating'] for p in projects], [10.0, 8.5, 1.0])
+
+    def test_calculate_raw_rating_matches_batch(self):
+        with app.app_context():
+            projects = CarbonProject.query.all()
+            raw, _ = rating_engine.compute_ratings(projects)
+            self.assertEqual([p.calculate_raw_rating(projects) for p in projects], raw.tolist())
+
+    def test_keyset_pagination_walks_every_project(self):
+        for sort, expected in [('-rating', ['Beta', 'Gamma', 'Alpha']),
+                               ('facility_name', ['Alpha', 'Beta', 'Gamma']),
+                               ('-total_co2', ['Beta', 'Gamma', 'Alpha'])]:
+            names, cursor = [], None
+            while True:
+                query = {'limit': 2, 'sort': sort}
+                if cursor:
+                    query['after'] = cursor
+                body = self.client.get('/projects', query_string=query).get_json()
+                names.extend(p['facility_name'] for p in body['projects'])
+                cursor = body['next_cursor']
+                if cursor is None:
+                    break
+            self.assertEqual(names, expected)
+
+    def test_keyset_pagination_pages_null_sort_values_last(self):
+        self.client.post('/projects', json={'facility_name': 'Delta'})
+        self.client.post('/projects', json={'facility_name': 'Epsilon'})
+        for sort, expected in [('-total_co2', ['Beta', 'Gamma', 'Alpha', 'Epsilon', 'Delta']),
+                               ('total_co2', ['Alpha', 'Gamma', 'Beta', 'Delta', 'Epsilon'])]:
+            names, cursor = [], None
+            while True:
+                body = self.client.get('/projects', query_string={'limit': 2, 'sort': sort, 'after': cursor or ''}).get_json()
+                names.extend(p['facility_name'] for p in body['projects'])
+                cursor = body['next_cursor']
+                if cursor is None:
+                    break
+            self.assertEqual(names, expected)
+            export = self.client.get('/projects', query_string={'export': 'ndjson', 'sort': sort}).get_data(as_text=True)
+            self.assertEqual([json.loads(line)['facility_name'] for line in export.splitlines()], expected)
+
+    def test_keyset_pages_are_index_ranges(self):
+        column, id_column = CarbonProject.total_mass_co2_sequestered, CarbonProject.id
+        with app.app_context():
+            for descending in (True, False):
+                for clause in keyset_branches(column, id_column, descending, 8000.0, 3) + \
+                        keyset_branches(column, id_column, descending, None, 3):
+                    statement = (select(CarbonProject.id).where(clause)
+                                 .order_by(*keyset_order(column, id_column, descending)).limit(2))
+                    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+                    plan = ' '.join(row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+                    self.assertIn('USING COVERING INDEX ix_carbon_project_total_mass_co2_sequestered_id (', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_projects_filters(self):
+        def names(**query):
+            return [p['facility_name'] for p in self.client.get('/projects', query_string=query).get_json()['projects']]
+        self.assertEqual(names(state='TX'), ['Gamma', 'Alpha'])
+        self.assertEqual(names(industry='C'), ['Gamma', 'Alpha'])
+        self.assertEqual(names(industry='RR'), ['Beta', 'Alpha'])
+        self.assertEqual(names(industry='W'), [])
+        self.assertEqual(names(min_rating=5), ['Beta', 'Gamma'])
+        self.assertEqual(names(state='TX', max_rating=5), ['Alpha'])
+
+    def test_projects_streaming_export(self):
+        response = self.client.get('/projects', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)['facility_name'] for line in lines], ['Beta', 'Gamma', 'Alpha'])
+
+        response = self.client.get('/projects', query_string={'export': 'json', 'state': 'TX', 'limit': 1})
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual([p['facility_name'] for p in json.loads(response.get_data())['projects']], ['Gamma', 'Alpha'])
+
+    def test_projects_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/projects?after=not-a-cursor').status_code, 400)
+        self.assertEqual(self.client.get('/projects?sort=city').status_code, 400)
+        self.assertEqual(self.client.get('/projects?limit=ten').status_code, 400)
+        self.assertEqual(self.client.get('/projects?export=xml').status_code, 400)
+
+    def test_projects_rejects_cursors_of_another_sort_or_type(self):
+        cursor = self.client.get('/projects?sort=facility_name&limit=1').get_json()['next_cursor']
+        self.assertEqual(self.client.get('/projects', query_string={'sort': 'facility_name', 'after': cursor}).status_code, 200)
+        for sort in ('-facility_name', 'total_co2', '-rating'):
+            response = self.client.get('/projects', query_string={'sort': sort, 'after': cursor})
+            self.assertEqual(response.status_code, 400, sort)
+        for sort_value in ({'x': 1}, [1], 'high', True, None):
+            response = self.client.get('/projects', query_string={'sort': '-rating',
+                                                                  'after': encode_cursor('-rating', sort_value, 1)})
+            self.assertEqual(response.status_code, 400, sort_value)
+        response = self.client.get('/projects', query_string={'sort': '-total_co2',
+                                                              'after': encode_cursor('-total_co2', None, 1)})
+        self.assertEqual(response.status_code, 200)
+
+    def test_co2_by_industry_groups_in_sql(self):
+        def totals(**query):
+            body = self.client.get('/co2_by_industry', query_string=query).get_json()
+            return {row['industry_type']: row['total_co2'] for row in body['co2_by_industry']}
+        self.assertEqual(totals(), {
+            'Geologic Sequestration of Carbon Dioxide': 17000,
+            'Stationary Combustion': 13000,
+            'Petroleum and Natural Gas Systems – Natural Gas Processing': 8000,
+            'Carbon Dioxide (CO2) Supply': 5000,
+        })
+        self.assertEqual(totals(state='NM'), {'Geologic Sequestration of Carbon Dioxide': 12000})
+        self.assertEqual(totals(year=2022), {
+            'Geologic Sequestration of Carbon Dioxide': 17000,
+            'Stationary Combustion': 5000,
+            'Carbon Dioxide (CO2) Supply': 5000,
+        })
+        self.assertEqual(self.client.get('/co2_by_industry?year=1999').status_code, 400)
+
+    def test_co2_by_industry_reports_aggregate_staleness(self):
+        response = self.client.get('/co2_by_industry')
+        self.assertEqual(response.headers['X-Aggregate-Source'], 'live')
+        freshness = self.client.get('/co2_by_industry/freshness').get_json()
+        self.assertTrue(freshness['stale'])
+        self.assertIsNone(freshness['refreshed_through'])
+        self.assertIsNotNone(freshness['source_updated_at'])
+
+    def test_subpart_removals_are_logged_for_incremental_refresh(self):
+        self.client.get('/projects')
+        self.client.put('/projects/1', json={'industry_type': 'C'})
+        self.client.delete('/projects/3')
+        with app.app_context():
+            removed = sorted((r.project_id, r.subpart_code) for r in RemovedProjectSubpart.query.all())
+        self.assertEqual(removed, [(1, 'PP'), (1, 'RR'), (3, 'C'), (3, 'W-PROC')])
+
+    def test_write_paths_keep_subparts_current(self):
+        def names(industry):
+            body = self.client.get('/projects', query_string={'industry': industry}).get_json()
+            return [p['facility_name'] for p in body['projects']]
+        self.assertEqual(names('PP'), ['Alpha'])
+        self.client.put('/projects/2', json={'industry_type': 'PP,XYZ (note)'})
+        self.client.post('/projects', json={'facility_name': 'Delta', 'industry_type': 'PP', 'total_mass_co2_sequestered': 6000})
+        self.client.delete('/projects/1')
+        self.assertEqual(names('PP'), ['Beta', 'Delta'])
+        self.assertEqual(names('XYZ'), ['Beta'])
+        self.assertEqual(names('RR'), [])
+
+    def assert_stored_ratings_current(self):
+        with app.app_context():
+            projects = CarbonProject.query.order_by(CarbonProject.id).all()
+            raw, normalized = rating_engine.compute_ratings(projects)
+            stored = {r.project_id: r for r in ProjectRating.query.all()}
+            self.assertEqual(sorted(stored), [p.id for p in projects])
+            self.assertEqual([stored[p.id].raw_rating for p in projects], raw.tolist())
+            self.assertEqual([stored[p.id].rating for p in projects], normalized.tolist())
+
+    def test_write_paths_keep_stored_ratings_current(self):
+        self.client.get('/projects')
+        self.assert_stored_ratings_current()
+        # Inside the current bounds: only the new row is scored.
+        response = self.client.post('/projects', json={'facility_name': 'Delta', 'total_mass_co2_sequestered': 6000})
+        self.assertEqual(response.status_code, 201)
+        self.assert_stored_ratings_current()
+        # Moves the max CO2 bound: everything is rescored.
+        self.client.put('/projects/1', json={'total_mass_co2_sequestered': 50000.0})
+        self.assert_stored_ratings_current()
+        self.client.delete('/projects/4')
+        self.assert_stored_ratings_current()
+        self.client.delete('/projects/1')
+        self.assert_stored_ratings_current()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import import_report
+from ml_models import backends
+from ml_models.registry import registry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       241 |        241 |       _json
+import time:       634 |        875 |     json.scanner
+import time:       878 |       1752 |   json.decoder
+import time:       733 |        733 |   json.encoder
+import time:       371 |       2854 | json
+import time:       100 |        100 |   pagination
+import time:       500 |       3454 | app
+"""
+
+
+class ModelBackendsTest(unittest.TestCase):
+    def tearDown(self):
+        backends.configure(list(backends.BACKENDS))
+
+    def test_app_import_does_not_load_ml_frameworks(self):
+        frameworks = ('tensorflow', 'torch', 'sklearn')
+        code = 'import sys, app; print(",".join(m for m in %r if m in sys.modules))' % (frameworks,)
+        result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_check_options_accepts_only_what_a_trainer_takes(self):
+        sklearn = backends.BACKENDS['sklearn']
+        sklearn.check_options({})
+        sklearn.check_options({'search': True, 'folds': 3, 'n_jobs': -1, 'space': {'max_depth': [None, 8]}})
+        for options, message in [({'serach': True}, 'does not accept options: serach'),
+                                 ({'search': 'yes'}, 'search must be true or false'),
+                                 ({'search': True, 'folds': 1}, 'folds must be an integer of at least 2'),
+                                 ({'search': True, 'candidates': 2.5}, 'candidates must be an integer'),
+                                 ({'search': True, 'space': {'max_depth': []}}, 'max_depth must be a non-empty list'),
+                                 ({'grid': True}, 'grid only applies with search')]:
+            with self.assertRaisesRegex(ValueError, message):
+                sklearn.check_options(options)
+        with self.assertRaisesRegex(ValueError, 'pytorch does not accept options: epochs'):
+            backends.BACKENDS['pytorch'].check_options({'epochs': 3})
+
+    def test_configure_limits_served_models(self):
+        backends.configure(['sklearn'])
+        self.assertEqual(list(backends.enabled_backends()), ['sklearn'])
+        self.assertEqual(list(registry.versions()), ['sklearn'])
+        with self.assertRaisesRegex(ValueError, 'keras'):
+            backends.configure(['sklearn', 'keras'])
+
+
+class ImportReportTest(unittest.TestCase):
+    def test_reports_direct_imports_heaviest_first(self):
+        costs = import_report.parse_importtime(IMPORTTIME_OUTPUT)
+        self.assertEqual(costs[0], import_report.ImportCost('_json', 241, 241, 3))
+        total, direct = import_report.direct_imports(costs, 'json')
+        self.assertEqual(total.cumulative_us, 2854)
+        self.assertEqual([cost.module for cost in direct], ['json.decoder', 'json.encoder'])
+        self.assertEqual(import_report.format_report(costs, 'json', limit=1).splitlines(),
+                         ['Importing json took 0.003s (7 modules)', '     0.002s  json.decoder'])
+
+
+if __name__ == '__main__':
+    unittest.main()
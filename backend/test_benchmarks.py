@@ -0,0 +1,64 @@
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import app, db
+from benchmarks.suite import compare_results, run_suite, summarize
+from benchmarks.synthetic import generate_rows
+from load_data import industry_decoder, industry_types, load_industry_types, parse_row
+
+INDUSTRY_TYPES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'Industry Types.csv')
+
+
+class SyntheticDataTest(unittest.TestCase):
+    def test_rows_are_reproducible_and_loadable(self):
+        rows = list(generate_rows(500, seed=3))
+        self.assertEqual(rows, list(generate_rows(500, seed=3)))
+        self.assertNotEqual(rows, list(generate_rows(500, seed=4)))
+
+        load_industry_types(INDUSTRY_TYPES_FILE)
+        parsed = [parse_row(row) for row in rows]
+        self.assertEqual(len({p['facility_name'] for p in parsed}), 500)
+        self.assertTrue(all(25 <= p['latitude'] <= 49 and -124 <= p['longitude'] <= -67 for p in parsed))
+        self.assertTrue(all(p['total_mass_co2_sequestered'] == p['total_mass_co2_sequestered_2022'] for p in parsed))
+        # Some series start late and some have holes before 2022.
+        self.assertTrue(any(p['total_mass_co2_sequestered_2016'] is None for p in parsed))
+        self.assertTrue(any(p['total_mass_co2_sequestered_2016'] is not None and
+                            p['total_mass_co2_sequestered_2019'] is None for p in parsed))
+        codes = {code for p in parsed for code in industry_decoder.codes(p['industry_type'])}
+        self.assertIn('RR', codes)
+        self.assertTrue(codes <= set(industry_types))
+
+
+class BenchmarkSuiteTest(unittest.TestCase):
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_summarize_reports_percentiles_and_throughput(self):
+        result = summarize('x', 10, [0.001] * 98 + [0.1, 0.2], items=5)
+        self.assertEqual(result['p50_ms'], 1.0)
+        self.assertGreater(result['p99_ms'], 99)
+        self.assertEqual(result['max_ms'], 200.0)
+        self.assertAlmostEqual(result['throughput_per_second'], 100 * 5 / 0.398, places=2)
+
+    def test_compare_flags_slowdowns_beyond_threshold(self):
+        baseline = {'results': [summarize('a', 10, [0.010]), summarize('b', 10, [0.010])]}
+        current = {'results': [summarize('a', 10, [0.011]), summarize('b', 10, [0.020]), summarize('c', 10, [1])]}
+        self.assertEqual([(r['benchmark'], r['change']) for r in compare_results(baseline, current, 0.2)],
+                         [('b', 1.0)])
+
+    def test_small_run_covers_every_benchmark(self):
+        report = run_suite(sizes=[60], requests=2)
+        self.assertEqual(report['database'], 'sqlite')
+        names = [r['benchmark'] for r in report['results']]
+        for name in ('load_data', 'bulk_load_data', 'calculate_raw_rating', 'GET /projects',
+                     'GET /co2_by_industry', 'GET /projects (cached)'):
+            self.assertIn(name, names)
+        self.assertTrue(all(r['rows'] == 60 and r['p50_ms'] >= 0 for r in report['results']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+from database_test_case import DatabaseTestCase
+from app import app, db, CarbonProject, ProjectRating, ProjectSubpart, ProjectYearTotal
+
+
+class BulkProjectsTest(DatabaseTestCase):
+    def make_projects(self):
+        return [CarbonProject(facility_name=f'Facility {i}', state='TX', industry_type='C',
+                              total_mass_co2_sequestered=100.0 * (i + 1)) for i in range(3)]
+
+    def post(self, payload):
+        return self.client.post('/projects/bulk', json=payload)
+
+    def test_applies_creates_updates_and_deletes(self):
+        response = self.post({
+            'create': [{'facility_name': 'New A', 'industry_type': 'RR', 'total_mass_co2_sequestered': '50',
+                        'total_mass_co2_sequestered_2022': 50},
+                       {'facility_name': 'New B'}],
+            'update': [{'id': self.ids[0], 'state': 'NM', 'industry_type': 'PP'}],
+            'delete': [self.ids[2]],
+        })
+        self.assertEqual(response.status_code, 200, response.get_json())
+        body = response.get_json()
+        self.assertEqual([item['index'] for item in body['created']], [0, 1])
+        self.assertEqual(body['updated'], [{'index': 0, 'id': self.ids[0]}])
+        self.assertEqual(body['deleted'], [{'index': 0, 'id': self.ids[2]}])
+
+        with app.app_context():
+            created = db.session.get(CarbonProject, body['created'][0]['id'])
+            self.assertEqual(created.facility_name, 'New A')
+            self.assertEqual(created.total_mass_co2_sequestered, 50.0)
+            self.assertEqual(db.session.get(CarbonProject, self.ids[0]).state, 'NM')
+            self.assertIsNone(CarbonProject.query.filter_by(facility_name='Facility 2').first())
+            # Derived tables follow every write.
+            self.assertEqual(ProjectRating.query.count(), 4)
+            self.assertEqual({code for code, in db.session.query(ProjectSubpart.subpart_code)
+                              .filter(ProjectSubpart.project_id.in_([created.id, self.ids[0]]))}, {'RR', 'PP'})
+            self.assertEqual(ProjectYearTotal.query.filter_by(project_id=created.id).count(), 1)
+
+    def test_duration_and_total_are_derived_from_the_yearly_columns(self):
+        years = {f'total_mass_co2_sequestered_{year}': 10.0 for year in range(2016, 2022)}
+        response = self.post({
+            'create': [{'facility_name': 'Six years', **years},
+                       {'facility_name': 'Latest only', 'total_mass_co2_sequestered_2022': 70.0},
+                       {'facility_name': 'No years'}],
+            'update': [{'id': self.ids[0], 'total_mass_co2_sequestered_2016': 5.0,
+                        'total_mass_co2_sequestered_2022': 30.0},
+                       {'id': self.ids[1], 'city': 'Austin'}],
+        })
+        self.assertEqual(response.status_code, 200, response.get_json())
+        created = [item['id'] for item in response.get_json()['created']]
+
+        with app.app_context():
+            self.client.post('/projects/bulk', json={'update': [{'id': self.ids[0],
+                                                                 'total_mass_co2_sequestered_2016': None}]})
+            projects = {p.id: p for p in CarbonProject.query}
+            self.assertEqual([projects[i].duration_years for i in created], [5, 1, 0])
+            self.assertEqual([projects[i].total_mass_co2_sequestered for i in created], [None, 70.0, None])
+            # The second update cleared 2016 again, leaving 2022.
+            self.assertEqual(projects[self.ids[0]].duration_years, 1)
+            self.assertEqual(projects[self.ids[0]].total_mass_co2_sequestered, 30.0)
+            self.assertIsNone(projects[self.ids[1]].duration_years)
+            self.assertEqual(projects[self.ids[1]].total_mass_co2_sequestered, 200.0)
+
+    def test_invalid_items_reject_the_whole_batch(self):
+        response = self.post({
+            'create': [{'facility_name': 'Fresh'}, {'facility_name': 'Facility 1'}, {'facility_name': 'x', 'bogus': 1}],
+            'update': [{'id': 9999, 'city': 'Austin'}, {'id': self.ids[0], 'latitude': 'north'}],
+            'delete': [self.ids[1], 'one'],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e['op'], e['index']) for e in response.get_json()['errors']],
+                         [('create', 2), ('update', 0), ('update', 1), ('delete', 1)])
+        with app.app_context():
+            self.assertEqual(CarbonProject.query.count(), 3)
+            self.assertIsNone(CarbonProject.query.filter_by(facility_name='Fresh').first())
+
+    def test_non_finite_and_overflowing_numbers_are_item_errors(self):
+        body = ('{"update": [{"id": %d, "latitude": 1%s}, {"id": %d, "longitude": 1e400}, '
+                '{"id": %d, "total_mass_co2_sequestered": "nan"}]}' % (self.ids[0], '0' * 400, self.ids[1], self.ids[2]))
+        response = self.client.post('/projects/bulk', data=body, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.get_json()['errors']], [0, 1, 2])
+
+    def test_name_conflicts(self):
+        errors = self.post({'create': [{'facility_name': 'Facility 0'}, {'facility_name': 'Twin'},
+                                       {'facility_name': 'Twin'}]}).get_json()['errors']
+        self.assertEqual([(e['index'], e['error']) for e in errors],
+                         [(0, 'Project already exists'), (1, 'Project already exists'), (2, 'Project already exists')])
+
+        # A name is free once its project is deleted in the same batch.
+        response = self.post({'create': [{'facility_name': 'Facility 0'}], 'delete': [self.ids[0]]})
+        self.assertEqual(response.status_code, 200, response.get_json())
+
+    def test_a_project_appears_once_per_batch(self):
+        response = self.post({'update': [{'id': self.ids[0], 'city': 'A'}], 'delete': [self.ids[0]]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.get_json()['errors']), 2)
+
+    def test_malformed_requests(self):
+        for payload in ([], {'upsert': []}, {'create': {}}):
+            self.assertEqual(self.post(payload).status_code, 400, payload)
+
+    def test_large_batch(self):
+        response = self.post({'create': [{'facility_name': f'Bulk {i}', 'total_mass_co2_sequestered': i}
+                                         for i in range(6000)]})
+        self.assertEqual(response.status_code, 200)
+        created = [item['id'] for item in response.get_json()['created']]
+        with app.app_context():
+            names = dict(db.session.query(CarbonProject.id, CarbonProject.facility_name)
+                         .filter(CarbonProject.id.in_(created[:10])))
+            self.assertEqual([names[project_id] for project_id in created[:10]], [f'Bulk {i}' for i in range(10)])
+            self.assertEqual(ProjectRating.query.count(), 6003)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+
+import geo
+from app import CarbonProject
+from database_test_case import DatabaseTestCase
+
+# (name, latitude, longitude)
+PLACES = [
+    ('Houston', 29.7604, -95.3698),
+    ('Galveston', 29.3013, -94.7977),
+    ('Austin', 30.2672, -97.7431),
+    ('Dallas', 32.7767, -96.7970),
+    ('Denver', 39.7392, -104.9903),
+    ('Fiji East', -17.0, 179.9),
+    ('Fiji West', -17.0, -179.9),
+]
+
+
+class GeoTest(unittest.TestCase):
+    def test_haversine_matches_known_distances(self):
+        distances = geo.haversine_km(29.7604, -95.3698, [29.7604, 32.7767], [-95.3698, -96.7970])
+        np.testing.assert_allclose(distances, [0.0, 362.0], atol=2.0)
+
+    def test_bounding_box_contains_the_circle(self):
+        rng = np.random.default_rng(0)
+        for lat, lon, radius in [(29.76, -95.37, 100), (70.0, 10.0, 800), (-17.0, 179.9, 50)]:
+            lats, lons = rng.uniform(-90, 90, 20000), rng.uniform(-180, 180, 20000)
+            inside = geo.haversine_km(lat, lon, lats, lons) <= radius
+            min_lat, max_lat, lon_ranges = geo.bounding_box(lat, lon, radius)
+            in_box = (lats >= min_lat) & (lats <= max_lat) & np.any(
+                [(lons >= lo) & (lons <= hi) for lo, hi in lon_ranges], axis=0)
+            self.assertTrue(np.all(in_box[inside]))
+
+    def test_bounding_box_around_a_pole_spans_all_longitudes(self):
+        self.assertEqual(geo.bounding_box(89.5, 0.0, 200)[2], [(-180.0, 180.0)])
+
+    def test_parse_bbox(self):
+        self.assertEqual(geo.parse_bbox('-100,25,-90,35'), (25.0, 35.0, [(-100.0, -90.0)]))
+        self.assertEqual(geo.parse_bbox('170,-20,-170,-10')[2], [(170.0, 180.0), (-180.0, -170.0)])
+        for value in ('1,2,3', 'a,b,c,d', '-100,35,-90,25', '-200,25,-90,35'):
+            with self.assertRaises(ValueError):
+                geo.parse_bbox(value)
+
+    def test_nearest_orders_and_limits(self):
+        distances = np.array([5.0, 1.0, 9.0, 3.0])
+        self.assertEqual(geo.nearest(distances, k=2).tolist(), [1, 3])
+        self.assertEqual(geo.nearest(distances, radius_km=6).tolist(), [1, 3, 0])
+
+
+class NearbyProjectsTest(DatabaseTestCase):
+    def make_projects(self):
+        return [CarbonProject(facility_name=name, latitude=lat, longitude=lon,
+                              state='TX' if i < 4 else 'XX', total_mass_co2_sequestered=100.0 + i)
+                for i, (name, lat, lon) in enumerate(PLACES)] + \
+            [CarbonProject(facility_name='Nowhere', total_mass_co2_sequestered=1.0)]
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return [p['facility_name'] for p in response.get_json()['projects']]
+
+    def test_radius_query_returns_projects_nearest_first(self):
+        response = self.client.get('/projects/near?lat=29.76&lon=-95.37&radius_km=300')
+        projects = response.get_json()['projects']
+        self.assertEqual([p['facility_name'] for p in projects], ['Houston', 'Galveston', 'Austin'])
+        self.assertLess(projects[0]['distance_km'], 1)
+        self.assertIn('rating', projects[0])
+
+    def test_k_nearest_widens_until_it_has_k_projects(self):
+        self.assertEqual(self.names('/projects/near?lat=29.76&lon=-95.37&k=4'),
+                         ['Houston', 'Galveston', 'Austin', 'Dallas'])
+        # Every project with coordinates, however far away.
+        self.assertEqual(len(self.names('/projects/near?lat=29.76&lon=-95.37&k=100')), len(PLACES))
+
+    def test_k_limits_radius_results_and_filters_apply(self):
+        self.assertEqual(self.names('/projects/near?lat=29.76&lon=-95.37&radius_km=300&k=1'), ['Houston'])
+        self.assertEqual(self.names('/projects/near?lat=29.76&lon=-95.37&k=2&state=XX'), ['Denver', 'Fiji West'])
+
+    def test_radius_across_the_antimeridian(self):
+        self.assertEqual(self.names('/projects/near?lat=-17&lon=179.95&radius_km=50'), ['Fiji East', 'Fiji West'])
+
+    def test_bbox_filters_project_listing(self):
+        self.assertEqual(sorted(self.names('/projects?bbox=-98,29,-94,31')), ['Austin', 'Galveston', 'Houston'])
+        self.assertEqual(sorted(self.names('/projects?bbox=179,-18,-179,-16')), ['Fiji East', 'Fiji West'])
+
+    def test_invalid_parameters(self):
+        for url in ('/projects/near?lat=29', '/projects/near?lat=a&lon=1', '/projects/near?lat=95&lon=1',
+                    '/projects/near?lat=29&lon=-95&radius_km=-1', '/projects?bbox=1,2,3'):
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+    def test_non_finite_parameters(self):
+        for query in ('lat=nan&lon=-95', 'lat=29&lon=inf', 'lat=29&lon=-95&radius_km=nan',
+                      'lat=29&lon=-95&radius_km=inf', 'lat=29&lon=-95&radius_km=-inf'):
+            self.assertEqual(self.client.get('/projects/near?' + query).status_code, 400, query)
+        self.assertEqual(self.client.get('/projects?bbox=nan,20,-90,30').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import unittest
+
+from industry_decoder import IndustryDecoder
+from load_data import industry_decoder, industry_types, load_industry_types
+
+INDUSTRY_TYPES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'Industry Types.csv')
+
+
+class IndustryDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.industry_types = {'C': 'Stationary Combustion', 'PP': 'Carbon Dioxide (CO2) Supply',
+                               'RR': 'Geologic Sequestration of Carbon Dioxide'}
+        self.decoder = IndustryDecoder(self.industry_types, maxsize=4)
+
+    def test_decodes_codes_and_names(self):
+        self.assertEqual(self.decoder.codes('C, PP,RR (RPT),W-PROC'), ('C', 'PP', 'RR', 'W-PROC'))
+        self.assertEqual(self.decoder.names('C,RR (RPT),W-PROC'),
+                         ('Stationary Combustion', 'Geologic Sequestration of Carbon Dioxide', 'W-PROC'))
+        self.assertEqual(self.decoder.names('Renewable Energy'), ('Renewable Energy',))
+
+    def test_dashes_and_spacing_are_normalized(self):
+        self.industry_types['MM-REF'] = 'Suppliers of Petroleum Products – Refineries'
+        self.assertEqual(self.decoder.codes('MM – REF,W — PROC,W\u2212LDC, Renewable \t Energy'),
+                         ('MM-REF', 'W-PROC', 'W-LDC', 'Renewable Energy'))
+        self.assertEqual(self.decoder.names('MM – REF'), ('Suppliers of Petroleum Products – Refineries',))
+
+    def test_dashed_subparts_match_the_industry_types_file(self):
+        load_industry_types(INDUSTRY_TYPES_FILE)
+        self.assertEqual(industry_decoder.names('MM – REF,MM-IMP,W-PROC'),
+                         ('Petroleum Refinery (Producer)', 'Petroleum Product Importer',
+                          'Petroleum and Natural Gas Systems – Natural Gas Processing'))
+
+    def test_reload_replaces_the_mapping_and_its_cached_results(self):
+        load_industry_types(INDUSTRY_TYPES_FILE)
+        industry_types['OLD'] = 'Retired Subpart'
+        self.assertEqual(industry_decoder.names('OLD'), ('Retired Subpart',))
+        load_industry_types(INDUSTRY_TYPES_FILE)
+        self.assertNotIn('OLD', industry_types)
+        self.assertEqual(industry_decoder.names('OLD'), ('OLD',))
+        self.assertEqual(industry_decoder.names('C'), ('Stationary Combustion',))
+
+    def test_format_expands_and_truncates(self):
+        self.assertEqual(self.decoder.format('PP,RR (RPT)'),
+                         'Carbon Dioxide (CO2) Supply,\n'
+                         'Geologic Sequestration of Carb...,\n'
+                         'CO2 Injection')
+
+    def test_results_are_cached_until_invalidated(self):
+        self.decoder.names('C')
+        self.decoder.names('C')
+        self.assertEqual(self.decoder._cached_names.cache_info().hits, 1)
+        self.industry_types['C'] = 'Combustion'
+        self.assertEqual(self.decoder.names('C'), ('Stationary Combustion',))
+        self.decoder.invalidate()
+        self.assertEqual(self.decoder.names('C'), ('Combustion',))
+
+    def test_decodes_that_finish_after_invalidate_are_not_served(self):
+        generation = self.decoder.generation
+        self.industry_types['C'] = 'Combustion'
+        self.decoder.invalidate()
+        # A decode that started before the reload stores its result late.
+        self.decoder._cached_names(generation, 'C')
+        self.assertEqual(self.decoder.names('C'), ('Combustion',))
+
+
+if __name__ == '__main__':
+    unittest.main()
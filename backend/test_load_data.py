@@ -0,0 +1,119 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import derived_tables
+from app import app, db, CarbonProject, ProjectRating, ProjectSubpart, ProjectYearTotal
+from load_data import industry_decoder, _copy_buffer, bulk_load_data, load_data, sync_data
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'CO2 Sequestered 2016-2022.csv')
+PROJECT_COLUMNS = [column.name for column in CarbonProject.__table__.columns if column.name not in ('id', 'updated_at')]
+
+
+class BulkLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        with open(DATA_FILE, newline='', encoding='utf-8-sig') as csvfile:
+            reader = csv.DictReader(csvfile)
+            self.fieldnames = reader.fieldnames
+            self.rows = list(reader)
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def write_csv(self, rows):
+        path = os.path.join(self.tmpdir, 'projects.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def snapshot(self):
+        with app.app_context():
+            return {p.facility_name: tuple(getattr(p, column) or None for column in PROJECT_COLUMNS)
+                    for p in CarbonProject.query.all()}
+
+    def test_bulk_load_matches_row_by_row_loader(self):
+        path = self.write_csv(self.rows + [dict(self.rows[0], City='Duplicate')])
+        with app.app_context():
+            load_data(path)
+        expected = self.snapshot()
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            stats = bulk_load_data(path, chunk_size=5)
+            self.assertEqual(ProjectRating.query.count(), len(self.rows))
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual((stats['rows'], stats['inserted'], stats['updated'], stats['skipped']),
+                         (len(self.rows) + 1, len(self.rows), 0, 1))
+
+    def test_reloading_an_unchanged_file_leaves_derived_tables_alone(self):
+        path = self.write_csv(self.rows)
+        with app.app_context():
+            load_data(path)
+            with mock.patch.object(derived_tables, 'rebuild_all') as rebuild_all:
+                load_data(path)
+            rebuild_all.assert_not_called()
+            self.assertEqual(CarbonProject.query.count(), len(self.rows))
+
+    def test_copy_keeps_empty_strings_apart_from_nulls(self):
+        buffer = _copy_buffer(['city', 'county', 'address', 'latitude'],
+                              [{'city': '', 'county': None, 'address': '\\N "Unit" 1', 'latitude': 1.5}])
+        self.assertEqual(buffer.getvalue(), '"",,"\\N ""Unit"" 1","1.5"\n')
+
+    def test_bulk_upsert_reports_updates(self):
+        with app.app_context():
+            bulk_load_data(self.write_csv(self.rows))
+        changed = [dict(self.rows[0], City='Elsewhere'), self.rows[1], dict(self.rows[2], **{'Facility Name': 'New Unit'})]
+        path = self.write_csv(changed)
+        with app.app_context():
+            stats = bulk_load_data(path)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['skipped']), (1, 0, 2))
+            stats = bulk_load_data(path, update_existing=True)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['skipped']), (0, 1, 2))
+            self.assertEqual(CarbonProject.query.filter_by(facility_name=self.rows[0]['Facility Name']).one().city,
+                             'Elsewhere')
+
+    def test_sync_applies_only_changed_rows(self):
+        with app.app_context():
+            bulk_load_data(self.write_csv(self.rows))
+            db.session.add(CarbonProject(facility_name='API Project', total_mass_co2_sequestered=10.0))
+            db.session.commit()
+        corrected = dict(self.rows[0], **{'2021 Total Mass CO2 Sequestered': '2700000.0'})
+        added = dict(self.rows[1], **{'Facility Name': 'New Unit'})
+        path = self.write_csv([corrected] + self.rows[2:] + [added])
+        with app.app_context():
+            # Derived rows are written for the changed projects only, not rebuilt for all.
+            with mock.patch.object(derived_tables, 'rebuild_all') as rebuild_all:
+                stats = sync_data(path)
+            rebuild_all.assert_not_called()
+            self.assertEqual((stats['inserted'], stats['updated'], stats['deleted'], stats['unchanged']),
+                             (1, 1, 1, len(self.rows) - 2))
+            names = {p.facility_name for p in CarbonProject.query.all()}
+            self.assertIn('API Project', names)
+            self.assertNotIn(self.rows[1]['Facility Name'], names)
+            project = CarbonProject.query.filter_by(facility_name=self.rows[0]['Facility Name']).one()
+            self.assertEqual(project.total_mass_co2_sequestered_2021, 2700000.0)
+            self.assertEqual(ProjectRating.query.count(), len(names))
+            self.assertEqual(ProjectSubpart.query.filter_by(
+                project_id=CarbonProject.query.filter_by(facility_name='New Unit').one().id).count(),
+                len(industry_decoder.codes(added['Industry Type (subparts)'])))
+            self.assertEqual({row.project_id for row in ProjectYearTotal.query.filter_by(year=2021, tonnes=2700000.0)},
+                             {project.id})
+            stats = sync_data(path)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['deleted']), (0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
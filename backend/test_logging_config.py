@@ -0,0 +1,84 @@
+import logging
+import queue
+import time
+import unittest
+
+import logging_config
+from logging_config import LocalQueueHandler, RateLimitFilter, parse_levels
+
+
+def make_record(msg, *args, level=logging.WARNING, name='test'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+class ParseLevelsTest(unittest.TestCase):
+    def test_parses_logger_levels(self):
+        self.assertEqual(parse_levels(' ml_models=debug, werkzeug=WARNING ,'),
+                         {'ml_models': 'DEBUG', 'werkzeug': 'WARNING'})
+        self.assertEqual(parse_levels(''), {})
+
+    def test_rejects_malformed_settings(self):
+        for spec in ('ml_models', 'ml_models=LOUD', '=DEBUG'):
+            with self.assertRaises(ValueError):
+                parse_levels(spec)
+
+
+class RateLimitFilterTest(unittest.TestCase):
+    def test_drops_repeats_within_the_interval(self):
+        limiter = RateLimitFilter(interval=60)
+        self.assertTrue(limiter.filter(make_record('No mapping for %s', 'X')))
+        self.assertFalse(limiter.filter(make_record('No mapping for %s', 'X')))
+        self.assertTrue(limiter.filter(make_record('No mapping for %s', 'Y')))
+
+    def test_reports_suppressed_count_after_the_interval(self):
+        limiter = RateLimitFilter(interval=0.05)
+        for _ in range(4):
+            limiter.filter(make_record('No mapping for %s', 'X'))
+        time.sleep(0.06)
+        record = make_record('No mapping for %s', 'X')
+
+        self.assertTrue(limiter.filter(record))
+        self.assertEqual(record.getMessage(), 'No mapping for X (3 similar messages suppressed)')
+
+    def test_lower_levels_pass_untouched(self):
+        limiter = RateLimitFilter(interval=60)
+        for _ in range(3):
+            self.assertTrue(limiter.filter(make_record('row %s', 1, level=logging.DEBUG)))
+
+    def test_unhashable_arguments_share_the_template_key(self):
+        limiter = RateLimitFilter(interval=60)
+        self.assertTrue(limiter.filter(make_record('row %s', [1])))
+        self.assertFalse(limiter.filter(make_record('row %s', [2])))
+
+
+class QueueLoggingTest(unittest.TestCase):
+    def test_local_queue_handler_defers_formatting(self):
+        records = queue.SimpleQueue()
+        record = make_record('Loaded %s', 'C')
+        LocalQueueHandler(records).emit(record)
+
+        queued = records.get_nowait()
+        self.assertIs(queued, record)
+        self.assertEqual(queued.args, ('C',))
+
+    def test_configure_logging_sets_module_levels(self):
+        root = logging.getLogger()
+        previous = root.level
+        try:
+            listener = logging_config.configure_logging('warning', {'test_logging_config.quiet': 'ERROR'})
+            self.assertIsNotNone(listener)
+            self.assertEqual(root.level, logging.WARNING)
+            self.assertEqual(logging.getLogger('test_logging_config.quiet').level, logging.ERROR)
+            self.assertEqual(sum(isinstance(h, LocalQueueHandler) for h in root.handlers), 1)
+            self.assertIs(logging_config.configure_logging('warning', {}), listener)
+        finally:
+            root.setLevel(previous)
+            logging.getLogger('test_logging_config.quiet').setLevel(logging.NOTSET)
+
+    def test_rejects_unknown_level(self):
+        with self.assertRaises(ValueError):
+            logging_config.configure_logging('loud', {})
+
+
+if __name__ == '__main__':
+    unittest.main()
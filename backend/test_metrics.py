@@ -0,0 +1,108 @@
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import metrics
+from app import app, CarbonProject
+from database_test_case import DatabaseTestCase
+
+
+def sample_value(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+class HistogramTest(unittest.TestCase):
+    def test_renders_cumulative_buckets_sum_and_count(self):
+        registry = metrics.Registry()
+        histogram = registry.add(metrics.Histogram('latency_seconds', 'Latency.', ['route'], buckets=(0.1, 1)))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, route='/a')
+
+        text = registry.render()
+
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_sum{route="/a"} 5.55', text)
+        self.assertIn('latency_seconds_count{route="/a"} 3', text)
+
+    def test_escapes_label_values(self):
+        counter = metrics.Counter('hits_total', 'Hits.', ['path'])
+        counter.inc(path='a"b\\c')
+        self.assertEqual(counter.samples(), ['hits_total{path="a\\"b\\\\c"} 1'])
+
+
+class RequestMetricsTest(DatabaseTestCase):
+    def make_projects(self):
+        return [CarbonProject(facility_name=f'Facility {i}', industry_type='C,PP',
+                              total_mass_co2_sequestered=100.0 * (i + 1)) for i in range(3)]
+
+    def setUp(self):
+        # Cached responses skip serialization, which these tests measure.
+        app.config['RESPONSE_CACHE'] = False
+        super().setUp()
+
+    def tearDown(self):
+        app.config['METRICS_DEBUG_HEADER'] = False
+        app.config['RESPONSE_CACHE'] = True
+        super().tearDown()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        return response.get_data(as_text=True)
+
+    def test_records_latency_queries_rows_and_spans_per_endpoint(self):
+        before = self.scrape()
+        response = self.client.get('/projects')
+        self.assertEqual(response.status_code, 200)
+        after = self.scrape()
+
+        labels = '{method="GET",endpoint="/projects",status="200"}'
+        self.assertEqual(sample_value(after, 'http_request_duration_seconds_count' + labels)
+                         - sample_value(before, 'http_request_duration_seconds_count' + labels), 1)
+        self.assertEqual(sample_value(after, 'http_response_rows_total{endpoint="/projects"}')
+                         - sample_value(before, 'http_response_rows_total{endpoint="/projects"}'), 3)
+        self.assertEqual(sample_value(after, 'http_response_bytes_total{endpoint="/projects"}')
+                         - sample_value(before, 'http_response_bytes_total{endpoint="/projects"}'),
+                         len(response.get_data()))
+        self.assertGreater(sample_value(after, 'http_request_sql_queries_sum{endpoint="/projects"}'),
+                           sample_value(before, 'http_request_sql_queries_sum{endpoint="/projects"}'))
+        self.assertGreater(sample_value(after, 'span_duration_seconds_count{span="industry_decoding"}'),
+                           sample_value(before, 'span_duration_seconds_count{span="industry_decoding"}'))
+
+    def test_streamed_bytes_are_counted_once_the_body_is_sent(self):
+        before = self.scrape()
+        response = self.client.get('/projects?export=ndjson')
+        body = response.get_data()
+        after = self.scrape()
+
+        key = 'http_response_bytes_total{endpoint="/projects"}'
+        self.assertEqual(sample_value(after, key) - sample_value(before, key), len(body))
+
+    def test_unmatched_routes_share_one_label(self):
+        self.client.get('/no/such/route')
+        self.assertIn('endpoint="unmatched",status="404"', self.scrape())
+
+    def test_debug_header_only_when_enabled(self):
+        self.assertNotIn(metrics.DEBUG_HEADER, self.client.get('/projects').headers)
+
+        app.config['METRICS_DEBUG_HEADER'] = True
+        header = self.client.get('/projects').headers[metrics.DEBUG_HEADER]
+        self.assertRegex(header, r'^total=[\d.]+ms; sql=\d+q/[\d.]+ms; industry_decoding=[\d.]+ms; rows=3$')
+
+    def test_spans_outside_requests_are_observed_directly(self):
+        key = 'span_duration_seconds_count{span="cli_test"}'
+        with metrics.span('cli_test'):
+            pass
+        self.assertEqual(sample_value(metrics.registry.render(), key), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
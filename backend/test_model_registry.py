@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from ml_models.registry import ModelRegistry, current_model_set, publish_artifact, publish_model_set
+
+
+class ModelRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'model.txt')
+        self.write('v1', mtime=1_000)
+        self.loads = []
+        self.registry = ModelRegistry()
+        self.registry.register('text', self.path, self.load)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, content, mtime):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.utime(tmp_path, (mtime, mtime))
+        publish_artifact(tmp_path, self.path)
+
+    def load(self, path):
+        with open(path) as f:
+            content = f.read()
+        self.loads.append(content)
+        return content
+
+    def test_loads_once_while_artifact_is_unchanged(self):
+        self.assertEqual(self.registry.get('text'), 'v1')
+        self.assertEqual(self.registry.get('text'), 'v1')
+        self.assertEqual(self.loads, ['v1'])
+
+    def test_reloads_when_artifact_is_replaced(self):
+        self.registry.get('text')
+        self.write('v2', mtime=2_000)
+        self.assertEqual(self.registry.get('text'), 'v2')
+        self.assertEqual(self.loads, ['v1', 'v2'])
+        self.assertEqual(self.registry.versions()['text']['version'], 2_000 * 10**9)
+
+    def test_reloads_when_an_older_artifact_is_restored(self):
+        self.write('v2', mtime=2_000)
+        self.assertEqual(self.registry.get('text'), 'v2')
+        self.write('v1', mtime=1_000)
+        self.assertEqual(self.registry.get('text'), 'v1')
+        self.assertEqual(self.registry.versions()['text']['version'], 1_000 * 10**9)
+
+    def test_versions_before_and_after_warm_up(self):
+        self.assertIsNone(self.registry.versions()['text'])
+        self.registry.warm_up()
+        self.assertEqual(self.registry.versions()['text']['version'], 1_000 * 10**9)
+        self.assertEqual(self.loads, ['v1'])
+
+    def test_warm_up_skips_missing_artifacts(self):
+        self.registry.register('missing', os.path.join(self.tmp.name, 'absent.pkl'), self.load)
+        self.registry.warm_up()
+        self.assertIsNone(self.registry.versions()['missing'])
+        self.assertEqual(self.loads, ['v1'])
+
+
+class ModelSetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_dir = self.tmp.name
+        self.registry = ModelRegistry()
+        for name in ('first', 'second'):
+            self.registry.register(name, os.path.join(self.model_dir, f'{name}.txt'), self.load)
+        self.on_load = None
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def publish(self, set_name):
+        staging = os.path.join(self.model_dir, 'staging-' + set_name)
+        os.makedirs(staging)
+        for name in ('first', 'second'):
+            with open(os.path.join(staging, f'{name}.txt'), 'w') as f:
+                f.write(set_name)
+        publish_model_set(staging, self.model_dir, set_name)
+
+    def load(self, path):
+        if self.on_load is not None:
+            on_load, self.on_load = self.on_load, None
+            on_load()
+        with open(path) as f:
+            return f.read()
+
+    def test_models_are_never_loaded_from_mixed_sets(self):
+        self.publish('a')
+        # A newer set is promoted while the first model of the call is loading.
+        self.on_load = lambda: self.publish('b')
+        self.assertEqual(self.registry.get_many(['first', 'second']), {'first': 'a', 'second': 'a'})
+        self.assertEqual(self.registry.get_many(['first', 'second']), {'first': 'b', 'second': 'b'})
+        self.assertEqual(self.registry.versions()['second']['model_set'], 'b')
+
+    def test_keeps_only_the_current_and_previous_sets(self):
+        for set_name in ('a', 'b', 'c'):
+            self.publish(set_name)
+        self.assertEqual(current_model_set(self.model_dir), 'c')
+        self.assertEqual(sorted(os.listdir(os.path.join(self.model_dir, 'sets'))), ['b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+import torch
+
+from ml_models import backends
+from ml_models.numpy_mlp import NumpyMLP, load_mlp, verify
+from ml_models.pytorch_model import SimpleNN, export_pytorch_model, score_pytorch_batch
+from ml_models.tensorflow_model import export_tensorflow_model, score_tensorflow_batch
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class NumpyMLPTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.features = np.random.default_rng(1).standard_normal((100, 3)).astype(np.float32) * 10
+
+    def tearDown(self):
+        backends.configure(list(backends.BACKENDS))
+        self.tmp.cleanup()
+
+    def test_matches_pytorch(self):
+        torch.manual_seed(0)
+        model = SimpleNN(3)
+        path = os.path.join(self.tmp.name, 'pytorch_model.npz')
+        export_pytorch_model(model, path)
+        np.testing.assert_allclose(load_mlp(path)(self.features), score_pytorch_batch(model, self.features, None),
+                                   rtol=1e-5, atol=1e-5)
+
+    def test_matches_tensorflow(self):
+        tf.keras.utils.set_random_seed(0)
+        model = tf.keras.Sequential([tf.keras.Input((3,)), tf.keras.layers.Dense(64, activation='relu'),
+                                     tf.keras.layers.Dense(64, activation='relu'), tf.keras.layers.Dense(1)])
+        path = os.path.join(self.tmp.name, 'tensorflow_model.npz')
+        mlp = export_tensorflow_model(model, path)
+        self.assertEqual(mlp.activations, ['relu', 'relu', 'linear'])
+        np.testing.assert_allclose(load_mlp(path)(self.features), score_tensorflow_batch(model, self.features, None),
+                                   rtol=1e-4, atol=1e-4)
+
+    def test_verify_rejects_mismatched_weights(self):
+        mlp = NumpyMLP([np.ones((3, 1))], [np.zeros(1)], ['linear'])
+        verify(mlp, lambda features: features.sum(axis=1))
+        with self.assertRaisesRegex(ValueError, 'differs'):
+            verify(mlp, lambda features: features.sum(axis=1) + 1)
+
+    def test_numpy_runtime_serves_without_frameworks(self):
+        backends.configure(['sklearn', 'pytorch'], runtime='numpy')
+        served = backends.enabled_backends()
+        self.assertIs(served['sklearn'], backends.BACKENDS['sklearn'])
+        self.assertEqual(served['pytorch'].path, backends.BACKENDS['pytorch'].exported_path)
+
+        path = os.path.join(self.tmp.name, 'model.npz')
+        NumpyMLP([np.ones((2, 1))], [np.zeros(1)], ['linear']).save(path)
+        code = ('import sys; from ml_models.backends import BACKENDS; '
+                'backend = BACKENDS["pytorch"].serving("numpy"); '
+                'print(backend.score(backend.load(%r), [[1, 2]], None).tolist(), "torch" in sys.modules)' % path)
+        result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[[3.0]] False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+import torch
+from sklearn.linear_model import LinearRegression
+
+from app import app
+from ml_models.batch import InvalidBatch, parse_records, records_to_matrix
+from ml_models import backends
+from ml_models.pytorch_model import SimpleNN, load_pytorch_model
+from ml_models.registry import registry
+from ml_models.sklearn_model import load_sklearn_model
+from ml_models.tensorflow_model import load_tensorflow_model
+
+COLUMNS = ['latitude', 'longitude']
+
+
+class BatchParsingTest(unittest.TestCase):
+    def test_parses_array_and_ndjson(self):
+        records = [{'latitude': 1, 'longitude': 2}, {'latitude': 3, 'longitude': 4}]
+        self.assertEqual(parse_records(json.dumps(records), ndjson=False), records)
+        self.assertEqual(parse_records('\n'.join(map(json.dumps, records)) + '\n\n', ndjson=True), records)
+
+    def test_rejects_malformed_batches(self):
+        for body, ndjson in (('{"latitude": 1}', False), ('[]', False), ('[1, 2]', False), ('{"a": 1}\n{', True)):
+            with self.assertRaises(InvalidBatch):
+                parse_records(body, ndjson)
+
+    def test_builds_float32_matrix_in_column_order(self):
+        features = records_to_matrix([{'longitude': 2, 'latitude': 1}, {'latitude': '3.5', 'longitude': 4}], COLUMNS)
+        self.assertEqual(features.dtype, np.float32)
+        self.assertTrue(features.flags['C_CONTIGUOUS'])
+        np.testing.assert_array_equal(features, [[1, 2], [3.5, 4]])
+        with self.assertRaisesRegex(InvalidBatch, 'Record 1 is missing'):
+            records_to_matrix([{'latitude': 1, 'longitude': 2}, {'latitude': 1}], COLUMNS)
+        for value in ('north', None, True):
+            with self.assertRaisesRegex(InvalidBatch, 'Record 0 has a non-numeric'):
+                records_to_matrix([{'latitude': value, 'longitude': 2}], COLUMNS)
+        for value in ('nan', 'inf', float('inf'), 10 ** 400):
+            with self.assertRaisesRegex(InvalidBatch, 'Record 0 has a non-(finite|numeric)'):
+                records_to_matrix([{'latitude': value, 'longitude': 2}], COLUMNS)
+
+
+class PredictBatchEndpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        data = pd.DataFrame({'latitude': [0.0, 1.0, 2.0, 3.0], 'longitude': [1.0, 0.0, 1.0, 0.0]})
+        target = data['latitude'] * 2 + data['longitude']
+
+        self.sklearn_model = LinearRegression().fit(data, target)
+        sklearn_path = os.path.join(self.tmp.name, 'sklearn_model.pkl')
+        with open(sklearn_path, 'wb') as f:
+            pickle.dump(self.sklearn_model, f)
+
+        tf.keras.utils.set_random_seed(0)
+        keras_model = tf.keras.Sequential([tf.keras.Input((2,)), tf.keras.layers.Dense(1)])
+        tensorflow_path = os.path.join(self.tmp.name, 'tensorflow_model.h5')
+        keras_model.save(tensorflow_path)
+
+        torch.manual_seed(0)
+        pytorch_path = os.path.join(self.tmp.name, 'pytorch_model.pth')
+        torch.save(SimpleNN(2).state_dict(), pytorch_path)
+
+        registry.register('sklearn', sklearn_path, load_sklearn_model)
+        registry.register('tensorflow', tensorflow_path, load_tensorflow_model)
+        registry.register('pytorch', pytorch_path, load_pytorch_model)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        backends.configure(list(backends.BACKENDS))
+        self.tmp.cleanup()
+
+    def test_matches_single_record_predictions(self):
+        records = [{'latitude': i * 0.5, 'longitude': i % 2} for i in range(7)]
+        response = self.client.post('/predict/batch?batch_size=3', json=records)
+        self.assertEqual(response.status_code, 200)
+        predictions = response.get_json()['predictions']
+        self.assertEqual([p['index'] for p in predictions], list(range(7)))
+
+        features = pd.DataFrame(records, columns=COLUMNS).astype('float32')
+        expected = {
+            'sklearn': self.sklearn_model.predict(features),
+            'tensorflow': registry.get('tensorflow').predict(features.values, verbose=0).ravel(),
+            'pytorch': registry.get('pytorch')(torch.tensor(features.values)).detach().numpy().ravel(),
+        }
+        for name, values in expected.items():
+            np.testing.assert_allclose([p[name + '_prediction'] for p in predictions], values, rtol=1e-5, atol=1e-5)
+        self.assertIn('sklearn', json.loads(response.headers['X-Model-Versions']))
+
+    def test_single_prediction(self):
+        response = self.client.post('/predict', json={'longitude': 1, 'latitude': 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertAlmostEqual(body['sklearn_prediction'][0], 5.0, places=4)
+        self.assertEqual(len(body['tensorflow_prediction'][0]), 1)
+        self.assertEqual(len(body['pytorch_prediction'][0]), 1)
+        self.assertEqual(set(body['model_versions']), {'sklearn', 'tensorflow', 'pytorch'})
+
+    def test_streams_ndjson(self):
+        body = '{"latitude": 1, "longitude": 0}\n{"latitude": 2, "longitude": 1}\n'
+        response = self.client.post('/predict/batch', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([line['index'] for line in lines], [0, 1])
+        self.assertAlmostEqual(lines[1]['sklearn_prediction'], 5.0, places=4)
+
+    def test_rejects_invalid_records(self):
+        response = self.client.post('/predict/batch', json=[{'latitude': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('missing feature', response.get_json()['error'])
+        for value in ('null', '"nan"', '"inf"', '1e400', 'true'):
+            body = '[{"latitude": 1, "longitude": 2}, {"latitude": %s, "longitude": 2}]' % value
+            response = self.client.post('/predict/batch', data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('Record 1', response.get_json()['error'])
+            response = self.client.post('/predict', data='{"latitude": %s, "longitude": 2}' % value,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400, value)
+
+
+if __name__ == '__main__':
+    unittest.main()
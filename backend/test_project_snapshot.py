@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+
+import derived_tables
+import project_snapshot
+import rating_engine
+import rating_store
+from app import app, db, CarbonProject, IndustryType, ProjectRating
+
+
+class ProjectSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add_all([
+            IndustryType(subpart_code='C', name='Stationary Combustion'),
+            IndustryType(subpart_code='RR', name='Geologic Sequestration'),
+        ])
+        projects = [
+            CarbonProject(facility_name='A', state='TX', industry_type='C,RR', latitude=30.0, longitude=-97.0,
+                          total_mass_co2_sequestered=60.0, duration_years=3,
+                          total_mass_co2_sequestered_2021=20.0, total_mass_co2_sequestered_2022=40.0),
+            CarbonProject(facility_name='B', state='NM', industry_type='RR', total_mass_co2_sequestered=5.0,
+                          total_mass_co2_sequestered_2022=5.0),
+            CarbonProject(facility_name='C', industry_type='X', total_mass_co2_sequestered=None),
+        ]
+        db.session.add_all(projects)
+        db.session.flush()
+        derived_tables.rebuild_all()
+        db.session.commit()
+        derived_tables.ensure_current()
+        self.ids = [p.id for p in projects]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        self.tmp.cleanup()
+
+    def test_columns_are_memory_mapped_with_coded_text_and_subparts(self):
+        project_snapshot.write_snapshot(self.tmp.name, chunk_size=2)
+        snapshot = project_snapshot.open_snapshot(self.tmp.name)
+
+        self.assertIsInstance(snapshot['total_mass_co2_sequestered'], np.memmap)
+        self.assertFalse(snapshot['yearly'].flags.writeable)
+        self.assertEqual(snapshot['id'].tolist(), self.ids)
+        np.testing.assert_array_equal(snapshot['total_mass_co2_sequestered'], [60.0, 5.0, np.nan])
+        np.testing.assert_array_equal(snapshot.year(2022), [40.0, 5.0, np.nan])
+        self.assertEqual(snapshot['yearly'].shape, (3, len(rating_engine.YEARS)))
+        self.assertEqual([snapshot.categories['state'][code] if code >= 0 else None for code in snapshot['state']],
+                         ['TX', 'NM', None])
+
+        offsets, codes = snapshot['subpart_offsets'], snapshot['subpart_codes']
+        subparts = [[snapshot.categories['subpart_code'][c] for c in codes[offsets[i]:offsets[i + 1]]]
+                    for i in range(snapshot.n_rows)]
+        self.assertEqual(subparts, [['C', 'RR'], ['RR'], ['X']])
+        self.assertEqual(snapshot.industry_names, ['Stationary Combustion', 'Geologic Sequestration', 'X'])
+
+    def test_current_rewrites_only_when_the_dataset_version_changes(self):
+        first = project_snapshot.current(self.tmp.name)
+        self.assertIs(project_snapshot.current(self.tmp.name), first)
+
+        project = db.session.get(CarbonProject, self.ids[1])
+        previous = derived_tables.capture(project)
+        project.total_mass_co2_sequestered = 50.0
+        derived_tables.record_saved(project, previous)
+        db.session.commit()
+
+        second = project_snapshot.current(self.tmp.name)
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(second['total_mass_co2_sequestered'][1], 50.0)
+        # The superseded snapshot stays mapped for its readers.
+        self.assertEqual(first['total_mass_co2_sequestered'][1], 5.0)
+
+    def test_a_concurrent_prune_cannot_remove_a_snapshot_before_it_is_mapped(self):
+        def prune_everything(directory, keep):
+            # Another worker's prune keeps only its own snapshots, so ours goes.
+            for entry in os.listdir(directory):
+                if entry.startswith('v'):
+                    shutil.rmtree(os.path.join(directory, entry))
+
+        with mock.patch.object(project_snapshot, '_prune', side_effect=prune_everything):
+            snapshot = project_snapshot.current(self.tmp.name)
+        self.assertFalse(os.path.exists(snapshot.path))
+        self.assertEqual(snapshot['id'].tolist(), self.ids)
+
+    def test_bridge_rows_of_projects_missing_from_the_table_are_dropped(self):
+        # Subpart rows can outlive the projects read, e.g. inserted between the two reads.
+        db.session.query(CarbonProject).delete()
+        db.session.commit()
+        _, manifest = project_snapshot.write_snapshot(self.tmp.name)
+        snapshot = project_snapshot.open_snapshot(self.tmp.name)
+        self.assertEqual(manifest['rows'], 0)
+        self.assertEqual(snapshot['subpart_offsets'].tolist(), [0])
+        self.assertEqual(len(snapshot['subpart_codes']), 0)
+
+    def test_rescoring_from_the_snapshot_matches_the_database(self):
+        def ratings():
+            return {r.project_id: r.rating for r in db.session.query(ProjectRating)}
+
+        expected = ratings()
+        db.session.query(ProjectRating).delete()
+        rating_store.rescore_all_projects(project_snapshot.current(self.tmp.name))
+        self.assertEqual(ratings(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
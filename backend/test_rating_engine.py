@@ -0,0 +1,69 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+import rating_engine
+
+
+def legacy_raw_rating(project, all_projects):
+    # Per-project loop that CarbonProject.calculate_raw_rating used before the batched engine.
+    weights = {'total_co2': 0.3, 'duration': 0.2, 'co2_per_year': 0.5}
+    max_co2 = max(p.total_mass_co2_sequestered for p in all_projects)
+    min_co2 = min(p.total_mass_co2_sequestered for p in all_projects)
+    max_duration = max((p.duration_years for p in all_projects if p.duration_years is not None), default=0)
+    min_duration = min((p.duration_years for p in all_projects if p.duration_years is not None), default=0)
+    yearly_data = [getattr(project, column) for column in rating_engine.YEAR_COLUMNS]
+    yearly_data = [data for data in yearly_data if data is not None]
+    if yearly_data:
+        co2_per_year = (yearly_data[-1] - yearly_data[0]) / (len(yearly_data) - 1) if len(yearly_data) > 1 else yearly_data[0]
+    else:
+        co2_per_year = 0
+    max_co2_per_year = max(((p.total_mass_co2_sequestered_2022 - p.total_mass_co2_sequestered_2016) / (6 - 1) for p in all_projects if p.total_mass_co2_sequestered_2016 is not None), default=0)
+    min_co2_per_year = min(((p.total_mass_co2_sequestered_2022 - p.total_mass_co2_sequestered_2016) / (6 - 1) for p in all_projects if p.total_mass_co2_sequestered_2016 is not None), default=0)
+    co2_score = (project.total_mass_co2_sequestered - min_co2) / (max_co2 - min_co2) if max_co2 != min_co2 else 0
+    duration_score = (project.duration_years - min_duration) / (max_duration - min_duration) if project.duration_years and max_duration != min_duration else 0
+    co2_per_year_score = (co2_per_year - min_co2_per_year) / (max_co2_per_year - min_co2_per_year) if max_co2_per_year != min_co2_per_year else 0
+    return (weights['total_co2'] * co2_score +
+            weights['duration'] * duration_score +
+            weights['co2_per_year'] * co2_per_year_score) * 5
+
+
+def make_project(rng, first_year):
+    yearly = {column: None for column in rating_engine.YEAR_COLUMNS}
+    for year, column in zip(rating_engine.YEARS, rating_engine.YEAR_COLUMNS):
+        if year >= first_year and (year in (2016, 2022) or rng.random() > 0.2):
+            yearly[column] = round(rng.uniform(-20000, 4000000), 1)
+    return SimpleNamespace(
+        total_mass_co2_sequestered=yearly['total_mass_co2_sequestered_2022'] or 1000.0,
+        duration_years=rng.choice([None, 1, 2, 3, 5]),
+        **yearly)
+
+
+class RatingEngineTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.projects = [make_project(rng, rng.choice(rating_engine.YEARS + [2023])) for _ in range(200)]
+
+    def test_matches_legacy_per_project_rating(self):
+        raw, normalized = rating_engine.compute_ratings(self.projects)
+        expected = [legacy_raw_rating(p, self.projects) for p in self.projects]
+        self.assertEqual(raw.tolist(), expected)
+        expected_normalized = [(r - min(expected)) / (max(expected) - min(expected)) * 9 + 1 for r in expected]
+        self.assertEqual(normalized.tolist(), expected_normalized)
+
+    def test_project_scored_against_other_bounds(self):
+        outsider = make_project(random.Random(1), 2018)
+        bounds = rating_engine.rating_bounds(rating_engine.columns_from_projects(self.projects))
+        raw = rating_engine.raw_ratings(rating_engine.columns_from_projects([outsider]), bounds)
+        self.assertEqual(raw[0], legacy_raw_rating(outsider, self.projects))
+
+    def test_empty_and_uniform_inputs(self):
+        raw, normalized = rating_engine.compute_ratings([])
+        self.assertEqual(raw.size, 0)
+        self.assertEqual(normalized.size, 0)
+        _, normalized = rating_engine.compute_ratings(self.projects[:1])
+        self.assertEqual(normalized.tolist(), [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
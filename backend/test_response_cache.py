@@ -0,0 +1,108 @@
+import gzip
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import dataset_version
+import derived_tables
+import response_cache
+import subpart_store
+from app import app, db, CarbonProject
+from database_test_case import DatabaseTestCase
+from load_data import bulk_load_data, load_data
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'CO2 Sequestered 2016-2022.csv')
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used_beyond_max_bytes(self):
+        cache = response_cache.ResponseCache(max_bytes=10)
+        for key in 'abc':
+            cache.put(key, {'body': b'xxxx'})
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        cache.put('d', {'body': b'xxxx'})
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.size, 8)
+
+
+class ConditionalGetTest(DatabaseTestCase):
+    def make_projects(self):
+        return [CarbonProject(facility_name='Facility 0', state='TX', industry_type='C',
+                              total_mass_co2_sequestered=100.0)]
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            # Seeding lookup tables on first use bumps the version too.
+            derived_tables.ensure_current()
+        self.project_id = self.ids[0]
+
+    def test_matching_etag_returns_304(self):
+        first = self.client.get('/projects')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['Cache-Control'], 'no-cache')
+        etag = first.headers['ETag']
+
+        second = self.client.get('/projects', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], etag)
+        self.assertEqual(second.get_data(), b'')
+
+    def test_query_string_is_part_of_the_etag(self):
+        etag = self.client.get('/projects').headers['ETag']
+        other = self.client.get('/projects?state=TX', headers={'If-None-Match': etag})
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other.headers['ETag'], etag)
+
+    def test_writes_change_the_etag_and_refresh_the_body(self):
+        before = self.client.get('/projects')
+        response = self.client.put(f'/projects/{self.project_id}', json={'facility_name': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+
+        after = self.client.get('/projects', headers={'If-None-Match': before.headers['ETag']})
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers['ETag'], before.headers['ETag'])
+        self.assertEqual(after.get_json()['projects'][0]['facility_name'], 'Renamed')
+
+    def test_bulk_writes_and_loads_bump_the_version(self):
+        with app.app_context():
+            version = dataset_version.current()
+            derived_tables.rebuild_all()
+            db.session.commit()
+            self.assertEqual(dataset_version.current(), version + 1)
+        self.client.post('/projects/bulk', json={'delete': [self.project_id]})
+        with app.app_context():
+            self.assertGreater(dataset_version.current(), version + 1)
+
+    def test_unchanged_reloads_keep_the_version(self):
+        with app.app_context():
+            bulk_load_data(DATA_FILE)
+            version = dataset_version.current()
+            load_data(DATA_FILE)
+            bulk_load_data(DATA_FILE)
+            subpart_store.seed_industry_types()
+            subpart_store.rebuild_project_subparts()
+            db.session.commit()
+            self.assertEqual(dataset_version.current(), version)
+
+    def test_gzip_when_accepted(self):
+        plain = self.client.get('/series?group_by=state')
+        gzipped = self.client.get('/series?group_by=state', headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertEqual(gzipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.get_data()), plain.get_data())
+        self.assertIn('Accept-Encoding', gzipped.headers['Vary'])
+        # The two representations carry different strong ETags.
+        self.assertNotEqual(gzipped.headers['ETag'], plain.headers['ETag'])
+
+    def test_exports_and_errors_are_not_cached(self):
+        export = self.client.get('/projects?export=ndjson')
+        self.assertNotIn('ETag', export.headers)
+        self.assertEqual(self.client.get('/projects?sort=bogus').status_code, 400)
+        self.assertNotIn('ETag', self.client.get('/projects?sort=bogus').headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+
+import derived_tables
+import series_store
+from app import app, db, CarbonProject, ProjectTrend, ProjectYearTotal
+from database_test_case import DatabaseTestCase
+from load_data import industry_decoder, industry_types
+
+nan = np.nan
+
+
+def yearly_columns(values):
+    return {f'total_mass_co2_sequestered_{2016 + i}': value for i, value in enumerate(values)}
+
+
+class TrendStatsTest(unittest.TestCase):
+    def test_trend_over_reported_years(self):
+        yearly = np.array([
+            [10, 20, 30, 40, 50, 60, 70],
+            [nan, nan, 5, nan, 9, nan, nan],
+            [nan, nan, nan, nan, nan, nan, 8],
+        ], dtype=float)
+        stats = series_store.trend_stats(yearly)
+
+        self.assertEqual(stats['first_year'].tolist(), [2016, 2018, 2022])
+        self.assertEqual(stats['last_year'].tolist(), [2022, 2020, 2022])
+        self.assertEqual(stats['years_reported'].tolist(), [7, 2, 1])
+        np.testing.assert_allclose(stats['coverage'], [1.0, 2 / 3, 1.0])
+        np.testing.assert_allclose(stats['latest_tonnes'], [70, 9, 8])
+        np.testing.assert_allclose(stats['slope'][:2], [10.0, 2.0])
+        self.assertTrue(np.isnan(stats['slope'][2]))
+
+
+class SeriesEndpointsTest(DatabaseTestCase):
+    def make_projects(self):
+        return [
+            CarbonProject(facility_name='A', state='TX', industry_type='C,RR', total_mass_co2_sequestered=60.0,
+                          **yearly_columns([None, None, None, None, 10.0, 20.0, 30.0])),
+            CarbonProject(facility_name='B', state='TX', industry_type='C', total_mass_co2_sequestered=7.0,
+                          **yearly_columns([None, None, None, None, None, 3.0, 4.0])),
+            CarbonProject(facility_name='C', state='NM', industry_type='RR', total_mass_co2_sequestered=5.0,
+                          **yearly_columns([None] * 6 + [5.0])),
+            CarbonProject(facility_name='D', state='NM', total_mass_co2_sequestered=1.0),
+        ]
+
+    def setUp(self):
+        self.saved_industry_types = dict(industry_types)
+        industry_types.update({'C': 'General Stationary Fuel Combustion', 'RR': 'Geologic Sequestration'})
+        super().setUp()
+        self.ids = dict(zip('ABCD', self.ids))
+
+    def tearDown(self):
+        industry_types.clear()
+        industry_types.update(self.saved_industry_types)
+        industry_decoder.invalidate()
+        super().tearDown()
+
+    def test_project_series_and_trend(self):
+        body = self.client.get(f"/projects/{self.ids['A']}/series").get_json()
+
+        self.assertEqual(body['series'], [{'year': 2020, 'tonnes': 10.0}, {'year': 2021, 'tonnes': 20.0},
+                                          {'year': 2022, 'tonnes': 30.0}])
+        self.assertEqual(body['trend']['first_year'], 2020)
+        self.assertEqual(body['trend']['years_reported'], 3)
+        self.assertAlmostEqual(body['trend']['slope'], 10.0)
+
+    def test_project_without_yearly_data(self):
+        body = self.client.get(f"/projects/{self.ids['D']}/series").get_json()
+        self.assertEqual(body['series'], [])
+        self.assertIsNone(body['trend'])
+        self.assertEqual(self.client.get('/projects/9999/series').status_code, 404)
+
+    def test_series_by_state(self):
+        body = self.client.get('/series?group_by=state').get_json()
+        groups = {group['key']: group['series'] for group in body['groups']}
+
+        self.assertEqual(groups['NM'], [{'year': 2022, 'total_tonnes': 5.0, 'projects': 1}])
+        self.assertEqual(groups['TX'][-1], {'year': 2022, 'total_tonnes': 34.0, 'projects': 2})
+        self.assertEqual([point['year'] for point in groups['TX']], [2020, 2021, 2022])
+
+    def test_series_by_industry(self):
+        body = self.client.get('/series?group_by=industry').get_json()
+        groups = {group['key']: group for group in body['groups']}
+
+        self.assertEqual(groups['RR']['name'], 'Geologic Sequestration')
+        self.assertEqual(groups['RR']['series'][-1], {'year': 2022, 'total_tonnes': 35.0, 'projects': 2})
+        self.assertEqual(groups['C']['series'][1], {'year': 2021, 'total_tonnes': 23.0, 'projects': 2})
+
+    def test_unknown_group(self):
+        self.assertEqual(self.client.get('/series?group_by=county').status_code, 400)
+
+    def test_writes_keep_series_current(self):
+        with app.app_context():
+            project = db.session.get(CarbonProject, self.ids['B'])
+            project.total_mass_co2_sequestered_2022 = 10.0
+            derived_tables.record_saved(project)
+            derived_tables.delete_projects([self.ids['C']])
+            db.session.commit()
+
+            self.assertEqual(db.session.get(ProjectYearTotal, (self.ids['B'], 2022)).tonnes, 10.0)
+            self.assertAlmostEqual(db.session.get(ProjectTrend, self.ids['B']).slope, 7.0)
+            self.assertIsNone(db.session.get(ProjectTrend, self.ids['C']))
+            self.assertEqual(ProjectYearTotal.query.filter_by(project_id=self.ids['C']).count(), 0)
+
+    def test_empty_tables_are_rebuilt_on_first_use(self):
+        with app.app_context():
+            series_store.remove_project_series(list(self.ids.values()))
+            db.session.commit()
+        body = self.client.get(f"/projects/{self.ids['B']}/series").get_json()
+        self.assertEqual(len(body['series']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
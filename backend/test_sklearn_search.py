@@ -0,0 +1,59 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+import pandas as pd
+
+from app import app, db, CarbonProject
+from ml_models.sklearn_model import search_results_path, search_sklearn_model, train_sklearn_model
+from ml_models.training_data import open_snapshot, write_snapshot
+
+
+class SklearnSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        with app.app_context():
+            db.create_all()
+            for i in range(120):
+                latitude = float(rng.random() * 10)
+                db.session.add(CarbonProject(facility_name=f'Facility {i}', latitude=latitude, longitude=0.0,
+                                             total_mass_co2_sequestered=latitude * 100))
+            db.session.commit()
+            write_snapshot(os.path.join(self.tmp.name, 'snapshot'))
+        self.snapshot = open_snapshot(os.path.join(self.tmp.name, 'snapshot'))
+        self.path = os.path.join(self.tmp.name, 'sklearn_model.pkl')
+
+    def tearDown(self):
+        with app.app_context():
+            db.drop_all()
+        self.tmp.cleanup()
+
+    def test_persists_best_model_and_results(self):
+        space = {'n_estimators': [5, 20], 'max_depth': [1, None]}
+        mse = train_sklearn_model(self.snapshot, self.path, search=True, space=space, grid=True, folds=3, n_jobs=2)
+
+        with open(self.path, 'rb') as f:
+            model = pickle.load(f)
+        self.assertIsNone(model.max_depth)
+        results = pd.read_csv(search_results_path(self.path))
+        self.assertEqual(len(results[results['iter'] == 0]), 4)
+        self.assertEqual(results['rank_test_score'].min(), 1)
+        for column in ('split0_test_score', 'split2_test_score', 'mean_fit_time', 'n_resources'):
+            self.assertIn(column, results.columns)
+        self.assertLess(mse, np.var(self.snapshot.test.target))
+
+    def test_random_search_samples_candidates(self):
+        search_sklearn_model(self.snapshot, self.path, space={'min_samples_leaf': [1, 2, 4, 8, 16]},
+                             candidates=3, folds=3, max_rows=60, n_jobs=1)
+        results = pd.read_csv(search_results_path(self.path))
+        self.assertEqual(len(results[results['iter'] == 0]), 3)
+        self.assertLessEqual(results['n_resources'].max(), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+
+from app import app, db, CarbonProject
+from ml_models.training_data import (FEATURE_COLUMNS, evaluation_mse, in_test_split, iter_feature_chunks,
+                                     open_snapshot, write_snapshot)
+
+
+class TrainingDataTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        for i in range(1, 26):
+            db.session.add(CarbonProject(facility_name=f'Facility {i}', latitude=float(i), longitude=None,
+                                         total_mass_co2_sequestered=float(i * 10),
+                                         total_mass_co2_sequestered_2016=float(i),
+                                         total_mass_co2_sequestered_2022=float(i * 10)))
+        db.session.add(CarbonProject(facility_name='No total', latitude=1.0))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        self.tmp.cleanup()
+
+    def test_streams_chunks_in_id_order(self):
+        chunks = list(iter_feature_chunks(chunk_size=10))
+        self.assertEqual([len(ids) for ids, _, _ in chunks], [10, 10, 5])
+        ids, features, target = chunks[0]
+        self.assertEqual(features.dtype, np.float32)
+        self.assertEqual(features.shape, (10, len(FEATURE_COLUMNS)))
+        np.testing.assert_array_equal(features[0, :3], [1, 0, 1])
+        np.testing.assert_array_equal(target[:2], [10, 20])
+
+    def test_target_year_is_not_a_feature(self):
+        # The total is loaded from the 2022 column, so a feature equal to it would leak the target.
+        self.assertNotIn('total_mass_co2_sequestered_2022', FEATURE_COLUMNS)
+        for _, features, target in iter_feature_chunks():
+            for column in range(features.shape[1]):
+                self.assertFalse(np.array_equal(features[:, column], target), FEATURE_COLUMNS[column])
+
+    def test_snapshot_splits_deterministically_and_reads_in_batches(self):
+        manifest = write_snapshot(self.tmp.name, chunk_size=7)
+        snapshot = open_snapshot(self.tmp.name)
+        expected_test = int(in_test_split(np.arange(1, 26)).sum())
+        self.assertEqual(manifest['rows'], {'train': 25 - expected_test, 'test': expected_test})
+        self.assertEqual(snapshot.test.n_rows, expected_test)
+        self.assertIsInstance(snapshot.train.features, np.memmap)
+
+        batches = list(snapshot.train.batches(4, shuffle=True, seed=1))
+        self.assertTrue(all(len(X) <= 4 for X, _ in batches))
+        self.assertEqual(sorted(np.concatenate([y for _, y in batches])), sorted(snapshot.train.target))
+
+        self.assertAlmostEqual(evaluation_mse(lambda X: X[:, 0] * 10, snapshot), 0.0)
+
+    def test_empty_table_cannot_be_snapshotted(self):
+        db.session.query(CarbonProject).delete()
+        db.session.commit()
+        with self.assertRaisesRegex(ValueError, 'No projects'):
+            write_snapshot(self.tmp.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
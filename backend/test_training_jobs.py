@@ -0,0 +1,115 @@
+import os
+import tempfile
+import time
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+
+from app import app, db, CarbonProject
+from ml_models.jobs import TrainingJobQueue
+from ml_models.registry import current_model_set
+
+JOB_TIMEOUT = 300
+
+
+class TrainingJobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_dir = os.path.join(self.tmp.name, 'models')
+        os.makedirs(self.model_dir)
+        self.queue = TrainingJobQueue(model_dir=self.model_dir)
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        if self.queue._executor is not None:
+            self.queue._executor.shutdown()
+        with app.app_context():
+            db.drop_all()
+        self.tmp.cleanup()
+
+    def add_projects(self, count):
+        rng = np.random.default_rng(0)
+        with app.app_context():
+            for i in range(count):
+                yearly = rng.random(7) * 1000
+                db.session.add(CarbonProject(
+                    facility_name=f'Facility {i}', latitude=float(rng.random() * 10), longitude=float(rng.random() * 10),
+                    total_mass_co2_sequestered=float(yearly.sum()),
+                    **{f'total_mass_co2_sequestered_{2016 + j}': float(value) for j, value in enumerate(yearly)}))
+            db.session.commit()
+
+    def wait(self, job):
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while not job.finished:
+            self.assertLess(time.monotonic(), deadline, 'training job did not finish')
+            time.sleep(0.2)
+        return job.as_dict()
+
+    def test_promotes_all_artifacts_once_every_model_trained(self):
+        self.add_projects(40)
+        status = self.wait(self.queue.submit())
+
+        self.assertEqual(status['status'], 'succeeded', status)
+        self.assertEqual(sum(status['snapshot']['rows'].values()), 40)
+        for model in status['models'].values():
+            self.assertEqual(model['status'], 'succeeded')
+            self.assertIsInstance(model['loss'], float)
+            self.assertGreater(model['seconds'], 0)
+        self.assertEqual(sorted(os.listdir(self.model_dir)), ['CURRENT', 'sets', 'staging'])
+        self.assertEqual(current_model_set(self.model_dir), status['job_id'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.model_dir, 'sets', status['job_id']))),
+                         ['pytorch_model.npz', 'pytorch_model.pth', 'sklearn_model.pkl',
+                          'tensorflow_model.h5', 'tensorflow_model.npz'])
+        self.assertEqual(os.listdir(os.path.join(self.model_dir, 'staging')), [])
+
+    def test_failed_snapshot_blocks_training(self):
+        status = self.wait(self.queue.submit())
+
+        self.assertEqual(status['status'], 'failed')
+        self.assertIn('No projects', status['snapshot']['error'])
+        self.assertEqual({m['status'] for m in status['models'].values()}, {'skipped'})
+        self.assertEqual(os.listdir(self.model_dir), ['staging'])
+
+    def test_dead_worker_fails_the_job_and_the_pool_is_replaced(self):
+        self.add_projects(40)
+        pool = self.queue._pool()
+        pool.submit(os.getpid).result()
+        for process in list(pool._processes.values()):
+            process.kill()
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while not pool._broken:
+            self.assertLess(time.monotonic(), deadline, 'pool did not notice its dead worker')
+            time.sleep(0.05)
+
+        status = self.wait(self.queue.submit())
+        self.assertEqual(status['status'], 'failed', status)
+        self.assertEqual({m['status'] for m in status['models'].values()}, {'failed'})
+        self.assertIn('BrokenProcessPool', next(iter(status['models'].values()))['error'])
+        self.assertEqual(os.listdir(self.model_dir), ['staging'])
+        self.assertEqual(os.listdir(os.path.join(self.model_dir, 'staging')), [])
+        self.assertIsNone(self.queue._executor)
+
+        status = self.wait(self.queue.submit())
+        self.assertEqual(status['status'], 'succeeded', status)
+
+    def test_rejects_options_for_unknown_models(self):
+        response = app.test_client().post('/train_model', json={'xgboost': {'search': True}})
+        self.assertEqual(response.status_code, 400)
+        response = app.test_client().post('/train_model', json={'sklearn': True})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_options_a_trainer_does_not_accept(self):
+        for options in ({'pytorch': {'epochs': 3}}, {'sklearn': {'folds': 3}}, {'sklearn': {'search': 1}}):
+            response = app.test_client().post('/train_model', json=options)
+            self.assertEqual(response.status_code, 400, options)
+
+    def test_unknown_job_is_not_found(self):
+        response = app.test_client().get('/train_model/does-not-exist')
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
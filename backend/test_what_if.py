@@ -0,0 +1,89 @@
+import os
+import unittest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+import numpy as np
+
+import rating_engine
+import what_if
+from app import app, CarbonProject, ProjectRating
+from database_test_case import DatabaseTestCase
+
+
+class WeightedRatingsTest(unittest.TestCase):
+    def test_each_weighting_is_normalized_and_ranked_on_its_own(self):
+        scores = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.5, 0.5, 0.0]])
+        weights = [[1, 0, 0], [0, 1, 0], [1, 1, 0]]
+        ratings, ranks = rating_engine.weighted_ratings(scores, weights)
+
+        np.testing.assert_allclose(ratings[:, 0], [10, 1, 5.5])
+        np.testing.assert_allclose(ratings[:, 1], [1, 10, 5.5])
+        np.testing.assert_allclose(ratings[:, 2], [1, 1, 1])
+        self.assertEqual(ranks.tolist(), [[1, 3, 1], [3, 1, 1], [2, 2, 1]])
+
+        ratings, ranks = rating_engine.weighted_ratings(scores, weights, np.array([2]))
+        np.testing.assert_allclose(ratings, [[5.5, 5.5, 1]])
+        self.assertEqual(ranks.tolist(), [[2, 2, 1]])
+
+    def test_parse_weights_rejects_bad_weight_sets(self):
+        self.assertEqual(what_if.parse_weights({'duration': 2}).tolist(), [[0, 2, 0]])
+        for payload in ([], [{'speed': 1}], {'duration': -1}, {'duration': 'high'}, {'duration': True}, {},
+                        [{'duration': 1}] * (what_if.MAX_WEIGHT_SETS + 1)):
+            with self.assertRaises(ValueError):
+                what_if.parse_weights(payload)
+
+
+class WhatIfEndpointTest(DatabaseTestCase):
+    def make_projects(self):
+        return [
+            CarbonProject(facility_name=f'Facility {i}', total_mass_co2_sequestered=float(100 * i),
+                          duration_years=(i * 7) % 5 + 1, total_mass_co2_sequestered_2016=float(i),
+                          total_mass_co2_sequestered_2022=float((i * 3) % 10))
+            for i in range(1, 9)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            self.stored = {r.project_id: r.rating for r in ProjectRating.query}
+
+    def what_if(self, **body):
+        return self.client.post('/ratings/what_if', json=body)
+
+    def test_default_weights_reproduce_stored_ratings(self):
+        response = self.what_if(weights=[rating_engine.WEIGHTS, {'total_co2': 1}], limit=500)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['components'], rating_engine.COMPONENTS)
+        self.assertEqual(body['total_projects'], 8)
+
+        ratings = {p['id']: p['ratings'][0] for p in body['projects']}
+        self.assertEqual(sorted(ratings), sorted(self.stored))
+        for project_id, rating in ratings.items():
+            self.assertAlmostEqual(rating, self.stored[project_id])
+        # Under total_co2 alone the largest total ranks first.
+        by_co2_rank = sorted(body['projects'], key=lambda p: p['ranks'][1])
+        self.assertEqual([p['facility_name'] for p in by_co2_rank][:2], ['Facility 8', 'Facility 7'])
+
+    def test_pages_through_projects_by_id(self):
+        first = self.what_if(weights={'duration': 1}, limit=5).get_json()
+        second = self.what_if(weights={'duration': 1}, limit=5, after=first['next_after']).get_json()
+        self.assertEqual([p['id'] for p in first['projects'] + second['projects']], self.ids)
+        self.assertIsNone(second['next_after'])
+
+    def test_selected_projects_keep_their_overall_rank(self):
+        full = {p['id']: p for p in self.what_if(weights={'co2_per_year': 1}, limit=500).get_json()['projects']}
+        picked = self.what_if(weights={'co2_per_year': 1}, project_ids=[self.ids[3], self.ids[0]]).get_json()
+        self.assertEqual(picked['projects'], [full[self.ids[3]], full[self.ids[0]]])
+        self.assertEqual(self.what_if(weights={'duration': 1}, project_ids=[999]).status_code, 404)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.post('/ratings/what_if', json=[]).status_code, 400)
+        self.assertEqual(self.what_if(weights={'speed': 1}).status_code, 400)
+        self.assertEqual(self.what_if(weights={'duration': 1}, limit='ten').status_code, 400)
+        self.assertEqual(self.what_if(weights={'duration': 1}, project_ids='1,2').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
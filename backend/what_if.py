@@ -0,0 +1,57 @@
+"""Project ratings and ranks under caller-supplied rating weights.
+
+Component scores depend only on the data, so they are computed once per project
+snapshot and reused by every request until the dataset changes. Each request then
+costs one matrix product over all its weightings plus a sort per weighting for ranks.
+"""
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+import rating_engine
+
+MAX_WEIGHT_SETS = 1000
+
+ComponentScores = namedtuple('ComponentScores', ['version', 'ids', 'scores'])
+
+_lock = threading.Lock()
+_cached = None
+
+
+def component_scores(snapshot):
+    """Project ids and their component score matrix for a snapshot, cached per dataset version."""
+    global _cached
+    with _lock:
+        if _cached is None or _cached.version != snapshot.version:
+            columns = snapshot.rating_columns()
+            scores = rating_engine.component_scores(columns, rating_engine.rating_bounds(columns))
+            _cached = ComponentScores(snapshot.version, np.array(snapshot['id']), scores)
+        return _cached
+
+
+def parse_weights(payload):
+    """A (k, len(COMPONENTS)) matrix from one weight object or a list of them.
+
+    Components left out of an object weigh 0. Raises ValueError.
+    """
+    weight_sets = [payload] if isinstance(payload, dict) else payload
+    if not isinstance(weight_sets, list) or not weight_sets:
+        raise ValueError('weights must be an object or a non-empty array of objects')
+    if len(weight_sets) > MAX_WEIGHT_SETS:
+        raise ValueError(f'At most {MAX_WEIGHT_SETS} weight sets per request')
+    matrix = np.zeros((len(weight_sets), len(rating_engine.COMPONENTS)))
+    for i, weights in enumerate(weight_sets):
+        if not isinstance(weights, dict):
+            raise ValueError(f'weights[{i}] must be an object')
+        unknown = sorted(set(weights) - set(rating_engine.COMPONENTS))
+        if unknown:
+            raise ValueError(f"weights[{i}] has unknown components: {', '.join(unknown)}")
+        for j, component in enumerate(rating_engine.COMPONENTS):
+            value = weights.get(component, 0)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value) or value < 0:
+                raise ValueError(f'weights[{i}].{component} must be a non-negative number')
+            matrix[i, j] = value
+        if not matrix[i].any():
+            raise ValueError(f'weights[{i}] must give some component a positive weight')
+    return matrix
@@ -0,0 +1,97 @@
+-- models/co2_by_industry.sql
+--
+-- Incremental: a run only re-aggregates industries that gained or changed projects
+-- (carbon_project.updated_at) or lost them (removed_project_subpart.removed_at)
+-- since the previous run's watermark, stored in refreshed_through.
+--
+-- Both timestamps come from now(), the start of the writing transaction, so a write
+-- can commit after a run has already moved the watermark past it. Each run re-reads
+-- changes from refresh_overlap_minutes before the watermark to pick those up; totals
+-- are recomputed in full per industry, so reading a change twice is harmless.
+
+{{ config(
+    materialized='incremental',
+    unique_key='industry_type',
+    incremental_strategy='delete+insert',
+    indexes=[
+      {'columns': ['industry_type'], 'unique': True},
+      {'columns': ['total_co2']},
+      {'columns': ['refreshed_through']},
+    ]
+) }}
+
+WITH watermark AS (
+    SELECT GREATEST(
+        (SELECT MAX(updated_at) FROM {{ source('carbon_project_rater', 'carbon_project') }}),
+        (SELECT MAX(removed_at) FROM {{ source('carbon_project_rater', 'removed_project_subpart') }})
+    ) AS refreshed_through
+),
+
+industry_names AS (
+    SELECT subpart_code, name
+    FROM {{ source('carbon_project_rater', 'industry_type') }}
+),
+
+{% if is_incremental() %}
+previous_run AS (
+    SELECT MAX(refreshed_through) - make_interval(mins => {{ var('refresh_overlap_minutes') }}) AS refreshed_through
+    FROM {{ this }}
+),
+
+changed_subparts AS (
+    SELECT ps.subpart_code
+    FROM {{ source('carbon_project_rater', 'carbon_project') }} cp
+    JOIN {{ source('carbon_project_rater', 'project_subpart') }} ps ON ps.project_id = cp.id
+    WHERE cp.updated_at > (SELECT refreshed_through FROM previous_run)
+    UNION
+    SELECT subpart_code
+    FROM {{ source('carbon_project_rater', 'removed_project_subpart') }}
+    WHERE removed_at > (SELECT refreshed_through FROM previous_run)
+),
+
+affected_industries AS (
+    SELECT DISTINCT COALESCE(it.name, cs.subpart_code) AS industry_type
+    FROM changed_subparts cs
+    LEFT JOIN industry_names it ON it.subpart_code = cs.subpart_code
+),
+
+affected_subparts AS (
+    -- Every subpart feeding an affected industry, so its total is recomputed in full.
+    SELECT cs.subpart_code FROM changed_subparts cs
+    UNION
+    SELECT it.subpart_code
+    FROM industry_names it
+    JOIN affected_industries ai ON ai.industry_type = it.name
+),
+{% endif %}
+
+totals AS (
+    SELECT
+        COALESCE(it.name, ps.subpart_code) AS industry_type,
+        SUM(cp.total_mass_co2_sequestered) AS total_co2,
+        COUNT(cp.total_mass_co2_sequestered) AS project_count
+    FROM {{ source('carbon_project_rater', 'project_subpart') }} ps
+    JOIN {{ source('carbon_project_rater', 'carbon_project') }} cp ON cp.id = ps.project_id
+    LEFT JOIN industry_names it ON it.subpart_code = ps.subpart_code
+    {% if is_incremental() %}
+    WHERE ps.subpart_code IN (SELECT subpart_code FROM affected_subparts)
+    {% endif %}
+    GROUP BY 1
+)
+
+{% if is_incremental() %}
+-- Industries that lost their last project are kept with project_count = 0 so the
+-- stale row is replaced rather than left behind.
+SELECT
+    ai.industry_type,
+    COALESCE(t.total_co2, 0) AS total_co2,
+    COALESCE(t.project_count, 0) AS project_count,
+    w.refreshed_through
+FROM affected_industries ai
+LEFT JOIN totals t ON t.industry_type = ai.industry_type
+CROSS JOIN watermark w
+{% else %}
+SELECT t.industry_type, t.total_co2, t.project_count, w.refreshed_through
+FROM totals t
+CROSS JOIN watermark w
+{% endif %}
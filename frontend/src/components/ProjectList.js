@@ -1,20 +1,32 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import { Card, CardBody, CardTitle, Table, Row, Col } from 'reactstrap';
+import { Button, Card, CardBody, CardTitle, Table, Row, Col } from 'reactstrap';
 import ReactStars from "react-rating-stars-component";
 
+const PAGE_SIZE = 30;
+
 const ProjectList = () => {
   const [projects, setProjects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  useEffect(() => {
-    axios.get('http://localhost:5001/projects')
+  const fetchPage = (after) => {
+    const params = { limit: PAGE_SIZE };
+    if (after) {
+      params.after = after;
+    }
+    axios.get('http://localhost:5001/projects', { params })
       .then(response => {
         console.log("Data received:", response.data.projects);
-        setProjects(response.data.projects);
+        setProjects(previous => (after ? previous.concat(response.data.projects) : response.data.projects));
+        setNextCursor(response.data.next_cursor || null);
       })
       .catch(error => {
         console.error('There was an error fetching the projects!', error);
       });
+  };
+
+  useEffect(() => {
+    fetchPage(null);
   }, []);
 
   const formatIndustryText = (text) => {
@@ -29,7 +41,7 @@ const ProjectList = () => {
   return (
     <div>
       <Row>
-        {projects.sort((a, b) => b.rating - a.rating).map(project => (
+        {projects.map(project => (
           <Col sm="12" md="6" lg="4" key={project.id}>
             <Card className="project-card">
               <CardBody>
@@ -76,6 +88,11 @@ const ProjectList = () => {
           </Col>
         ))}
       </Row>
+      {nextCursor && (
+        <div className="load-more">
+          <Button color="secondary" onClick={() => fetchPage(nextCursor)}>Load more</Button>
+        </div>
+      )}
     </div>
   );
 };